@@ -0,0 +1,2 @@
+"""Benchmarks."""
+# -*- coding: utf-8 -*-
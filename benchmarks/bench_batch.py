@@ -0,0 +1,108 @@
+"""Benchmark the columnar batch of shops against a list of rows.
+
+Run with: python -m benchmarks.bench_batch
+"""
+# -*- coding: utf-8 -*-
+import argparse
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+from benchmarks.bench_output import synthetic_rows
+from tap_shopify_shops.batch import ColumnBatch, ShopBatch
+from tap_shopify_shops.schema import load_schemas
+
+# Rows handed to a batch at a time, like the output batch size
+BATCH_SIZE: int = 500
+
+
+def measure(
+    create_batch: Callable[[], Any],
+    records: int,
+) -> Tuple[Any, float, int]:
+    """Fill a batch and measure the time and the memory it holds.
+    Tracing the memory slows down Python, so the time is measured with a
+    second batch that is not traced.
+    Arguments:
+        create_batch {Callable[[], Any]} -- Creates an empty batch
+        records {int} -- Number of rows
+    Returns:
+        Tuple[Any, float, int] -- Batch, seconds and bytes it holds
+    """
+    tracemalloc.start()
+    batch: Any = fill(create_batch(), records)
+    allocated: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started: float = time.perf_counter()
+    fill(create_batch(), records)
+    return batch, time.perf_counter() - started, allocated
+
+
+def fill(batch: Any, records: int) -> Any:
+    """Add synthetic rows to a batch, a slice at a time.
+    Arguments:
+        batch {Any} -- List or columnar batch
+        records {int} -- Number of rows
+    Returns:
+        Any -- The batch
+    """
+    for start in range(0, records, BATCH_SIZE):
+        batch.extend(synthetic_rows(min(BATCH_SIZE, records - start), start))
+    return batch
+
+
+def main() -> None:
+    """Compare the memory and the build time of the batches."""
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100000)
+    args: argparse.Namespace = parser.parse_args()
+
+    columns: List[str] = list(
+        load_schemas()['shopify_shops'].to_dict()['properties'],
+    )
+    # The rows are created the same way for every batch, so the time of
+    # creating them is measured on its own and subtracted
+    _, create_seconds, _ = measure(_Discard, args.records)
+
+    per_row: float = 1e6 / args.records
+    results: List[Tuple[str, Any, float, int]] = []
+    for name, create_batch in (
+        ('dict rows', list),
+        ('lists', lambda: ColumnBatch(columns)),
+        ('ShopBatch', ShopBatch),
+    ):
+        batch, seconds, allocated = measure(create_batch, args.records)
+        results.append((name, batch, seconds - create_seconds, allocated))
+        print(
+            f'{name:<10} {allocated / args.records:7.1f} bytes/row, '
+            f'{(seconds - create_seconds) * per_row:5.2f} us/row to add',
+        )
+
+    # The batch must hold the same rows as the list
+    rows: List[dict] = results[0][1]
+    shop_batch: ShopBatch = results[2][1]
+    assert [  # noqa: S101
+        {column: row.get(column) for column in columns} for row in rows
+    ] == list(shop_batch)
+
+    started: float = time.perf_counter()
+    shop_batch.to_pydict()
+    print(
+        f'ShopBatch to columns: '
+        f'{(time.perf_counter() - started) * per_row:.2f} us/row',
+    )
+
+
+class _Discard(object):
+    """Batch that drops its rows."""
+
+    def extend(self, rows: List[dict]) -> None:
+        """Drop rows.
+        Arguments:
+            rows {List[dict]} -- Rows
+        """
+
+
+if __name__ == '__main__':
+    main()
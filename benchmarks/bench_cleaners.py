@@ -0,0 +1,72 @@
+"""Benchmark the record cleaners.
+
+Run with: python -m benchmarks.bench_cleaners
+"""
+# -*- coding: utf-8 -*-
+import timeit
+from typing import List
+
+from tap_shopify_shops.cleaners import COMPILED_CLEANERS, clean_row
+from tap_shopify_shops.streams import STREAMS
+
+ROWS: int = 100000
+REPEAT: int = 5
+
+
+def synthetic_rows(count: int) -> List[dict]:
+    """Create rows like the scrape yields them.
+    Arguments:
+        count {int} -- Number of rows
+    Returns:
+        List[dict] -- Rows
+    """
+    return [
+        {
+            'id': index,
+            'name': f'Shop {index}',
+            'city': 'Wijchen' if index % 2 else '',
+            'province': None,
+            'country': 'NL',
+            'currency': 'EUR',
+            'domain': f'shop-{index}.com',
+            'url': f'https://shop-{index}.com',
+            'myshopify_domain': f'shop-{index}.myshopify.com',
+            'description': '',
+            'published_collections_count': index % 7,
+            'published_products_count': index % 31,
+            'shop_id': f'gid://partners/Shop/{index}',
+            'extracted_at': '2021-01-01 12:00:00 UTC',
+        }
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    """Compare the generic and the compiled cleaner."""
+    rows: List[dict] = synthetic_rows(ROWS)
+    mapping: dict = STREAMS['shopify_shops']['mapping']
+    compiled = COMPILED_CLEANERS['shopify_shops']
+
+    # Both cleaners must produce the same records
+    assert [clean_row(row, mapping) for row in rows[:1000]] == [  # noqa: S101
+        compiled(row) for row in rows[:1000]
+    ]
+
+    generic: float = min(timeit.repeat(
+        lambda: [clean_row(row, mapping) for row in rows],
+        number=1,
+        repeat=REPEAT,
+    ))
+    specialized: float = min(timeit.repeat(
+        lambda: [compiled(row) for row in rows],
+        number=1,
+        repeat=REPEAT,
+    ))
+
+    print(f'clean_row:        {generic / ROWS * 1e6:.2f} us per row')
+    print(f'compiled cleaner: {specialized / ROWS * 1e6:.2f} us per row')
+    print(f'speedup:          {generic / specialized:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
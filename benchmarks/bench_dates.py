@@ -0,0 +1,81 @@
+"""Benchmark the date parser.
+
+Run with: python -m benchmarks.bench_dates
+"""
+# -*- coding: utf-8 -*-
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from dateutil.parser import parse as parse_date
+
+from tap_shopify_shops.streams import TZINFOS, date_parser
+
+ROWS: int = 100000
+REPEAT: int = 5
+
+# Formats the parser meets, including the extracted_at format
+DATE_FORMATS: tuple = (
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%dT%H:%M:%S.123+02:00',
+    '%Y-%m-%d %H:%M:%S CEST',
+    '%Y-%m-%d %l:%M:%S UTC',
+)
+
+
+def synthetic_dates(count: int, distinct: int) -> List[str]:
+    """Create date strings with a number of distinct values.
+    Arguments:
+        count {int} -- Number of dates
+        distinct {int} -- Number of distinct dates
+    Returns:
+        List[str] -- Dates
+    """
+    start: datetime = datetime(2021, 1, 1)
+    return [
+        (start + timedelta(seconds=index % distinct * 37)).strftime(
+            DATE_FORMATS[index % distinct % len(DATE_FORMATS)],
+        )
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    """Compare dateutil with the fast and memoized parser."""
+    dates: List[str] = synthetic_dates(ROWS, ROWS)
+    repeated: List[str] = synthetic_dates(ROWS, 10)
+
+    # Both parsers must produce the same dates
+    assert [  # noqa: S101
+        parse_date(input_date, tzinfos=TZINFOS).isoformat()
+        for input_date in dates[:1000]
+    ] == [date_parser(input_date) for input_date in dates[:1000]]
+
+    dateutil: float = min(timeit.repeat(
+        lambda: [
+            parse_date(input_date, tzinfos=TZINFOS) for input_date in dates
+        ],
+        number=1,
+        repeat=REPEAT,
+    ))
+
+    def parse_uncached() -> None:  # noqa: WPS430
+        date_parser.cache_clear()
+        for input_date in dates:
+            date_parser.__wrapped__(input_date)
+
+    fast: float = min(timeit.repeat(parse_uncached, number=1, repeat=REPEAT))
+    memoized: float = min(timeit.repeat(
+        lambda: [date_parser(input_date) for input_date in repeated],
+        number=1,
+        repeat=REPEAT,
+    ))
+
+    print(f'dateutil:      {dateutil / ROWS * 1e6:.2f} us per date')
+    print(f'fast path:     {fast / ROWS * 1e6:.2f} us per date')
+    print(f'memoized:      {memoized / ROWS * 1e6:.2f} us per repeated date')
+    print(f'speedup:       {dateutil / fast:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
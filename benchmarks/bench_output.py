@@ -0,0 +1,179 @@
+"""Benchmark the Singer output against the bulk output.
+
+Run with: python -m benchmarks.bench_output
+
+Every output is timed on the tap side and on the side that loads it: a
+Singer target decodes every RECORD line, a load job only receives the
+compressed chunk files.
+"""
+# -*- coding: utf-8 -*-
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+from benchmarks.mock_server import meta_json
+from tap_shopify_shops.bulk import CHUNK_FORMATS, BulkWriter
+from tap_shopify_shops.output import SingerWriter
+from tap_shopify_shops.schema import load_schemas
+from tap_shopify_shops.streams import SHOP_ID_PREFIX
+
+STREAM: str = 'shopify_shops'
+
+
+def synthetic_rows(count: int, start: int = 0) -> List[dict]:
+    """Create cleaned rows of synthetic shops.
+    Arguments:
+        count {int} -- Number of rows
+    Keyword Arguments:
+        start {int} -- Index of the first shop
+    Returns:
+        List[dict] -- Rows
+    """
+    rows: List[dict] = []
+    for index in range(start, start + count):
+        shop_domain: str = f'shop-{index}.myshopify.com'
+        response: dict = json.loads(meta_json(shop_domain))
+        rows.append({
+            'id': response['id'],
+            'shop_name': response['name'],
+            'city': response['city'],
+            'province': response['province'],
+            'country': response['country'],
+            'currency': response['currency'],
+            'domain': response['domain'],
+            'url': response['url'],
+            'shop_domain': shop_domain,
+            'description': response['description'],
+            'published_collections_count': (
+                response['published_collections_count']
+            ),
+            'published_products_count': response['published_products_count'],
+            'shop_id': f'{SHOP_ID_PREFIX}{response["id"]}',
+            'extracted_at': '2021-06-01T00:00:00+00:00',
+        })
+    return rows
+
+
+def write_rows(writer: SingerWriter, rows: List[dict], schema: dict) -> float:
+    """Write rows like sync does and time it.
+    Arguments:
+        writer {SingerWriter} -- Singer or bulk writer
+        rows {List[dict]} -- Rows
+        schema {dict} -- JSON schema of the stream
+    Returns:
+        float -- CPU seconds
+    """
+    started: float = time.process_time()
+    writer.write_schema(STREAM, schema, ['shop_id'])
+    for row in rows:
+        writer.write_record(STREAM, row)
+        if writer.state_due():
+            writer.write_state({'bookmarks': {}})
+    writer.write_state({'bookmarks': {}})
+    writer.flush()
+    return time.process_time() - started
+
+
+def read_singer(path: str) -> float:
+    """Decode the Singer output like a target and time it.
+    Arguments:
+        path {str} -- Path of the Singer output
+    Returns:
+        float -- CPU seconds
+    """
+    started: float = time.process_time()
+    with open(path, encoding='utf-8') as singer_file:
+        for line in singer_file:
+            json.loads(line)
+    return time.process_time() - started
+
+
+def measure(
+    name: str,
+    create_writer: Callable[[str], Tuple[SingerWriter, str]],
+    rows: List[dict],
+    schema: dict,
+) -> None:
+    """Write the rows with an output and print the costs.
+    Arguments:
+        name {str} -- Name of the output
+        create_writer {Callable} -- Creates a writer and the path to measure
+        rows {List[dict]} -- Rows
+        schema {dict} -- JSON schema of the stream
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        writer, path = create_writer(directory)
+        write_seconds: float = write_rows(writer, rows, schema)
+        if isinstance(writer, BulkWriter):
+            read_seconds: float = 0.0
+            size: int = sum(chunk['bytes'] for chunk in writer.chunks)
+            files: int = len(writer.chunks)
+        else:
+            writer.output.close()
+            read_seconds = read_singer(path)
+            size = os.path.getsize(path)
+            files = 1
+
+    per_record: float = 1e6 / len(rows)
+    print(
+        f'{name:<8} write {write_seconds * per_record:6.2f} us/record, '
+        f'target decode {read_seconds * per_record:6.2f} us/record, '
+        f'{size / len(rows):7.1f} bytes/record in {files} files',
+    )
+
+
+def main() -> None:
+    """Compare the Singer output with the bulk formats."""
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--chunk-records', type=int, default=100000)
+    args: argparse.Namespace = parser.parse_args()
+
+    rows: List[dict] = synthetic_rows(args.records)
+    schema: dict = load_schemas()[STREAM].to_dict()
+
+    def singer_writer(directory: str) -> Tuple[SingerWriter, str]:
+        path: str = os.path.join(directory, 'singer.jsonl')
+        return SingerWriter(open(path, 'w', encoding='utf-8')), path
+
+    measure('singer', singer_writer, rows, schema)
+
+    for file_format in CHUNK_FORMATS:
+        def bulk_writer(  # noqa: WPS430
+            directory: str,
+            file_format: str = file_format,
+        ) -> Tuple[SingerWriter, str]:
+            return BulkWriter(
+                directory,
+                file_format=file_format,
+                chunk_records=args.chunk_records,
+                output=open(os.devnull, 'w', encoding='utf-8'),
+            ), directory
+
+        try:
+            measure(file_format, bulk_writer, rows, schema)
+        except ImportError as error:
+            print(f'{file_format:<8} skipped: {error}')
+
+    # The gzip level is a trade-off between tap CPU and bytes to load
+    with tempfile.TemporaryDirectory() as directory:
+        for level in (1, 6, 9):
+            path: str = os.path.join(directory, f'level-{level}.gz')
+            started: float = time.process_time()
+            with gzip.open(path, 'wb', compresslevel=level) as chunk_file:
+                chunk_file.write('\n'.join(
+                    json.dumps(row, separators=(',', ':')) for row in rows
+                ).encode('utf-8'))
+            seconds: float = time.process_time() - started
+            print(
+                f'gzip {level}   {seconds * 1e6 / len(rows):6.2f} us/record, '
+                f'{os.path.getsize(path) / len(rows):7.1f} bytes/record',
+            )
+
+
+if __name__ == '__main__':
+    main()
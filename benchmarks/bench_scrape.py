@@ -0,0 +1,254 @@
+"""Benchmark the scrape end to end against a local mock server.
+
+Run with: python -m benchmarks.bench_scrape --shops 5000 --protocol http2
+"""
+# -*- coding: utf-8 -*-
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import tempfile
+import time
+from typing import IO, Any, Callable, List
+
+from tap_shopify_shops.discover import discover
+from tap_shopify_shops.output import SingerWriter
+from tap_shopify_shops.scrape import Shopify_Shops
+from tap_shopify_shops.sync import sync, sync_async
+
+from benchmarks.mock_server import ServerOptions, create_certificate, start_server
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments.
+    Returns:
+        argparse.Namespace -- Arguments
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument('--shops', type=int, default=5000)
+    parser.add_argument(
+        '--protocol',
+        choices=('http1', 'http2'),
+        default='http2',
+    )
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--latency-jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument(
+        '--storm-interval',
+        type=float,
+        default=0,
+        help='Seconds between the starts of 429 storms',
+    )
+    parser.add_argument(
+        '--storm-duration',
+        type=float,
+        default=0,
+        help='Seconds a 429 storm lasts',
+    )
+    parser.add_argument('--storm-rate', type=float, default=0.9)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests-per-second', type=float, default=500)
+    parser.add_argument('--max-requests-per-second', type=float, default=2000)
+    parser.add_argument('--run-report', help='Path of the JSON run report')
+    parser.add_argument(
+        '--async-sync',
+        action='store_true',
+        help='Sync on the event loop with the output written by a thread',
+    )
+    parser.add_argument(
+        '--target-delay',
+        type=float,
+        default=0,
+        help='Seconds a slow target takes to read every write',
+    )
+    return parser.parse_args()
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Percentile of the samples.
+    Arguments:
+        samples {List[float]} -- Samples
+        fraction {float} -- Percentile as a fraction, e.g. 0.99
+    Returns:
+        float -- The percentile or 0 without samples
+    """
+    if not samples:
+        return 0
+    ordered: List[float] = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_requests(shops: Shopify_Shops, latencies: List[float]) -> None:
+    """Record the latency of every request of the scrape.
+    Only the time on the wire is recorded, not the wait for the rate limiter.
+    Arguments:
+        shops {Shopify_Shops} -- Scrape
+        latencies {List[float]} -- Receives the latencies in seconds
+    """
+    send: Callable = shops.client.send
+
+    async def timed_send(*args: Any, **kwargs: Any) -> Any:  # noqa: WPS430
+        started: float = time.perf_counter()
+        try:
+            return await send(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    shops.client.send = timed_send  # type: ignore
+
+
+class SlowOutput(object):
+    """Output that is read slowly, like a busy target."""
+
+    def __init__(self, output: IO[str], delay: float) -> None:
+        """Initialize the output.
+        Arguments:
+            output {IO[str]} -- Output
+            delay {float} -- Seconds every write blocks
+        """
+        self.output: IO[str] = output
+        self.delay: float = delay
+
+    def write(self, text: str) -> int:
+        """Write text and block.
+        Arguments:
+            text {str} -- Text
+        Returns:
+            int -- Number of characters
+        """
+        time.sleep(self.delay)
+        return self.output.write(text)
+
+    def flush(self) -> None:
+        """Flush the output."""
+        self.output.flush()
+
+
+def main() -> None:  # noqa: WPS210
+    """Scrape synthetic shops and report the throughput."""
+    args: argparse.Namespace = parse_args()
+    options: ServerOptions = ServerOptions(
+        http2=args.protocol == 'http2',
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        storm_interval=args.storm_interval,
+        storm_duration=args.storm_duration,
+        storm_rate=args.storm_rate,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate_path, key_path = create_certificate(directory)
+        server, port = start_server(options, certificate_path, key_path)
+
+        domain_path: str = os.path.join(directory, 'domains.txt')
+        with open(domain_path, 'w', encoding='utf-8') as domain_file:
+            domain_file.writelines(
+                f'shop-{index}.myshopify.com\n'
+                for index in range(args.shops)
+            )
+
+        config: dict = {
+            'start_date': '2021-01-01T00:00:00Z',
+            'domain_source': 'file',
+            'domain_path': domain_path,
+            'url_template': (
+                f'https://127.0.0.1:{port}/{{shop_domain}}/meta.json'
+            ),
+            'ssl_verify': certificate_path,
+            'http2': options.http2,
+            'concurrency': args.concurrency,
+            'requests_per_second': args.requests_per_second,
+            'max_requests_per_second': args.max_requests_per_second,
+            'retry_base_delay': 0.5,
+            'retry_max_delay': 5,
+            'run_report_path': args.run_report,
+        }
+
+        latencies: List[float] = []
+        shops: Shopify_Shops = Shopify_Shops(config)
+        time_requests(shops, latencies)
+
+        with open(os.devnull, 'w') as devnull:
+            writer: SingerWriter = SingerWriter(
+                output=SlowOutput(devnull, args.target_delay),  # type: ignore
+            )
+
+            usage_before: resource.struct_rusage = resource.getrusage(
+                resource.RUSAGE_SELF,
+            )
+            started: float = time.perf_counter()
+            if args.async_sync:
+                asyncio.run(run_async(shops, config, writer))
+            else:
+                sync(
+                    shops,
+                    {},
+                    discover(),
+                    config['start_date'],
+                    writer=writer,
+                    metrics=shops.metrics,
+                )
+            elapsed: float = time.perf_counter() - started
+            usage_after: resource.struct_rusage = resource.getrusage(
+                resource.RUSAGE_SELF,
+            )
+
+        if shops.metrics is not None:
+            shops.metrics.finish(shops.logger)
+        server.terminate()
+        server.join()
+
+    cpu: float = (
+        usage_after.ru_utime - usage_before.ru_utime
+        + usage_after.ru_stime - usage_before.ru_stime
+    )
+    records: int = max(writer.records, 1)
+
+    print(f'Protocol:        {args.protocol}')
+    print(f'Sync:            {"async" if args.async_sync else "sync"}')
+    print(f'Shops:           {args.shops}')
+    print(f'Records:         {writer.records}')
+    print(f'Failed:          {shops.fetcher.failed}')
+    print(f'Requests:        {len(latencies)}')
+    print(f'Throttled:       {shops.fetcher.rate_limiter.throttled}')
+    print(f'Elapsed:         {elapsed:.2f} s')
+    print(f'Shops/sec:       {args.shops / elapsed:.1f}')
+    print(f'Latency p50:     {percentile(latencies, 0.5) * 1000:.1f} ms')
+    print(f'Latency p99:     {percentile(latencies, 0.99) * 1000:.1f} ms')
+    if latencies:
+        print(
+            f'Latency mean:    {statistics.mean(latencies) * 1000:.1f} ms',
+        )
+    print(f'Peak RSS:        {usage_after.ru_maxrss / 1024:.1f} MB')
+    print(f'CPU per record:  {cpu / records * 1e6:.0f} us')
+
+
+async def run_async(
+    shops: Shopify_Shops,
+    config: dict,
+    writer: SingerWriter,
+) -> None:
+    """Run the async sync and close the scrape.
+    Arguments:
+        shops {Shopify_Shops} -- Scrape
+        config {dict} -- Tap config
+        writer {SingerWriter} -- Output
+    """
+    try:
+        await sync_async(
+            shops,
+            {},
+            discover(),
+            config['start_date'],
+            writer=writer,
+            metrics=shops.metrics,
+        )
+    finally:
+        await shops.aclose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the startup of the tap in discovery mode.
+
+Run with: python -m benchmarks.bench_startup
+
+Fails when discovery imports one of the modules that are only needed to sync.
+"""
+# -*- coding: utf-8 -*-
+import json
+import os
+import statistics
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from typing import List
+
+RUNS: int = 10
+
+# Modules that discovery must not import
+SYNC_ONLY_MODULES: tuple = (
+    'google.cloud.bigquery',
+    'h2',
+    'httpcore',
+    'httpx',
+    'pandas',
+    'pkg_resources',
+    'sqlite3',
+    'tap_shopify_shops.fetcher',
+    'tap_shopify_shops.scrape',
+)
+
+# Runs discovery and prints the sync-only modules that were imported
+DISCOVER_SCRIPT: str = """
+import sys
+from tap_shopify_shops.tap import main
+sys.argv = ['tap-shopify-shops', '--config', sys.argv[1], '--discover']
+try:
+    main()
+finally:
+    sys.stdout.flush()
+    sys.stderr.write(repr(sorted(
+        module for module in {modules!r} if module in sys.modules
+    )))
+"""
+
+
+def main() -> None:
+    """Time discovery in fresh processes and check its imports."""
+    with tempfile.TemporaryDirectory() as directory:
+        config_path: str = os.path.join(directory, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as config_file:
+            json.dump({'start_date': '2021-01-01T00:00:00Z'}, config_file)
+
+        script: str = DISCOVER_SCRIPT.format(modules=SYNC_ONLY_MODULES)
+        durations: List[float] = []
+        imported: str = ''
+
+        for _ in range(RUNS):
+            started: float = time.perf_counter()
+            discovery: subprocess.CompletedProcess
+            discovery = subprocess.run(  # noqa: S603
+                [sys.executable, '-c', script, config_path],
+                capture_output=True,
+                check=True,
+                encoding='utf-8',
+            )
+            durations.append(time.perf_counter() - started)
+            imported = discovery.stderr.splitlines()[-1]
+
+    print(f'discover median: {statistics.median(durations) * 1000:.0f} ms')
+    print(f'discover min:    {min(durations) * 1000:.0f} ms')
+
+    if imported != '[]':
+        print(f'discovery imported sync-only modules: {imported}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Local stand-in for the meta.json of Shopify shops.
+
+Serves synthetic meta.json payloads over HTTPS with HTTP/1.1 or HTTP/2 at
+https://127.0.0.1:<port>/<shop_domain>/meta.json, with configurable latency,
+errors and 429 storms.
+"""
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import ssl
+import subprocess  # noqa: S404
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import h2.config
+import h2.connection
+import h2.events
+
+# Read size of the HTTP/2 connections
+READ_SIZE: int = 65536
+
+
+class ServerOptions(NamedTuple):
+    """Behaviour of the mock server."""
+
+    http2: bool = True
+    latency: float = 0.05
+    latency_jitter: float = 0.05
+    error_rate: float = 0.0
+    storm_interval: float = 0.0
+    storm_duration: float = 0.0
+    storm_rate: float = 0.9
+    retry_after: int = 1
+
+
+def create_certificate(directory: str) -> Tuple[str, str]:
+    """Create a self-signed certificate for 127.0.0.1.
+    Arguments:
+        directory {str} -- Directory for the certificate and key
+    Returns:
+        Tuple[str, str] -- Paths to the certificate and the key
+    """
+    certificate_path: str = os.path.join(directory, 'certificate.pem')
+    key_path: str = os.path.join(directory, 'key.pem')
+    subprocess.run(  # noqa: S603, S607
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+            '-days', '1', '-subj', '/CN=127.0.0.1',
+            '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost',
+            '-keyout', key_path, '-out', certificate_path,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certificate_path, key_path
+
+
+def meta_json(shop_domain: str) -> bytes:
+    """Synthetic meta.json of a shop.
+    Arguments:
+        shop_domain {str} -- Domain of the shop
+    Returns:
+        bytes -- Response body
+    """
+    shop_id: int = zlib.crc32(shop_domain.encode('utf-8'))
+    name: str = shop_domain.split('.')[0]
+    return json.dumps({
+        'id': shop_id,
+        'name': name.replace('-', ' ').title(),
+        'city': 'Wijchen' if shop_id % 2 else None,
+        'province': 'Gelderland' if shop_id % 2 else None,
+        'country': 'NL',
+        'currency': 'EUR',
+        'domain': f'{name}.com',
+        'url': f'https://{name}.com',
+        'myshopify_domain': shop_domain,
+        'description': 'A synthetic shop. ' * (shop_id % 20),
+        'published_collections_count': shop_id % 7,
+        'published_products_count': shop_id % 311,
+        'money_format': '€{{amount}}',
+        'ships_to_countries': ['NL', 'BE', 'DE', 'FR', 'GB', 'US'],
+        'offers_shop_pay_installments': False,
+    }).encode('utf-8')
+
+
+class MockServer(object):
+    """Serve synthetic meta.json payloads."""
+
+    def __init__(self, options: ServerOptions) -> None:
+        """Initialize the server.
+        Arguments:
+            options {ServerOptions} -- Behaviour of the server
+        """
+        self.options: ServerOptions = options
+        self.started: float = time.monotonic()
+
+    async def respond(
+        self,
+        path: str,
+    ) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        """Respond to a request.
+        Arguments:
+            path {str} -- Path of the request
+        Returns:
+            Tuple[int, List[Tuple[str, str]], bytes] -- Status, headers, body
+        """
+        options: ServerOptions = self.options
+        await asyncio.sleep(
+            options.latency + random.uniform(0, options.latency_jitter),
+        )
+
+        if self._storming() and random.random() < options.storm_rate:
+            return 429, [('retry-after', str(options.retry_after))], b''
+        if random.random() < options.error_rate:
+            return 503, [], b''
+
+        body: bytes = meta_json(path.strip('/').split('/')[0])
+        return 200, [('content-type', 'application/json')], body
+
+    async def serve(self, connection_reader, connection_writer) -> None:
+        """Serve a connection with the negotiated protocol.
+        Arguments:
+            connection_reader {asyncio.StreamReader} -- Reader
+            connection_writer {asyncio.StreamWriter} -- Writer
+        """
+        ssl_object: ssl.SSLObject = connection_writer.get_extra_info(
+            'ssl_object',
+        )
+        try:
+            if ssl_object.selected_alpn_protocol() == 'h2':
+                await self._serve_http2(connection_reader, connection_writer)
+            else:
+                await self._serve_http1(connection_reader, connection_writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            connection_writer.close()
+
+    def _storming(self) -> bool:
+        """Check whether a 429 storm is going on.
+        Returns:
+            bool -- Whether requests are throttled
+        """
+        if not self.options.storm_interval:
+            return False
+        elapsed: float = time.monotonic() - self.started
+        return elapsed % self.options.storm_interval < (
+            self.options.storm_duration
+        )
+
+    async def _serve_http1(self, connection_reader, connection_writer) -> None:
+        """Serve HTTP/1.1 requests on a kept alive connection.
+        Arguments:
+            connection_reader {asyncio.StreamReader} -- Reader
+            connection_writer {asyncio.StreamWriter} -- Writer
+        """
+        while True:
+            head: bytes = await connection_reader.readuntil(b'\r\n\r\n')
+            path: str = head.split(b' ', 2)[1].decode('utf-8')
+            status, headers, body = await self.respond(path)
+
+            lines: List[str] = [f'HTTP/1.1 {status} Mock']
+            lines.extend(f'{name}: {value}' for name, value in headers)
+            lines.append(f'content-length: {len(body)}')
+            connection_writer.write(
+                '\r\n'.join(lines).encode('latin-1') + b'\r\n\r\n' + body,
+            )
+            await connection_writer.drain()
+
+    async def _serve_http2(self, connection_reader, connection_writer) -> None:
+        """Serve multiplexed HTTP/2 requests.
+        Arguments:
+            connection_reader {asyncio.StreamReader} -- Reader
+            connection_writer {asyncio.StreamWriter} -- Writer
+        """
+        connection: h2.connection.H2Connection = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False),
+        )
+        connection.initiate_connection()
+        connection_writer.write(connection.data_to_send())
+
+        window_updated: asyncio.Event = asyncio.Event()
+        streams: Dict[int, asyncio.Task] = {}
+
+        while True:
+            received: bytes = await connection_reader.read(READ_SIZE)
+            if not received:
+                break
+
+            for event in connection.receive_data(received):
+                if isinstance(event, h2.events.RequestReceived):
+                    path: str = dict(event.headers)[b':path'].decode('utf-8')
+                    streams[event.stream_id] = asyncio.create_task(
+                        self._respond_http2(
+                            connection,
+                            connection_writer,
+                            event.stream_id,
+                            path,
+                            window_updated,
+                        ),
+                    )
+                elif isinstance(event, h2.events.WindowUpdated):
+                    window_updated.set()
+                elif isinstance(event, h2.events.StreamReset):
+                    stream: Optional[asyncio.Task] = streams.pop(
+                        event.stream_id,
+                        None,
+                    )
+                    if stream is not None:
+                        stream.cancel()
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            connection_writer.write(connection.data_to_send())
+
+        for stream in streams.values():
+            stream.cancel()
+
+    async def _respond_http2(  # noqa: WPS211
+        self,
+        connection: h2.connection.H2Connection,
+        connection_writer: asyncio.StreamWriter,
+        stream_id: int,
+        path: str,
+        window_updated: asyncio.Event,
+    ) -> None:
+        """Respond to a request on an HTTP/2 stream.
+        Arguments:
+            connection {h2.connection.H2Connection} -- Connection
+            connection_writer {asyncio.StreamWriter} -- Writer
+            stream_id {int} -- Stream of the request
+            path {str} -- Path of the request
+            window_updated {asyncio.Event} -- Set when the window grows
+        """
+        status, headers, body = await self.respond(path)
+        connection.send_headers(
+            stream_id,
+            [(':status', str(status)), ('content-length', str(len(body)))]
+            + headers,
+            end_stream=not body,
+        )
+
+        # Send the body as far as the flow control window allows
+        while body:
+            window: int = min(
+                connection.local_flow_control_window(stream_id),
+                connection.max_outbound_frame_size,
+            )
+            if window <= 0:
+                connection_writer.write(connection.data_to_send())
+                window_updated.clear()
+                await window_updated.wait()
+                continue
+            connection.send_data(
+                stream_id,
+                body[:window],
+                end_stream=len(body) <= window,
+            )
+            body = body[window:]
+        connection_writer.write(connection.data_to_send())
+
+
+def run_server(
+    options: ServerOptions,
+    certificate_path: str,
+    key_path: str,
+    ports: multiprocessing.Queue,
+) -> None:
+    """Run the server until the process is terminated.
+    Arguments:
+        options {ServerOptions} -- Behaviour of the server
+        certificate_path {str} -- Path to the certificate
+        key_path {str} -- Path to the key
+        ports {multiprocessing.Queue} -- Receives the port of the server
+    """
+    ssl_context: ssl.SSLContext = ssl.create_default_context(
+        ssl.Purpose.CLIENT_AUTH,
+    )
+    ssl_context.load_cert_chain(certificate_path, key_path)
+    ssl_context.set_alpn_protocols(
+        ['h2', 'http/1.1'] if options.http2 else ['http/1.1'],
+    )
+
+    async def main() -> None:  # noqa: WPS430
+        mock_server: MockServer = MockServer(options)
+        server: asyncio.AbstractServer = await asyncio.start_server(
+            mock_server.serve,
+            '127.0.0.1',
+            0,
+            ssl=ssl_context,
+            backlog=1024,
+        )
+        ports.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def start_server(
+    options: ServerOptions,
+    certificate_path: str,
+    key_path: str,
+) -> Tuple[multiprocessing.Process, int]:
+    """Start the server in its own process, so it does not use the CPU of
+    the benchmarked process.
+    Arguments:
+        options {ServerOptions} -- Behaviour of the server
+        certificate_path {str} -- Path to the certificate
+        key_path {str} -- Path to the key
+    Returns:
+        Tuple[multiprocessing.Process, int] -- Server process and its port
+    """
+    ports: multiprocessing.Queue = multiprocessing.Queue()
+    process: multiprocessing.Process = multiprocessing.Process(
+        target=run_server,
+        args=(options, certificate_path, key_path, ports),
+        daemon=True,
+    )
+    process.start()
+    return process, ports.get(timeout=30)
@@ -9,16 +9,21 @@ setup(
     author='Yoast',
     url='https://github.com/Yoast/singer-tap-shopify-shops',
     classifiers=['Programming Language :: Python :: 3 :: Only'],
+    python_requires='>=3.8',
     py_modules=['tap_shopify_shops'],
     install_requires=[
         'httpx[http2]~=0.16.1',
         'python-dateutil~=2.8.1',
         'singer-python~=5.10.0',
         'google-cloud-bigquery~=3.0.0',
-        'pandas~=1.3.5',
-        'db-dtypes~=1.0.0',
         'protobuf==3.19.0'
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'simdjson': ['pysimdjson'],
+        'parquet': ['pyarrow'],
+        'test': ['pytest'],
+    },
     entry_points="""
         [console_scripts]
         tap-shopify-shops=tap_shopify_shops:main
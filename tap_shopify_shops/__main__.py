@@ -0,0 +1,5 @@
+"""Run tap with python -m tap_shopify_shops."""
+# -*- coding: utf-8 -*-
+from tap_shopify_shops.tap import main
+
+main()
@@ -0,0 +1,412 @@
+"""Columnar in-memory batches of cleaned rows."""
+# -*- coding: utf-8 -*-
+from array import array
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from tap_shopify_shops.streams import SHOP_ID_PREFIX
+
+
+class TextColumn(object):
+    """Column of arbitrary values, kept as a list."""
+
+    def __init__(self) -> None:
+        """Initialize the column."""
+        self.values: list = []
+
+    def __len__(self) -> int:
+        """Number of values.
+        Returns:
+            int -- Number of values
+        """
+        return len(self.values)
+
+    def extend(self, column_values: list) -> None:
+        """Append values.
+        Arguments:
+            column_values {list} -- Values
+        """
+        self.values.extend(column_values)
+
+    def to_list(self) -> list:
+        """Values of the column.
+        Returns:
+            list -- Values
+        """
+        return list(self.values)
+
+    def to_arrow(self, arrow_type: Any) -> Any:
+        """Values of the column as an Arrow array.
+        Arguments:
+            arrow_type {pyarrow.DataType} -- Type of the array
+        Returns:
+            pyarrow.Array -- Values
+        """
+        return _arrow_array(self.values, arrow_type)
+
+
+class IntegerColumn(TextColumn):
+    """Column of nullable integers in a typed array.
+    A value takes 9 bytes instead of a pointer to an int object.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the column."""
+        self.values: array = array('q')  # type: ignore
+        self.valid: bytearray = bytearray()
+
+    def extend(self, column_values: list) -> None:
+        """Append values.
+        Arguments:
+            column_values {list} -- Integers or None
+        Raises:
+            TypeError: When a value is not an integer
+            OverflowError: When an integer does not fit in 64 bits
+        """
+        # Converted first, so a failure leaves the column as it was
+        integers: array = array('q', [
+            column_value if column_value is not None else 0
+            for column_value in column_values
+        ])
+        self.values.extend(integers)
+        self.valid.extend(
+            column_value is not None for column_value in column_values
+        )
+
+    def to_list(self) -> list:
+        """Values of the column.
+        Returns:
+            list -- Integers or None
+        """
+        return [
+            column_value if is_valid else None
+            for column_value, is_valid in zip(self.values, self.valid)
+        ]
+
+    def to_arrow(self, arrow_type: Any) -> Any:
+        """Values of the column as an Arrow array, without a copy per value.
+        Arguments:
+            arrow_type {pyarrow.DataType} -- Type of the array
+        Returns:
+            pyarrow.Array -- Values
+        """
+        import pyarrow  # noqa: WPS433
+        from pyarrow import compute  # noqa: WPS433
+
+        integers: Any = pyarrow.Array.from_buffers(
+            pyarrow.int64(),
+            len(self.values),
+            [None, pyarrow.py_buffer(self.values)],
+        )
+        valid: Any = pyarrow.Array.from_buffers(
+            pyarrow.uint8(),
+            len(self.valid),
+            [None, pyarrow.py_buffer(self.valid)],
+        ).cast(pyarrow.bool_())
+        return compute.if_else(
+            valid,
+            integers,
+            pyarrow.scalar(None, pyarrow.int64()),
+        ).cast(arrow_type)
+
+
+class CategoryColumn(TextColumn):
+    """Column of repeated values, stored once with a code per row.
+    Every distinct value, e.g. a country, is kept once, a row only holds a
+    4-byte code.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the column."""
+        self.values: array = array('I')  # type: ignore
+        self.categories: Dict[Optional[str], int] = {}
+
+    def extend(self, column_values: list) -> None:
+        """Append values.
+        Arguments:
+            column_values {list} -- Hashable values
+        """
+        code: Callable = self.categories.setdefault
+        categories: Dict[Optional[str], int] = self.categories
+        self.values.extend(array('I', [
+            code(column_value, len(categories))
+            for column_value in column_values
+        ]))
+
+    def to_list(self) -> list:
+        """Values of the column.
+        Returns:
+            list -- Values
+        """
+        categories: list = list(self.categories)
+        return [categories[code] for code in self.values]
+
+    def to_arrow(self, arrow_type: Any) -> Any:
+        """Values of the column as an Arrow array, taken from the categories.
+        Arguments:
+            arrow_type {pyarrow.DataType} -- Type of the array
+        Returns:
+            pyarrow.Array -- Values
+        """
+        import pyarrow  # noqa: WPS433
+
+        codes: Any = pyarrow.Array.from_buffers(
+            pyarrow.uint32(),
+            len(self.values),
+            [None, pyarrow.py_buffer(self.values)],
+        )
+        return _arrow_array(list(self.categories), arrow_type).take(codes)
+
+
+class ColumnBatch(object):
+    """Columnar batch of rows of any stream, with a list per column."""
+
+    def __init__(self, columns: Iterable[str]) -> None:
+        """Initialize the batch.
+        Arguments:
+            columns {Iterable[str]} -- Columns, in the order of the schema
+        """
+        self.columns: Dict[str, TextColumn] = {
+            column: TextColumn() for column in columns
+        }
+        self._length: int = 0
+
+    def __len__(self) -> int:
+        """Number of rows.
+        Returns:
+            int -- Number of rows
+        """
+        return self._length
+
+    def __iter__(self) -> Iterator[dict]:
+        """Iterate the rows.
+        Yields:
+            Iterator[dict] -- Rows
+        """
+        columns: Dict[str, list] = self.to_pydict()
+        names: List[str] = list(columns)
+        for row_values in zip(*columns.values()):
+            yield dict(zip(names, row_values))
+
+    def extend(self, rows: List[dict]) -> None:
+        """Append rows, a column at a time.
+        Arguments:
+            rows {List[dict]} -- Cleaned rows
+        """
+        for column, column_store in self.columns.items():
+            column_store.extend([row.get(column) for row in rows])
+        self._length += len(rows)
+
+    def to_pydict(self) -> Dict[str, list]:
+        """Values per column.
+        Returns:
+            Dict[str, list] -- Values per column, in the order of the schema
+        """
+        return {
+            column: column_store.to_list()
+            for column, column_store in self.columns.items()
+        }
+
+    def integer_columns(self) -> FrozenSet[str]:
+        """Columns that hold only integers, in a typed array.
+        Returns:
+            FrozenSet[str] -- Columns
+        """
+        return frozenset(
+            column
+            for column, column_store in self.columns.items()
+            if isinstance(column_store, IntegerColumn)
+        )
+
+    def to_arrow(self, schema: Any) -> Any:
+        """Rows as an Arrow table.
+        Arguments:
+            schema {pyarrow.Schema} -- Schema of the table
+        Returns:
+            pyarrow.Table -- Rows
+        """
+        import pyarrow  # noqa: WPS433
+
+        return pyarrow.Table.from_arrays(
+            [self._to_arrow(field.name, field.type) for field in schema],
+            schema=schema,
+        )
+
+    def _to_arrow(self, column: str, arrow_type: Any) -> Any:
+        """Column as an Arrow array.
+        Arguments:
+            column {str} -- Column
+            arrow_type {pyarrow.DataType} -- Type of the array
+        Returns:
+            pyarrow.Array -- Values
+        """
+        return self.columns[column].to_arrow(arrow_type)
+
+
+class ShopBatch(ColumnBatch):
+    """Columnar batch of cleaned shopify_shops rows.
+    The counts and ids are typed arrays and the repeated values, such as the
+    country or extracted_at, are categories. The shop_id is derived from the
+    id for the whole batch when it is read, in one Arrow operation for the
+    Parquet output, and only stored for rows where it differs. A column that
+    holds an unexpected value falls back to a list.
+    """
+
+    # Column per property of the schema, in the order of the schema
+    COLUMNS: MappingProxyType = MappingProxyType({
+        'id': IntegerColumn,
+        'shop_name': TextColumn,
+        'city': CategoryColumn,
+        'province': CategoryColumn,
+        'country': CategoryColumn,
+        'currency': CategoryColumn,
+        'domain': TextColumn,
+        'url': TextColumn,
+        'shop_domain': TextColumn,
+        'description': TextColumn,
+        'published_collections_count': IntegerColumn,
+        'published_products_count': IntegerColumn,
+        'extracted_at': CategoryColumn,
+        '_sdc_deleted_at': CategoryColumn,
+    })
+
+    # Derived column, stored only where the derivation does not hold
+    DERIVED_COLUMN: str = 'shop_id'
+
+    def __init__(self) -> None:
+        """Initialize the batch."""
+        self.columns = {
+            column: column_type()
+            for column, column_type in self.COLUMNS.items()
+        }
+        self.shop_ids: Dict[int, Optional[str]] = {}
+        self._length = 0
+
+    def extend(self, rows: List[dict]) -> None:
+        """Append rows, a column at a time.
+        Arguments:
+            rows {List[dict]} -- Cleaned rows
+        """
+        for column, column_store in self.columns.items():
+            column_values: list = [row.get(column) for row in rows]
+            try:
+                column_store.extend(column_values)
+            except (TypeError, OverflowError):
+                fallback: TextColumn = TextColumn()
+                fallback.extend(column_store.to_list())
+                fallback.extend(column_values)
+                self.columns[column] = fallback
+
+        for offset, row in enumerate(rows):
+            shop_id: Optional[str] = row.get(self.DERIVED_COLUMN)
+            if shop_id != f'{SHOP_ID_PREFIX}{row.get("id")}':
+                self.shop_ids[self._length + offset] = shop_id
+        self._length += len(rows)
+
+    def to_pydict(self) -> Dict[str, list]:
+        """Values per column.
+        Returns:
+            Dict[str, list] -- Values per column, in the order of the schema
+        """
+        columns: Dict[str, list] = super().to_pydict()
+
+        # The shop_id comes before extracted_at in the schema
+        ordered: Dict[str, list] = {}
+        for column, column_values in columns.items():
+            if column == 'extracted_at':
+                ordered[self.DERIVED_COLUMN] = self._shop_ids(columns['id'])
+            ordered[column] = column_values
+        return ordered
+
+    def _to_arrow(self, column: str, arrow_type: Any) -> Any:
+        """Column as an Arrow array, with the shop_id derived at once.
+        Arguments:
+            column {str} -- Column
+            arrow_type {pyarrow.DataType} -- Type of the array
+        Returns:
+            pyarrow.Array -- Values
+        """
+        if column != self.DERIVED_COLUMN:
+            return super()._to_arrow(column, arrow_type)
+
+        ids: TextColumn = self.columns['id']
+        if self.shop_ids or not isinstance(ids, IntegerColumn):
+            return _arrow_array(self._shop_ids(ids.to_list()), arrow_type)
+
+        import pyarrow  # noqa: WPS433
+        from pyarrow import compute  # noqa: WPS433
+
+        return compute.binary_join_element_wise(
+            SHOP_ID_PREFIX,
+            ids.to_arrow(pyarrow.string()),
+            '',
+        ).cast(arrow_type)
+
+    def _shop_ids(self, ids: list) -> list:
+        """Derive the shop_id of every row.
+        Arguments:
+            ids {list} -- Values of the id column
+        Returns:
+            list -- Values of the shop_id column
+        """
+        shop_ids: list = [f'{SHOP_ID_PREFIX}{shop_id}' for shop_id in ids]
+        for index, shop_id in self.shop_ids.items():
+            shop_ids[index] = shop_id
+        return shop_ids
+
+
+# Batch type per stream
+BATCHES: MappingProxyType = MappingProxyType({
+    'shopify_shops': ShopBatch,
+})
+
+
+def _arrow_array(column_values: list, arrow_type: Any) -> Any:
+    """Create an Arrow array, converting values to strings if needed.
+    Arguments:
+        column_values {list} -- Values
+        arrow_type {pyarrow.DataType} -- Type of the array
+    Returns:
+        pyarrow.Array -- Values
+    """
+    import pyarrow  # noqa: WPS433
+
+    try:
+        return pyarrow.array(column_values, type=arrow_type)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        if not pyarrow.types.is_string(arrow_type):
+            raise
+    return pyarrow.array(
+        [
+            column_value if column_value is None else str(column_value)
+            for column_value in column_values
+        ],
+        type=arrow_type,
+    )
+
+
+def batch_for_stream(stream_name: str, columns: Iterable[str]) -> ColumnBatch:
+    """Create the batch for the rows of a stream.
+    Arguments:
+        stream_name {str} -- Name of the stream
+        columns {Iterable[str]} -- Columns, in the order of the schema
+    Returns:
+        ColumnBatch -- The compact batch of the stream if its columns match
+    """
+    columns = tuple(columns)
+    batch_type: Optional[type] = BATCHES.get(stream_name)
+    if batch_type is not None and set(columns) == {
+        *batch_type.COLUMNS,
+        batch_type.DERIVED_COLUMN,
+    }:
+        return batch_type()
+    return ColumnBatch(columns)
@@ -0,0 +1,462 @@
+"""Bulk output in compressed chunk files for load jobs."""
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from tap_shopify_shops.batch import ColumnBatch, batch_for_stream
+from tap_shopify_shops.output import (
+    DEFAULT_OUTPUT_BATCH_SIZE,
+    DEFAULT_STATE_INTERVAL_SECONDS,
+    SingerWriter,
+)
+
+# Defaults for the bulk output, can be overridden in the tap config
+DEFAULT_BULK_FORMAT: str = 'jsonl'
+DEFAULT_BULK_CHUNK_RECORDS: int = 100000
+DEFAULT_BULK_COMPRESSION_LEVEL: int = 6
+
+# Types of the BigQuery columns per JSON schema type
+BIGQUERY_TYPES: MappingProxyType = MappingProxyType({
+    'boolean': 'BOOLEAN',
+    'integer': 'INTEGER',
+    'number': 'FLOAT',
+    'string': 'STRING',
+})
+
+
+def column_types(schema: dict) -> Dict[str, str]:
+    """Type of every column of a stream.
+    Arguments:
+        schema {dict} -- JSON schema of the stream
+    Returns:
+        Dict[str, str] -- JSON schema type per column, e.g. number
+    """
+    columns: Dict[str, str] = {}
+    for column, column_schema in schema.get('properties', {}).items():
+        types: Any = column_schema.get('type', 'string')
+        if isinstance(types, str):
+            types = [types]
+        non_null: List[str] = [
+            json_type for json_type in types if json_type != 'null'
+        ]
+        json_type: str = non_null[0] if non_null else 'string'
+        columns[column] = json_type if json_type in BIGQUERY_TYPES else (
+            'string'
+        )
+    return columns
+
+
+class ChunkFile(object):
+    """Chunk file of gzipped newline-delimited JSON.
+    The chunk is written to a temporary file that is renamed when the chunk
+    is closed, so a loader never picks up half a chunk.
+    """
+
+    extension: str = '.jsonl.gz'
+    source_format: str = 'NEWLINE_DELIMITED_JSON'
+
+    def __init__(
+        self,
+        path: str,
+        columns: Dict[str, str],
+        compression_level: int = DEFAULT_BULK_COMPRESSION_LEVEL,
+        stream_name: str = '',
+    ) -> None:
+        """Initialize the chunk.
+        Arguments:
+            path {str} -- Path of the chunk file
+            columns {Dict[str, str]} -- JSON schema type per column
+        Keyword Arguments:
+            compression_level {int} -- Compression level from 1 to 9
+            stream_name {str} -- Name of the stream of the rows
+        """
+        self.path: str = path
+        self.columns: Dict[str, str] = columns
+        self.compression_level: int = compression_level
+        self.records: int = 0
+        self._temporary_path: str = f'{path}.tmp'
+        self._file: IO[bytes] = gzip.open(  # noqa: WPS515
+            self._temporary_path,
+            'wb',
+            compresslevel=compression_level,
+        )
+
+    def write(self, rows: List[dict]) -> None:
+        """Append rows to the chunk.
+        Arguments:
+            rows {List[dict]} -- Rows
+        """
+        lines: List[str] = [
+            json.dumps(row, default=str, separators=(',', ':'))
+            for row in rows
+        ]
+        lines.append('')
+        self._file.write('\n'.join(lines).encode('utf-8'))
+        self.records += len(rows)
+
+    def close(self) -> int:
+        """Finish the chunk file.
+        Returns:
+            int -- Size of the chunk file in bytes
+        """
+        self._file.close()
+        os.replace(self._temporary_path, self.path)
+        return os.path.getsize(self.path)
+
+
+class ParquetChunkFile(ChunkFile):
+    """Chunk file in Parquet, with a column per property of the schema.
+    The rows are kept in a columnar batch until the chunk is closed, a chunk
+    is a single row group. Number columns that the batch holds as integers,
+    such as the id, are written and loaded as integers.
+    """
+
+    extension: str = '.parquet'
+    source_format: str = 'PARQUET'
+
+    def __init__(
+        self,
+        path: str,
+        columns: Dict[str, str],
+        compression_level: int = DEFAULT_BULK_COMPRESSION_LEVEL,
+        stream_name: str = '',
+    ) -> None:
+        """Initialize the chunk.
+        Arguments:
+            path {str} -- Path of the chunk file
+            columns {Dict[str, str]} -- JSON schema type per column
+        Keyword Arguments:
+            compression_level {int} -- Compression level from 1 to 9
+            stream_name {str} -- Name of the stream of the rows
+        """
+        # Only needed for this format, so the others work without pyarrow
+        import pyarrow  # noqa: WPS433
+
+        self.path = path
+        self.columns = dict(columns)
+        self.compression_level = compression_level
+        self.records = 0
+        self._temporary_path = f'{path}.tmp'
+        self._batch: ColumnBatch = batch_for_stream(stream_name, columns)
+        self._arrow_types: Dict[str, Any] = {
+            'boolean': pyarrow.bool_(),
+            'integer': pyarrow.int64(),
+            'number': pyarrow.float64(),
+            'string': pyarrow.string(),
+        }
+
+    def write(self, rows: List[dict]) -> None:
+        """Append rows to the chunk.
+        Arguments:
+            rows {List[dict]} -- Rows
+        """
+        self._batch.extend(rows)
+        self.records += len(rows)
+
+    def close(self) -> int:
+        """Finish the chunk file.
+        Returns:
+            int -- Size of the chunk file in bytes
+        """
+        import pyarrow  # noqa: WPS433
+        from pyarrow import parquet  # noqa: WPS433
+
+        # The load job gets the same types as the file
+        for column in self._batch.integer_columns():
+            if self.columns.get(column) == 'number':
+                self.columns[column] = 'integer'
+        schema: Any = pyarrow.schema([
+            (column, self._arrow_types[json_type])
+            for column, json_type in self.columns.items()
+        ])
+
+        parquet.write_table(
+            self._batch.to_arrow(schema),
+            self._temporary_path,
+            compression='zstd',
+            compression_level=self.compression_level,
+        )
+        self._batch = ColumnBatch(())
+        os.replace(self._temporary_path, self.path)
+        return os.path.getsize(self.path)
+
+
+# Chunk file per bulk format
+CHUNK_FORMATS: MappingProxyType = MappingProxyType({
+    'jsonl': ChunkFile,
+    'parquet': ParquetChunkFile,
+})
+
+
+class BigQueryLoader(object):
+    """Load chunk files into a BigQuery table with load jobs."""
+
+    def __init__(self, table: str, credentials_path: str) -> None:
+        """Initialize the loader.
+        Arguments:
+            table {str} -- Table as project.dataset.table
+            credentials_path {str} -- Path to the service account json
+        """
+        self.table: str = table
+        self.credentials_path: str = credentials_path
+        self._client: Any = None
+
+    def load(self, chunk: ChunkFile) -> str:
+        """Append a chunk file to the table and wait for the job.
+        Arguments:
+            chunk {ChunkFile} -- Closed chunk file
+        Returns:
+            str -- Id of the load job
+        """
+        # Only needed for this loader, so offline runs work without GCP
+        from google.cloud import bigquery  # noqa: WPS433
+
+        if self._client is None:
+            self._client = bigquery.Client.from_service_account_json(
+                self.credentials_path,
+            )
+
+        job_config: Any = bigquery.LoadJobConfig(
+            source_format=chunk.source_format,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            schema=[
+                bigquery.SchemaField(column, BIGQUERY_TYPES[json_type])
+                for column, json_type in chunk.columns.items()
+            ],
+        )
+        with open(chunk.path, 'rb') as chunk_file:
+            job: Any = self._client.load_table_from_file(
+                chunk_file,
+                self.table,
+                job_config=job_config,
+            )
+        job.result()
+        return job.job_id
+
+
+class BulkWriter(SingerWriter):
+    """Write the records to compressed chunk files instead of stdout.
+    The chunks roll over every number of records or seconds. A STATE message
+    is only written after the chunk it covers is closed, and loaded when a
+    loader is set, so a run resumed from it never skips records. SCHEMA and
+    STATE messages are still written to stdout. A manifest lists the
+    finished chunks, the schemas and the latest state.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        file_format: str = DEFAULT_BULK_FORMAT,
+        chunk_records: int = DEFAULT_BULK_CHUNK_RECORDS,
+        compression_level: int = DEFAULT_BULK_COMPRESSION_LEVEL,
+        loader: Optional[BigQueryLoader] = None,
+        output: Optional[IO[str]] = None,
+        batch_size: int = DEFAULT_OUTPUT_BATCH_SIZE,
+        state_interval_seconds: float = DEFAULT_STATE_INTERVAL_SECONDS,
+    ) -> None:
+        """Initialize the writer.
+        Arguments:
+            directory {str} -- Directory of the chunk files and the manifest
+        Keyword Arguments:
+            file_format {str} -- jsonl or parquet
+            chunk_records {int} -- Records per chunk
+            compression_level {int} -- Compression level from 1 to 9
+            loader {Optional[BigQueryLoader]} -- Loads every finished chunk
+            output {Optional[IO[str]]} -- Output, defaults to stdout
+            batch_size {int} -- Records per write to the chunk
+            state_interval_seconds {float} -- Seconds before a chunk rolls
+        Raises:
+            ValueError: When the format is unknown
+        """
+        if file_format not in CHUNK_FORMATS:
+            raise ValueError(
+                f'Unknown bulk_format {file_format}, '
+                f'choose from: {", ".join(CHUNK_FORMATS)}',
+            )
+
+        super().__init__(
+            output=output,
+            batch_size=batch_size,
+            state_interval_records=chunk_records,
+            state_interval_seconds=state_interval_seconds,
+        )
+        self.directory: str = directory
+        self.file_format: str = file_format
+        self.compression_level: int = compression_level
+        self.loader: Optional[BigQueryLoader] = loader
+        self.run_id: str = datetime.now(timezone.utc).strftime(
+            '%Y%m%dT%H%M%SZ',
+        )
+        self.manifest_path: str = os.path.join(
+            directory,
+            f'manifest-{self.run_id}.json',
+        )
+        self.chunks: List[dict] = []
+        self.state: dict = {}
+
+        self._streams: Dict[str, Tuple[dict, list]] = {}
+        self._rows: List[dict] = []
+        self._stream: Optional[str] = None
+        self._chunk: Optional[ChunkFile] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write_schema(
+        self,
+        stream_name: str,
+        schema: dict,
+        key_properties: list,
+    ) -> None:
+        """Write a SCHEMA message and keep the schema for the chunks.
+        Arguments:
+            stream_name {str} -- Name of the stream
+            schema {dict} -- JSON schema
+            key_properties {list} -- Key properties
+        """
+        self._streams[stream_name] = (schema, key_properties)
+        super().write_schema(stream_name, schema, key_properties)
+
+    def write_record(self, stream_name: str, record: dict) -> None:
+        """Buffer a record for the chunk of its stream.
+        Arguments:
+            stream_name {str} -- Name of the stream
+            record {dict} -- Record
+        """
+        # A chunk only holds the records of one stream
+        if stream_name != self._stream:
+            self._roll()
+            self._stream = stream_name
+
+        self._rows.append(record)
+        self.records += 1
+        self._records_since_state += 1
+
+        if len(self._rows) >= self.batch_size:
+            self._write_rows()
+
+    def write_state(self, state: dict) -> None:
+        """Close the chunk and write the manifest and a STATE message.
+        Arguments:
+            state {dict} -- State
+        """
+        self._roll()
+        self.state = state
+        self._write_manifest()
+        super().write_state(state)
+
+    def _write_rows(self) -> None:
+        """Write the buffered rows to the chunk, opening it if needed."""
+        if not self._rows:
+            return
+
+        if self._chunk is None:
+            stream_name: str = self._stream  # type: ignore
+            chunk_file: type = CHUNK_FORMATS[self.file_format]
+            self._chunk = chunk_file(
+                os.path.join(
+                    self.directory,
+                    f'{stream_name}-{self.run_id}-'
+                    f'{len(self.chunks):05d}{chunk_file.extension}',
+                ),
+                column_types(self._streams.get(stream_name, ({}, []))[0]),
+                self.compression_level,
+                stream_name,
+            )
+        self._chunk.write(self._rows)  # type: ignore
+        self._rows = []
+
+    def _roll(self) -> None:
+        """Close the chunk and load it."""
+        self._write_rows()
+        if self._chunk is None:
+            return
+
+        chunk: ChunkFile = self._chunk
+        self._chunk = None
+        size: int = chunk.close()
+
+        entry: dict = {
+            'stream': self._stream,
+            'file': os.path.basename(chunk.path),
+            'format': self.file_format,
+            'records': chunk.records,
+            'bytes': size,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if self.loader is not None:
+            entry['load_job_id'] = self.loader.load(chunk)
+            entry['table'] = self.loader.table
+        self.chunks.append(entry)
+
+    def _write_manifest(self) -> None:
+        """Write the manifest.
+        The manifest is replaced at once, so a loader never reads half.
+        """
+        manifest: dict = {
+            'run_id': self.run_id,
+            'format': self.file_format,
+            'records': sum(chunk['records'] for chunk in self.chunks),
+            'streams': {
+                stream_name: {
+                    'schema': schema,
+                    'key_properties': key_properties,
+                }
+                for stream_name, (schema, key_properties)
+                in self._streams.items()
+            },
+            'chunks': self.chunks,
+            'state': self.state,
+        }
+        temporary_path: str = f'{self.manifest_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(temporary_path, self.manifest_path)
+
+
+def bulk_writer_from_config(config: dict) -> BulkWriter:
+    """Create the bulk writer from the tap config.
+    Arguments:
+        config {dict} -- Tap config with a bulk_output_dir
+    Returns:
+        BulkWriter -- The writer
+    """
+    loader: Optional[BigQueryLoader] = None
+    if config.get('bulk_bigquery_table'):
+        # Imported here, the default path is shared with the domain source
+        from tap_shopify_shops.sources import (  # noqa: WPS433
+            DEFAULT_BIGQUERY_CREDENTIALS_PATH,
+        )
+        loader = BigQueryLoader(
+            config['bulk_bigquery_table'],
+            config.get(
+                'bigquery_credentials_path',
+                DEFAULT_BIGQUERY_CREDENTIALS_PATH,
+            ),
+        )
+
+    return BulkWriter(
+        config['bulk_output_dir'],
+        file_format=config.get('bulk_format', DEFAULT_BULK_FORMAT),
+        chunk_records=int(
+            config.get('bulk_chunk_records', DEFAULT_BULK_CHUNK_RECORDS),
+        ),
+        compression_level=int(
+            config.get(
+                'bulk_compression_level',
+                DEFAULT_BULK_COMPRESSION_LEVEL,
+            ),
+        ),
+        loader=loader,
+        batch_size=int(
+            config.get('output_batch_size', DEFAULT_OUTPUT_BATCH_SIZE),
+        ),
+        state_interval_seconds=float(
+            config.get(
+                'state_interval_seconds',
+                DEFAULT_STATE_INTERVAL_SECONDS,
+            ),
+        ),
+    )
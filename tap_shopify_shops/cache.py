@@ -0,0 +1,200 @@
+"""Conditional request cache for meta.json responses."""
+# -*- coding: utf-8 -*-
+import json
+import logging
+import sqlite3
+import time
+from typing import NamedTuple, Optional
+
+# Defaults for the cache, can be overridden in the tap config
+DEFAULT_CACHE_TTL_DAYS: float = 7.0
+DEFAULT_CACHE_MAX_ENTRIES: int = 200000
+
+# Number of writes before the cache is committed to disk
+COMMIT_INTERVAL: int = 1000
+DAY: int = 86400
+
+CREATE_TABLE: str = """
+CREATE TABLE IF NOT EXISTS responses (
+    shop_domain TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+CREATE_INDEX: str = """
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)
+"""
+
+
+class CacheEntry(NamedTuple):
+    """Cached response of a shop."""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    payload: dict
+    fetched_at: float
+
+    def headers(self) -> dict:
+        """Headers for a conditional request.
+        Returns:
+            dict -- If-None-Match and If-Modified-Since headers
+        """
+        headers: dict = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """On-disk SQLite cache with validators and parsed payloads by shop."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl_days: float = DEFAULT_CACHE_TTL_DAYS,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ) -> None:
+        """Initialize the cache.
+        Arguments:
+            path {str} -- Path to the SQLite database
+        Keyword Arguments:
+            ttl_days {float} -- Days before an entry expires
+            max_entries {int} -- Maximum number of entries in the cache
+        """
+        self.ttl: float = ttl_days * DAY
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self.uncacheable: int = 0
+        self._writes: int = 0
+
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(CREATE_TABLE)
+        self.connection.execute(CREATE_INDEX)
+        self.connection.commit()
+
+    def get(self, shop_domain: str) -> Optional[CacheEntry]:
+        """Retrieve the cached response of a shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        Returns:
+            Optional[CacheEntry] -- The entry or None if missing or expired
+        """
+        row: Optional[tuple] = self.connection.execute(
+            'SELECT etag, last_modified, payload, fetched_at '
+            'FROM responses WHERE shop_domain = ?',
+            (shop_domain,),
+        ).fetchone()
+
+        if row is None or row[3] < time.time() - self.ttl:
+            return None
+
+        etag, last_modified, payload, fetched_at = row
+        return CacheEntry(etag, last_modified, json.loads(payload), fetched_at)
+
+    def hit(self, shop_domain: str) -> None:
+        """Register that the server confirmed the cached response.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        """
+        self.hits += 1
+        now: float = time.time()
+        self._write(
+            'UPDATE responses SET fetched_at = ?, accessed_at = ? '
+            'WHERE shop_domain = ?',
+            (now, now, shop_domain),
+        )
+
+    def put(
+        self,
+        shop_domain: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        payload: dict,
+    ) -> None:
+        """Store the response of a shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            etag {Optional[str]} -- ETag header of the response
+            last_modified {Optional[str]} -- Last-Modified header
+            payload {dict} -- Parsed response
+        """
+        # Without validators the response can never be revalidated
+        if not etag and not last_modified:
+            self.uncacheable += 1
+            return
+
+        self.misses += 1
+        now: float = time.time()
+        self._write(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+            (shop_domain, etag, last_modified, json.dumps(payload), now, now),
+        )
+
+    def evict(self) -> None:
+        """Remove expired entries and the least recently used overflow."""
+        self.connection.execute(
+            'DELETE FROM responses WHERE fetched_at < ?',
+            (time.time() - self.ttl,),
+        )
+        self.connection.execute(
+            'DELETE FROM responses WHERE shop_domain IN ('
+            'SELECT shop_domain FROM responses '
+            'ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Evict entries and close the database."""
+        self.evict()
+        self.connection.close()
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the cache statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        logger.info(
+            f'Response cache: {self.hits} not modified, '
+            f'{self.misses} downloaded and stored, '
+            f'{self.uncacheable} without validators',
+        )
+
+    def _write(self, query: str, parameters: tuple) -> None:
+        """Execute a write and commit periodically.
+        Arguments:
+            query {str} -- SQL query
+            parameters {tuple} -- Query parameters
+        """
+        self.connection.execute(query, parameters)
+        self._writes += 1
+        if not self._writes % COMMIT_INTERVAL:
+            self.connection.commit()
+
+
+def cache_from_config(config: dict) -> Optional[ResponseCache]:
+    """Create the response cache if it is enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[ResponseCache] -- The cache or None if it is disabled
+    """
+    path: Optional[str] = config.get('cache_path')
+    if not path:
+        return None
+
+    return ResponseCache(
+        path,
+        ttl_days=float(config.get('cache_ttl_days', DEFAULT_CACHE_TTL_DAYS)),
+        max_entries=int(
+            config.get('cache_max_entries', DEFAULT_CACHE_MAX_ENTRIES),
+        ),
+    )
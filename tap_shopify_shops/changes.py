@@ -0,0 +1,220 @@
+"""Change data capture index."""
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import List, Optional
+
+# Defaults for change data capture, can be overridden in the tap config
+DEFAULT_TOMBSTONE_AFTER_RUNS: int = 3
+
+# Column that marks a record as deleted
+DELETED_AT: str = '_sdc_deleted_at'
+
+# Key of the start of an interrupted run in the state of a stream
+RUN_STARTED: str = 'cdc_run_started'
+
+CREATE_TABLE: str = """
+CREATE TABLE IF NOT EXISTS records (
+    stream TEXT NOT NULL,
+    key TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    record TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    missed_runs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stream, key)
+)
+"""
+
+
+def record_digest(row: dict, excluded: frozenset) -> str:
+    """Create a digest of the content of a record.
+    Arguments:
+        row {dict} -- Record
+        excluded {frozenset} -- Fields that are not part of the content
+    Returns:
+        str -- Hex digest
+    """
+    content: dict = {
+        key: row_value
+        for key, row_value in row.items()
+        if key not in excluded
+    }
+    serialized: bytes = json.dumps(
+        content,
+        sort_keys=True,
+        default=str,
+    ).encode('utf-8')
+    return hashlib.blake2b(serialized, digest_size=16).hexdigest()
+
+
+class ChangeIndex(object):
+    """Local index with a content digest of every record of the last runs.
+    The index is only committed with commit(), after the STATE that covers
+    the records was written. A run that stops before then sees its records
+    as changed again, instead of skipping records the target never got.
+    The start of the run is saved with the STATE, so a resumed run does not
+    count the records seen before the interruption as missed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        tombstones: bool = False,
+        tombstone_after_runs: int = DEFAULT_TOMBSTONE_AFTER_RUNS,
+    ) -> None:
+        """Initialize the index.
+        Arguments:
+            path {str} -- Path to the SQLite database
+        Keyword Arguments:
+            tombstones {bool} -- Whether to emit vanished records as deleted
+            tombstone_after_runs {int} -- Runs a record must be missing
+        """
+        self.tombstones: bool = tombstones
+        self.tombstone_after_runs: int = tombstone_after_runs
+        self.run_started: float = time.time()
+        self.changed: int = 0
+        self.unchanged: int = 0
+
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(CREATE_TABLE)
+        self.connection.commit()
+
+    def has_changed(
+        self,
+        stream: str,
+        key: str,
+        row: dict,
+        excluded: frozenset,
+    ) -> bool:
+        """Register a record and check whether its content changed.
+        Arguments:
+            stream {str} -- Name of the stream
+            key {str} -- Value that identifies the record
+            row {dict} -- Record
+            excluded {frozenset} -- Fields that are not part of the content
+        Returns:
+            bool -- Whether the record is new or changed since the last run
+        """
+        digest: str = record_digest(row, excluded)
+        stored: Optional[tuple] = self.connection.execute(
+            'SELECT digest FROM records WHERE stream = ? AND key = ?',
+            (stream, key),
+        ).fetchone()
+
+        if stored is not None and stored[0] == digest:
+            self.unchanged += 1
+            self.connection.execute(
+                'UPDATE records SET last_seen = ?, missed_runs = 0 '
+                'WHERE stream = ? AND key = ?',
+                (self.run_started, stream, key),
+            )
+            return False
+
+        self.changed += 1
+        self.connection.execute(
+            'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, 0)',
+            (
+                stream,
+                key,
+                digest,
+                json.dumps(row, default=str),
+                self.run_started,
+            ),
+        )
+        return True
+
+    def checkpoint(self) -> dict:
+        """Progress of the run to save in the state.
+        Returns:
+            dict -- Start of the run
+        """
+        return {RUN_STARTED: self.run_started}
+
+    def resume(self, stream_state: Optional[dict]) -> None:
+        """Continue the run that was interrupted, if the state has one.
+        Arguments:
+            stream_state {Optional[dict]} -- State of the stream
+        """
+        run_started: Optional[float] = (stream_state or {}).get(RUN_STARTED)
+        if run_started is not None:
+            self.run_started = float(run_started)
+
+    def finish_run(self, stream: str) -> List[dict]:
+        """Finish the run of a stream and collect the vanished records.
+        Records that were not seen in this run are counted as missed. Once a
+        record is missed for enough runs in a row, it is removed from the
+        index and returned so it can be emitted as deleted. Like the other
+        changes, this is committed after the next STATE.
+        Arguments:
+            stream {str} -- Name of the stream
+        Returns:
+            List[dict] -- Last known content of the vanished records
+        """
+        self.connection.execute(
+            'UPDATE records SET missed_runs = missed_runs + 1 '
+            'WHERE stream = ? AND last_seen < ?',
+            (stream, self.run_started),
+        )
+
+        vanished: List[dict] = []
+        if self.tombstones:
+            vanished = [
+                json.loads(record)
+                for (record,) in self.connection.execute(
+                    'SELECT record FROM records '
+                    'WHERE stream = ? AND missed_runs >= ?',
+                    (stream, self.tombstone_after_runs),
+                )
+            ]
+            self.connection.execute(
+                'DELETE FROM records WHERE stream = ? AND missed_runs >= ?',
+                (stream, self.tombstone_after_runs),
+            )
+        return vanished
+
+    def commit(self) -> None:
+        """Commit the changes once a STATE covers their records."""
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Commit and close the index."""
+        self.connection.commit()
+        self.connection.close()
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the change statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        logger.info(
+            f'Change data capture: {self.changed} new or changed, '
+            f'{self.unchanged} unchanged',
+        )
+
+
+def change_index_from_config(config: dict) -> Optional[ChangeIndex]:
+    """Create the change index if change data capture is enabled.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[ChangeIndex] -- The index or None if it is disabled
+    """
+    path: Optional[str] = config.get('cdc_index_path')
+    if not path:
+        return None
+
+    return ChangeIndex(
+        path,
+        tombstones=bool(config.get('cdc_tombstones', False)),
+        tombstone_after_runs=int(
+            config.get(
+                'cdc_tombstone_after_runs',
+                DEFAULT_TOMBSTONE_AFTER_RUNS,
+            ),
+        ),
+    )
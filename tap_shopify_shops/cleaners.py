@@ -3,8 +3,7 @@
 from decimal import Decimal
 from types import MappingProxyType
 from tap_shopify_shops.streams import STREAMS
-from dateutil.parser import parse as parse_d
-from typing import Any, Optional
+from typing import Any, Callable, List, Optional
 import collections
 
 class ConvertionError(ValueError):
@@ -80,39 +79,67 @@ def clean_row(row: dict, mapping: dict) -> dict:
 
     return cleaned
 
+def compile_cleaner(mapping: dict) -> Callable[[dict], dict]:
+    """Compile the mapping into a cleaner function.
+    The cleaner does the same as clean_row, but the mapping is only read
+    once: every key becomes a line of a generated function, so cleaning a
+    row is a single straight-line pass without any mapping lookups.
+    Keys without a type are copied, or converted to None when empty and
+    nullable, without calling to_type_or_null.
+    Arguments:
+        mapping {dict} -- Input mapping
+    Returns:
+        Callable[[dict], dict] -- Cleaner that takes a row
+    """
+    namespace: dict = {'to_type_or_null': to_type_or_null}
+    lines: List[str] = []
+
+    key: str
+    key_mapping: dict
+
+    for index, (key, key_mapping) in enumerate(mapping.items()):
+        new_mapping: str = key_mapping.get('map') or key
+        data_type: Optional[Any] = key_mapping.get('type')
+        nullable: bool = key_mapping.get('null', True)
+
+        if data_type:
+            namespace[f'type_{index}'] = data_type
+            expression: str = (
+                f'to_type_or_null(row[{key!r}], type_{index}, {nullable!r})'
+            )
+        elif nullable:
+            expression = f'row[{key!r}] or None'
+        else:
+            expression = f'row[{key!r}]'
+        lines.append(f'        {new_mapping!r}: {expression},')
+
+    source: str = '\n'.join([
+        'def clean(row):',
+        '    return {',
+        *lines,
+        '    }',
+    ])
+    exec(compile(source, '<cleaner>', 'exec'), namespace)  # noqa: S102
+    return namespace['clean']
+
+# Compile the mappings once at import
+COMPILED_CLEANERS: MappingProxyType = MappingProxyType({
+    stream_id: compile_cleaner(stream['mapping'])
+    for stream_id, stream in STREAMS.items()
+})
+
 def clean_shopify_shops(
     date_day: str,
     response_data: dict,
 ) -> dict:
     """Clean shopify_partners_shops.
         Arguments:
+            date_day {str} -- date of the scrape
             response_data {dict} -- input response_data
         Returns:
             dict -- cleaned response_data
         """
-    # Get the mapping from the STREAMS
-    mapping: Optional[dict] = STREAMS['shopify_shops'].get(
-        'mapping',
-    )
-
-    cleaned_data: dict = {
-        "id": response_data.id,
-        "name": response_data.name,
-        "city": response_data.city,
-        "province": response_data.province,
-        "country": response_data.country,
-        "currency": response_data.currency,
-        "domain": response_data.domain,
-        "url": response_data.url,
-        "myshopify_domain": response_data.myshopify_domain,
-        "description": response_data.description,
-        "published_collections_count": response_data.published_collections_count,
-        "published_products_count": response_data.published_products_count,
-        "shop_id": response_data.shop_id,
-        "extracted_at": response_data.extracted_at
-    }
-
-    return clean_row(cleaned_data, mapping)
+    return COMPILED_CLEANERS['shopify_shops'](response_data)
 
 # Collect all cleaners
 CLEANERS: MappingProxyType = MappingProxyType({
@@ -0,0 +1,159 @@
+"""JSON decoders for meta.json responses."""
+# -*- coding: utf-8 -*-
+import json
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Optional
+
+# Backends in order of preference
+BACKENDS: tuple = ('orjson', 'simdjson', 'json')
+
+
+class JsonDecoder(object):
+    """Decode a response body and keep only the requested fields.
+    The body is decoded straight from bytes. Fields that are missing from
+    the document are left out of the result.
+    """
+
+    name: str = 'json'
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        """Initialize the decoder.
+        Arguments:
+            fields {Iterable[str]} -- Fields to keep
+        """
+        self.fields: tuple = tuple(fields)
+
+    def decode(self, body: bytes) -> dict:
+        """Decode the body.
+        Arguments:
+            body {bytes} -- Response body
+        Raises:
+            ValueError: When the body is not a json object
+        Returns:
+            dict -- The requested fields of the document
+        """
+        document: Any = self._loads(body)
+        if not isinstance(document, dict):
+            raise ValueError('The body is not a json object')
+
+        return {
+            field: document[field]
+            for field in self.fields
+            if field in document
+        }
+
+    def _loads(self, body: bytes) -> Any:
+        """Parse the body.
+        Arguments:
+            body {bytes} -- Response body
+        Returns:
+            Any -- Parsed document
+        """
+        return json.loads(body)
+
+
+class OrjsonDecoder(JsonDecoder):
+    """Decoder with the orjson backend."""
+
+    name: str = 'orjson'
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        """Initialize the decoder.
+        Arguments:
+            fields {Iterable[str]} -- Fields to keep
+        """
+        super().__init__(fields)
+        import orjson  # noqa: WPS433
+        self._orjson_loads: Callable = orjson.loads
+
+    def _loads(self, body: bytes) -> Any:
+        """Parse the body.
+        Arguments:
+            body {bytes} -- Response body
+        Returns:
+            Any -- Parsed document
+        """
+        return self._orjson_loads(body)
+
+
+class SimdjsonDecoder(JsonDecoder):
+    """Decoder with the simdjson backend.
+    The document is parsed lazily, only the requested fields are converted
+    to Python objects.
+    """
+
+    name: str = 'simdjson'
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        """Initialize the decoder.
+        Arguments:
+            fields {Iterable[str]} -- Fields to keep
+        """
+        super().__init__(fields)
+        import simdjson  # noqa: WPS433
+        self._object_type: type = simdjson.Object
+        self._parser: Any = simdjson.Parser()
+
+    def decode(self, body: bytes) -> dict:
+        """Decode the body.
+        Arguments:
+            body {bytes} -- Response body
+        Raises:
+            ValueError: When the body is not a json object
+        Returns:
+            dict -- The requested fields of the document
+        """
+        # The parser reuses its buffers, the document is only valid until
+        # the next parse, so the fields are converted right away
+        document: Any = self._parser.parse(body)
+        if not isinstance(document, self._object_type):
+            raise ValueError('The body is not a json object')
+
+        projected: dict = {}
+        for field in self.fields:
+            if field in document:
+                field_value: Any = document[field]
+                if hasattr(field_value, 'as_dict'):
+                    field_value = field_value.as_dict()
+                elif hasattr(field_value, 'as_list'):
+                    field_value = field_value.as_list()
+                projected[field] = field_value
+        return projected
+
+
+# Collect all decoders
+DECODERS: MappingProxyType = MappingProxyType({
+    'orjson': OrjsonDecoder,
+    'simdjson': SimdjsonDecoder,
+    'json': JsonDecoder,
+})
+
+
+def create_decoder(
+    fields: Iterable[str],
+    backend: Optional[str] = None,
+) -> JsonDecoder:
+    """Create a decoder with the requested or the fastest available backend.
+    Arguments:
+        fields {Iterable[str]} -- Fields to keep
+    Keyword Arguments:
+        backend {Optional[str]} -- orjson, simdjson or json, default fastest
+    Raises:
+        ValueError: When the backend is unknown
+    Returns:
+        JsonDecoder -- The decoder
+    """
+    if backend:
+        if backend not in DECODERS:
+            raise ValueError(
+                f'Unknown json_backend {backend}, '
+                f'choose from: {", ".join(BACKENDS)}',
+            )
+        return DECODERS[backend](fields)
+
+    for name in BACKENDS:
+        try:
+            return DECODERS[name](fields)
+        except ImportError:
+            continue
+    return JsonDecoder(fields)
@@ -1,17 +1,77 @@
 """Discover."""
 # -*- coding: utf-8 -*-
+import copy
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
 from singer import metadata
 from singer.catalog import Catalog, CatalogEntry
 
-from tap_shopify_shops.schema import load_schemas
+from tap_shopify_shops.schema import load_schemas, schema_hash
 from tap_shopify_shops.streams import STREAMS
 
 
-def discover() -> Catalog:  # noqa: WPS210
+def discover(snapshot_path: Optional[str] = None) -> Catalog:
     """Load the Stream catalog.
+    The catalog is built once per process, but every call gets its own
+    Catalog, so a caller can change it. With a snapshot path, it is read
+    from a snapshot, which is written again when the schemas changed.
+    Keyword Arguments:
+        snapshot_path {Optional[str]} -- Path to the catalog snapshot
     Returns:
         Catalog -- The catalog
     """
+    if not snapshot_path:
+        return Catalog.from_dict(copy.deepcopy(_build_catalog()))
+
+    current_hash: str = schema_hash()
+    snapshot: Optional[dict] = _read_snapshot(snapshot_path)
+    if snapshot is not None and snapshot.get('schema_hash') == current_hash:
+        return Catalog.from_dict(snapshot['catalog'])
+
+    catalog: dict = _build_catalog()
+    _write_snapshot(snapshot_path, {
+        'schema_hash': current_hash,
+        'catalog': catalog,
+    })
+    return Catalog.from_dict(copy.deepcopy(catalog))
+
+
+def _read_snapshot(snapshot_path: str) -> Optional[dict]:
+    """Read a catalog snapshot.
+    Arguments:
+        snapshot_path {str} -- Path to the catalog snapshot
+    Returns:
+        Optional[dict] -- The snapshot or None if it is missing or corrupt
+    """
+    try:
+        with open(snapshot_path, encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(snapshot_path: str, snapshot: dict) -> None:
+    """Write a catalog snapshot.
+    The snapshot is replaced at once, so concurrent runs never read half.
+    Arguments:
+        snapshot_path {str} -- Path to the catalog snapshot
+        snapshot {dict} -- Schema hash and catalog
+    """
+    temporary_path: str = f'{snapshot_path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary_path, snapshot_path)
+
+
+@lru_cache(maxsize=None)
+def _build_catalog() -> dict:  # noqa: WPS210
+    """Build the Stream catalog from the schemas, once per process.
+    Returns:
+        dict -- The catalog as a dict, copied by every caller
+    """
     raw_schemas: dict = load_schemas()
     streams: list = []
 
@@ -51,4 +111,4 @@ def discover() -> Catalog:  # noqa: WPS210
                 ),
             ),
         )
-    return Catalog(streams)
\ No newline at end of file
+    return Catalog(streams).to_dict()
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Index of the shop behind every domain, to skip aliases."""
+# -*- coding: utf-8 -*-
+import logging
+import sqlite3
+import time
+from typing import Any, Optional, Set
+
+from tap_shopify_shops.sources import normalize_domain
+
+# Defaults for the domain index, can be overridden in the tap config
+DEFAULT_DOMAIN_INDEX_TTL_DAYS: float = 30.0
+
+# Number of writes before the index is committed to disk
+COMMIT_INTERVAL: int = 1000
+DAY: int = 86400
+
+# Fields of a response with other domains of the same shop
+ALIAS_FIELDS: tuple = ('myshopify_domain', 'domain')
+
+CREATE_TABLE: str = """
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    shop_id TEXT NOT NULL,
+    seen_at REAL NOT NULL
+)
+"""
+
+
+class DomainIndex(object):
+    """On-disk SQLite index with the last known shop id of every domain.
+    Every response maps the requested domain, and the myshopify and primary
+    domain of the shop, to the shop id. A domain that maps to a shop that
+    was already scraped in this run is an alias and is skipped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_days: float = DEFAULT_DOMAIN_INDEX_TTL_DAYS,
+    ) -> None:
+        """Initialize the index.
+        Arguments:
+            path {str} -- Path to the SQLite database
+        Keyword Arguments:
+            ttl_days {float} -- Days before a mapping is verified again
+        """
+        self.ttl: float = ttl_days * DAY
+        self.scraped: Set[str] = set()
+        self.skipped: int = 0
+        self._writes: int = 0
+
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(CREATE_TABLE)
+        self.connection.commit()
+
+    def is_alias(self, shop_domain: str) -> bool:
+        """Check whether the shop of a domain was already scraped.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        Returns:
+            bool -- Whether the domain can be skipped
+        """
+        if not self.scraped:
+            return False
+
+        row: Optional[tuple] = self.connection.execute(
+            'SELECT shop_id, seen_at FROM domains WHERE domain = ?',
+            (shop_domain,),
+        ).fetchone()
+
+        # An old mapping is verified, the domain may have moved
+        if row is None or row[1] < time.time() - self.ttl:
+            return False
+        if row[0] not in self.scraped:
+            return False
+
+        self.skipped += 1
+        return True
+
+    def observe(self, shop_domain: str, response: dict) -> None:
+        """Register the shop behind a domain.
+        Arguments:
+            shop_domain {str} -- Requested domain
+            response {dict} -- Parsed response
+        """
+        shop_id: Any = response.get('id')
+        if shop_id is None or isinstance(shop_id, (bool, dict, list)):
+            return
+
+        key: str = str(shop_id)
+        self.scraped.add(key)
+
+        domains: Set[str] = {shop_domain}
+        for field in ALIAS_FIELDS:
+            alias: Any = response.get(field)
+            if alias and isinstance(alias, str):
+                domains.add(normalize_domain(alias))
+        domains.discard('')
+
+        now: float = time.time()
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO domains VALUES (?, ?, ?)',
+            [(domain, key, now) for domain in domains],
+        )
+        self._writes += 1
+        if not self._writes % COMMIT_INTERVAL:
+            self.connection.commit()
+
+    def close(self) -> None:
+        """Commit and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the index statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        logger.info(
+            f'Domain index: {len(self.scraped)} shops scraped, '
+            f'{self.skipped} aliases skipped',
+        )
+
+
+def domain_index_from_config(config: dict) -> Optional[DomainIndex]:
+    """Create the domain index if it is enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[DomainIndex] -- The index or None if it is disabled
+    """
+    path: Optional[str] = config.get('domain_index_path')
+    if not path:
+        return None
+
+    return DomainIndex(
+        path,
+        ttl_days=float(
+            config.get('domain_index_ttl_days', DEFAULT_DOMAIN_INDEX_TTL_DAYS),
+        ),
+    )
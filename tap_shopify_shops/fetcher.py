@@ -0,0 +1,633 @@
+"""Asynchronous meta.json fetcher."""
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+import weakref
+from collections import Counter, deque
+from itertools import chain, islice
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import httpcore
+import httpx
+import singer
+
+from tap_shopify_shops.cache import CacheEntry, ResponseCache
+from tap_shopify_shops.decoders import JsonDecoder, create_decoder
+from tap_shopify_shops.domains import DomainIndex
+from tap_shopify_shops.metrics import RunMetrics, timed
+from tap_shopify_shops.ratelimit import (
+    DEFAULT_MAX_REQUESTS_PER_SECOND,
+    DEFAULT_MIN_REQUESTS_PER_SECOND,
+    DEFAULT_REQUESTS_PER_SECOND,
+    AdaptiveRateLimiter,
+)
+from tap_shopify_shops.resolver import Resolver
+from tap_shopify_shops.retry import DeadLetterFile, FetchError, RetryPolicy
+from tap_shopify_shops.schedule import Scheduler
+from tap_shopify_shops.streams import RESPONSE_FIELDS
+
+# URL of the meta.json of a shop, can be overridden in the tap config
+DEFAULT_URL_TEMPLATE: str = 'https://{shop_domain}/meta.json'
+
+# Defaults for the fetch engine, can be overridden in the tap config
+DEFAULT_CONCURRENCY: int = 50
+
+# Number of times a throttled shop is requested again
+MAX_THROTTLE_RETRIES: int = 3
+
+# Defaults for the connection pool, can be overridden in the tap config
+DEFAULT_HTTP2: bool = True
+DEFAULT_MAX_CONNECTIONS: int = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS: int = 50
+DEFAULT_KEEPALIVE_EXPIRY: float = 30.0
+DEFAULT_TIMEOUT: float = 10.0
+DEFAULT_SSL_VERIFY: bool = True
+
+# Number of domains read from the domain source at once
+DOMAIN_CHUNK_SIZE: int = 500
+
+
+async def iterate_in_thread(
+    iterable: Iterable[str],
+    chunk_size: int = DOMAIN_CHUNK_SIZE,
+) -> AsyncGenerator[str, None]:
+    """Iterate a blocking iterable in a worker thread.
+    Reading the domain source, e.g. waiting for the next page of a query,
+    then does not block the fetches running on the event loop.
+    Arguments:
+        iterable {Iterable[str]} -- Blocking iterable
+    Keyword Arguments:
+        chunk_size {int} -- Number of items read per call
+    Yields:
+        AsyncGenerator[str, None] -- Items of the iterable
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+    iterator: Iterator[str] = iter(iterable)
+
+    while True:
+        chunk: List[str] = await loop.run_in_executor(
+            None,
+            lambda: list(islice(iterator, chunk_size)),
+        )
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
+
+
+class Progress(object):
+    """Position of the scrape in the domain source, to resume a scrape.
+    The cursor counts the domains read from the source. The domains that
+    were read, but whose response has not been yielded yet, are in flight.
+    A resumed scrape fetches the domains in flight first and then skips the
+    domains before the cursor.
+    """
+
+    def __init__(
+        self,
+        cursor: int = 0,
+        in_flight: Iterable[str] = (),
+    ) -> None:
+        """Initialize the progress.
+        Keyword Arguments:
+            cursor {int} -- Number of domains read from the source
+            in_flight {Iterable[str]} -- Domains read but not finished
+        """
+        self.cursor: int = cursor
+        # Dictionary as an ordered set
+        self.in_flight: Dict[str, None] = dict.fromkeys(in_flight)
+        self._replay: List[str] = list(self.in_flight)
+
+    def resume(self, shop_domains: Iterable[str]) -> Iterator[str]:
+        """Continue the domains where the last scrape stopped.
+        Arguments:
+            shop_domains {Iterable[str]} -- Domains of the shops
+        Yields:
+            Iterator[str] -- Domains that were not finished
+        """
+        yield from self._replay
+        yield from islice(shop_domains, self.cursor, None)
+
+    def start(self, shop_domain: str) -> None:
+        """Register a domain that is read from the resumed domains.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        """
+        # The replayed domains are already in flight and counted
+        if self._replay:
+            self._replay.pop(0)
+            return
+        self.cursor += 1
+        self.in_flight[shop_domain] = None
+
+    def finish(self, shop_domain: str) -> None:
+        """Register a domain whose response was yielded or that failed.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        """
+        self.in_flight.pop(shop_domain, None)
+
+    def to_state(self) -> dict:
+        """Progress for the Singer state.
+        Returns:
+            dict -- Cursor and domains in flight
+        """
+        return {
+            'cursor': self.cursor,
+            'in_flight': list(self.in_flight),
+        }
+
+
+class PoolStats(object):
+    """Statistics about the reuse of pooled connections."""
+
+    def __init__(self, transport: httpcore.AsyncConnectionPool) -> None:
+        """Initialize the statistics.
+        Arguments:
+            transport {httpcore.AsyncConnectionPool} -- Connection pool
+        """
+        self.transport: httpcore.AsyncConnectionPool = transport
+        self.requests: int = 0
+        self.handshakes: int = 0
+        self.peak_size: int = 0
+        self.http_versions: Counter = Counter()
+        self._seen: weakref.WeakSet = weakref.WeakSet()
+
+    def observe(self, response: httpx.Response) -> int:
+        """Register a response and inspect the connections in the pool.
+        Every connection that was not in the pool before was set up with a
+        new handshake.
+        Arguments:
+            response {httpx.Response} -- Response
+        Returns:
+            int -- Number of new handshakes
+        """
+        self.requests += 1
+        self.http_versions[response.http_version] += 1
+
+        # The pool does not expose its connections publicly
+        get_connections = getattr(
+            self.transport,
+            '_get_all_connections',
+            set,
+        )
+        connections: set = get_connections()
+        self.peak_size = max(self.peak_size, len(connections))
+
+        handshakes: int = 0
+        for connection in connections:
+            if connection not in self._seen:
+                self._seen.add(connection)
+                handshakes += 1
+        self.handshakes += handshakes
+        return handshakes
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of the requests that reused an open connection.
+        Returns:
+            float -- Reuse ratio between 0 and 1
+        """
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.handshakes / self.requests)
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        versions: str = ', '.join(
+            f'{version}: {count}'
+            for version, count in sorted(self.http_versions.items())
+        )
+        logger.info(
+            f'Connection pool: {self.requests} requests, '
+            f'{self.handshakes} handshakes, '
+            f'peak pool size {self.peak_size}, '
+            f'reuse ratio {self.reuse_ratio:.2%} ({versions})',
+        )
+
+
+def create_client(config: dict) -> httpx.AsyncClient:
+    """Create the pooled HTTP client used for all fetches.
+    Connections are kept alive and, where the server supports it, requests
+    are multiplexed over HTTP/2.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        httpx.AsyncClient -- HTTP client
+    """
+    http2: bool = bool(config.get('http2', DEFAULT_HTTP2))
+
+    # Either a boolean or the path to a CA bundle
+    ssl_verify: Union[bool, str] = config.get('ssl_verify', DEFAULT_SSL_VERIFY)
+
+    transport: httpcore.AsyncConnectionPool = httpcore.AsyncConnectionPool(
+        ssl_context=httpx.create_ssl_context(verify=ssl_verify, http2=http2),
+        max_connections=int(
+            config.get('max_connections', DEFAULT_MAX_CONNECTIONS),
+        ),
+        max_keepalive_connections=int(
+            config.get(
+                'max_keepalive_connections',
+                DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        ),
+        keepalive_expiry=float(
+            config.get('keepalive_expiry', DEFAULT_KEEPALIVE_EXPIRY),
+        ),
+        http2=http2,
+    )
+    return httpx.AsyncClient(
+        http2=http2,
+        transport=transport,
+        timeout=float(config.get('timeout', DEFAULT_TIMEOUT)),
+    )
+
+
+class Fetcher(object):
+    """Fetch meta.json files concurrently."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        min_requests_per_second: float = DEFAULT_MIN_REQUESTS_PER_SECOND,
+        max_requests_per_second: float = DEFAULT_MAX_REQUESTS_PER_SECOND,
+        cache: Optional[ResponseCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        dead_letter: Optional[DeadLetterFile] = None,
+        decoder: Optional[JsonDecoder] = None,
+        url_template: str = DEFAULT_URL_TEMPLATE,
+        metrics: Optional[RunMetrics] = None,
+        resolver: Optional[Resolver] = None,
+        domain_index: Optional[DomainIndex] = None,
+        scheduler: Optional[Scheduler] = None,
+    ) -> None:
+        """Initialize the fetcher.
+        Arguments:
+            client {httpx.AsyncClient} -- HTTP client
+        Keyword Arguments:
+            concurrency {int} -- Maximum concurrent requests
+            requests_per_second {float} -- Initial global request budget
+            min_requests_per_second {float} -- Lowest global request budget
+            max_requests_per_second {float} -- Highest global request budget
+            cache {Optional[ResponseCache]} -- Conditional request cache
+            retry_policy {Optional[RetryPolicy]} -- Backoff for failed shops
+            dead_letter {Optional[DeadLetterFile]} -- File for failed shops
+            decoder {Optional[JsonDecoder]} -- Decoder of the responses
+            url_template {str} -- URL of a meta.json with a {shop_domain}
+            metrics {Optional[RunMetrics]} -- Timers and counters of the run
+            resolver {Optional[Resolver]} -- DNS pre-resolution and cache
+            domain_index {Optional[DomainIndex]} -- Skips aliases of shops
+            scheduler {Optional[Scheduler]} -- Keeps the fetch history
+        """
+        self.logger: logging.Logger = singer.get_logger()
+        self.client: httpx.AsyncClient = client
+        self.cache: Optional[ResponseCache] = cache
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy()
+        self.dead_letter: Optional[DeadLetterFile] = dead_letter
+        self.decoder: JsonDecoder = decoder or create_decoder(RESPONSE_FIELDS)
+        self.url_template: str = url_template
+        self.metrics: Optional[RunMetrics] = metrics
+        self.resolver: Optional[Resolver] = resolver
+        self.domain_index: Optional[DomainIndex] = domain_index
+        self.scheduler: Optional[Scheduler] = scheduler
+        self.failed: int = 0
+        self.progress: Progress = Progress()
+        self.concurrency: int = concurrency
+        self.rate_limiter: AdaptiveRateLimiter = AdaptiveRateLimiter(
+            requests_per_second,
+            min_requests_per_second,
+            max_requests_per_second,
+        )
+        self.pool_stats: PoolStats = PoolStats(
+            getattr(client, '_transport', None),
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._decode: Callable = timed(metrics, 'decode', self.decoder.decode)
+
+    async def fetch(self, shop_domain: str) -> Optional[dict]:
+        """Fetch the meta.json of a shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        Raises:
+            FetchError: When the fetch failed
+        Returns:
+            Optional[dict] -- Parsed response, None for an alias of a shop
+            that was already scraped
+        """
+        url: str = self.url_template.format(shop_domain=shop_domain)
+
+        # Every domain in the window is resolved while it waits for a slot,
+        # a shop that does not exist fails without a connect
+        if self.resolver is not None:
+            await self._resolve(url)
+
+        async with self._semaphore:  # type: ignore
+            # Checked when the request would start, by then the shops ahead
+            # of it in the window have been scraped
+            if self.domain_index is not None and (
+                self.domain_index.is_alias(shop_domain)
+            ):
+                return None
+
+            try:
+                response: dict = await self._fetch(shop_domain, url)
+            except FetchError:
+                raise
+            except Exception as err:
+                raise FetchError(f'{type(err).__name__}: {err}')
+
+        if self.domain_index is not None:
+            self.domain_index.observe(shop_domain, response)
+        if self.scheduler is not None:
+            self.scheduler.observe(shop_domain, response)
+        return response
+
+    async def _resolve(self, url: str) -> None:
+        """Resolve the host of a URL.
+        Arguments:
+            url {str} -- URL
+        Raises:
+            FetchError: When the host does not exist or the lookup failed
+        """
+        started: float = time.perf_counter()
+        try:
+            await self.resolver.resolve(httpx.URL(url).host)  # type: ignore
+        finally:
+            if self.metrics is not None:
+                self.metrics.add('dns', time.perf_counter() - started)
+
+    async def _fetch(self, shop_domain: str, url: str) -> dict:
+        """Fetch the meta.json, revalidating a cached response if any.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            url {str} -- URL of the meta.json
+        Raises:
+            FetchError: When the response is an error
+        Returns:
+            dict -- Parsed response
+        """
+        cached: Optional[CacheEntry] = None
+        if self.cache is not None:
+            cached = self.cache.get(shop_domain)
+
+        # A throttled request is sent again once the limiter allows it
+        for _ in range(MAX_THROTTLE_RETRIES + 1):
+            response: httpx.Response = await self._request(url, cached)
+            if response.status_code != httpx.codes.TOO_MANY_REQUESTS:
+                break
+        else:
+            raise FetchError('Throttled too often')
+
+        if response.status_code >= httpx.codes.INTERNAL_SERVER_ERROR:
+            raise FetchError(f'HTTP {response.status_code}')
+
+        # The shop did not change, reuse the cached payload. A 304 to a
+        # request without validators has no payload, it is retried
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            if cached is None:
+                raise FetchError('HTTP 304 without a cached response')
+            self.cache.hit(shop_domain)  # type: ignore
+            return cached.payload
+
+        try:
+            payload: dict = self._decode(response.content)
+        except ValueError:
+            raise FetchError(
+                f'Invalid json (HTTP {response.status_code})',
+                retryable=False,
+            )
+
+        if self.cache is not None and response.status_code == httpx.codes.OK:
+            self.cache.put(
+                shop_domain,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                payload,
+            )
+        return payload
+
+    async def _request(
+        self,
+        url: str,
+        cached: Optional[CacheEntry],
+    ) -> httpx.Response:
+        """Send a request within the rate limit and report its outcome.
+        Arguments:
+            url {str} -- URL of the meta.json
+            cached {Optional[CacheEntry]} -- Cached response to revalidate
+        Returns:
+            httpx.Response -- Response
+        """
+        queued: float = time.monotonic()
+        await self.rate_limiter.acquire()
+
+        started: float = time.monotonic()
+        try:
+            response: httpx.Response = await self.client.get(
+                url,
+                headers=cached.headers() if cached else None,
+            )
+        except httpx.TimeoutException:
+            self.rate_limiter.record_timeout()
+            if self.metrics is not None:
+                self.metrics.observe_request(
+                    'timeout',
+                    time.monotonic() - started,
+                )
+            raise
+        latency: float = time.monotonic() - started
+
+        self.rate_limiter.record(
+            response.status_code,
+            latency,
+            response.headers.get('Retry-After'),
+        )
+        handshakes: int = self.pool_stats.observe(response)
+
+        if self.metrics is not None:
+            self.metrics.add('rate_limit', started - queued)
+            self.metrics.add('request', latency)
+            self.metrics.observe_request(
+                response.status_code,
+                latency,
+                handshake=bool(handshakes),
+            )
+        return response
+
+    async def fetch_all(
+        self,
+        shop_domains: Iterable[str],
+        progress: Optional[Progress] = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Fetch the meta.json of all shops.
+        Responses are yielded in the same order as the shop domains, while up
+        to a window of shops is fetched in the background. Failed shops are
+        retried with backoff next to the fresh fetches and their responses
+        are yielded at the end, again in the order of the shop domains.
+        Arguments:
+            shop_domains {Iterable[str]} -- Domains of the shops
+        Keyword Arguments:
+            progress {Optional[Progress]} -- Progress of an earlier scrape
+        Yields:
+            AsyncGenerator[dict, None] -- Parsed responses
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.progress = progress or Progress()
+
+        # Fetch ahead of the consumer, but keep memory bounded
+        window: int = self.concurrency * 4
+        pending: Deque[Tuple[str, asyncio.Task]] = deque()
+        retrying: List[Tuple[str, asyncio.Task]] = []
+
+        try:
+            async for shop_domain in iterate_in_thread(
+                self.progress.resume(shop_domains),
+            ):
+                self.progress.start(shop_domain)
+
+                task: asyncio.Task = asyncio.ensure_future(
+                    self.fetch(shop_domain),
+                )
+                pending.append((shop_domain, task))
+
+                # Yield the oldest response once the window is full
+                if len(pending) >= window:
+                    response: Optional[dict] = await self._settle(
+                        *pending.popleft(),
+                        retrying,
+                    )
+                    if response is not None:
+                        yield response
+
+            while pending:
+                response = await self._settle(*pending.popleft(), retrying)
+                if response is not None:
+                    yield response
+
+            for shop_domain, retry in retrying:
+                response = await retry
+                self.progress.finish(shop_domain)
+                if response is not None:
+                    yield response
+        finally:
+            # Cancel outstanding fetches when the consumer stops early, and
+            # collect their outcomes so no error is left unretrieved
+            tasks: List[asyncio.Task] = [
+                task for _, task in chain(pending, retrying)
+            ]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.dead_letter is not None:
+                self.dead_letter.close()
+            if self.resolver is not None:
+                self.resolver.close()
+
+    async def _settle(
+        self,
+        shop_domain: str,
+        task: asyncio.Task,
+        retrying: List[Tuple[str, asyncio.Task]],
+    ) -> Optional[dict]:
+        """Wait for a fetch and move it to the retry queue if it failed.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            task {asyncio.Task} -- Fetch of the shop
+            retrying {List[Tuple[str, asyncio.Task]]} -- Retry queue
+        Returns:
+            Optional[dict] -- Parsed response or None when the fetch failed
+                or the shop was skipped
+        """
+        try:
+            response: Optional[dict] = await task
+        except FetchError as err:
+            if err.retryable and self.retry_policy.max_retries:
+                retry: asyncio.Task = asyncio.ensure_future(
+                    self._retry(shop_domain, err),
+                )
+                retrying.append((shop_domain, retry))
+            else:
+                self._fail(shop_domain, err, 1)
+            return None
+
+        self.progress.finish(shop_domain)
+        return response
+
+    async def _retry(
+        self,
+        shop_domain: str,
+        error: FetchError,
+    ) -> Optional[dict]:
+        """Retry a failed shop with exponential backoff.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            error {FetchError} -- Error of the first attempt
+        Returns:
+            Optional[dict] -- Parsed response or None when all attempts failed
+        """
+        attempt: int = 0
+        while error.retryable and attempt < self.retry_policy.max_retries:
+            attempt += 1
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+            try:
+                return await self.fetch(shop_domain)
+            except FetchError as err:
+                error = err
+
+        self._fail(shop_domain, error, attempt + 1)
+        return None
+
+    def _fail(self, shop_domain: str, error: FetchError, attempts: int) -> None:
+        """Give up on a shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            error {FetchError} -- Error of the last attempt
+            attempts {int} -- Number of attempts
+        """
+        self.failed += 1
+        self.progress.finish(shop_domain)
+        self.logger.info(
+            f'Exception occurred. Failed to scrape: {shop_domain} '
+            f'after {attempts} attempts: {error.reason}',
+        )
+        if self.dead_letter is not None:
+            self.dead_letter.write(shop_domain, error.reason, attempts)
+        if self.scheduler is not None:
+            self.scheduler.observe_failure(shop_domain)
+
+
+def fetcher_options(config: dict) -> dict:
+    """Retrieve the fetcher options from the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        dict -- Keyword arguments for the Fetcher
+    """
+    options: Dict[str, List] = {
+        'concurrency': [int, DEFAULT_CONCURRENCY],
+        'requests_per_second': [float, DEFAULT_REQUESTS_PER_SECOND],
+        'min_requests_per_second': [float, DEFAULT_MIN_REQUESTS_PER_SECOND],
+        'max_requests_per_second': [float, DEFAULT_MAX_REQUESTS_PER_SECOND],
+        'url_template': [str, DEFAULT_URL_TEMPLATE],
+    }
+    return {
+        key: data_type(config.get(key, default))
+        for key, (data_type, default) in options.items()
+    }
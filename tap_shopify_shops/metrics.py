@@ -0,0 +1,296 @@
+"""Timing instrumentation and the run report."""
+# -*- coding: utf-8 -*-
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from singer import metrics as singer_metrics
+
+# Phases of a run, in the order the data flows through them
+PHASES: tuple = (
+    'domains',
+    'dns',
+    'rate_limit',
+    'request',
+    'decode',
+    'validate',
+    'clean',
+    'output',
+)
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS_MS: tuple = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)
+
+
+class Histogram(object):
+    """Latency histogram with fixed buckets."""
+
+    def __init__(self) -> None:
+        """Initialize the histogram."""
+        self.count: int = 0
+        self.total: float = 0.0
+        self.maximum: float = 0.0
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        """Add a latency.
+        Arguments:
+            seconds {float} -- Latency in seconds
+        """
+        milliseconds: float = seconds * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if milliseconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket that holds a percentile.
+        Arguments:
+            fraction {float} -- Percentile as a fraction, e.g. 0.99
+        Returns:
+            Optional[float] -- Milliseconds, None without observations
+        """
+        if not self.count:
+            return None
+
+        rank: float = self.count * fraction
+        seen: int = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return float(LATENCY_BUCKETS_MS[index])
+                break
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        """Summary of the histogram.
+        Returns:
+            dict -- Counts per bucket and percentiles in milliseconds
+        """
+        bounds: List[str] = [f'<={bound}' for bound in LATENCY_BUCKETS_MS]
+        bounds.append(f'>{LATENCY_BUCKETS_MS[-1]}')
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else None,
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.maximum,
+            'buckets': dict(zip(bounds, self.buckets)),
+        }
+
+
+class RunMetrics(object):
+    """Timers and counters per phase of a run.
+    Only created when instrumentation is enabled, disabled runs pass None
+    around instead, so the hot path does not pay for it.
+    """
+
+    def __init__(
+        self,
+        report_path: Optional[str] = None,
+        singer_metrics_enabled: bool = False,
+    ) -> None:
+        """Initialize the metrics.
+        Keyword Arguments:
+            report_path {Optional[str]} -- Path of the JSON run report
+            singer_metrics_enabled {bool} -- Log Singer METRIC messages
+        """
+        self.report_path: Optional[str] = report_path
+        self.singer_metrics_enabled: bool = singer_metrics_enabled
+        self.started_at: datetime = datetime.now(timezone.utc)
+        self.started: float = time.monotonic()
+        self.seconds: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.calls: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.status_codes: Counter = Counter()
+        self.latency: Histogram = Histogram()
+        self.connect_latency: Histogram = Histogram()
+        self.counters: Dict[str, Any] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add the time of a call to a phase.
+        Arguments:
+            phase {str} -- Phase
+            seconds {float} -- Duration in seconds
+        """
+        self.seconds[phase] += seconds
+        self.calls[phase] += 1
+
+    def observe_request(
+        self,
+        status_code: Union[int, str],
+        seconds: float,
+        handshake: bool = False,
+    ) -> None:
+        """Add a request.
+        Arguments:
+            status_code {Union[int, str]} -- Status code, or e.g. timeout
+            seconds {float} -- Latency in seconds
+        Keyword Arguments:
+            handshake {bool} -- Whether the request opened a connection
+        """
+        self.status_codes[status_code] += 1
+        self.latency.observe(seconds)
+        if handshake:
+            self.connect_latency.observe(seconds)
+
+    def report(self) -> dict:
+        """Create the run report.
+        Returns:
+            dict -- Run report
+        """
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'elapsed_seconds': time.monotonic() - self.started,
+            'phases': {
+                phase: {
+                    'seconds': self.seconds[phase],
+                    'calls': self.calls[phase],
+                }
+                for phase in PHASES
+            },
+            'requests': {
+                'status_codes': {
+                    str(status_code): count
+                    for status_code, count in sorted(
+                        self.status_codes.items(),
+                        key=lambda status_count: str(status_count[0]),
+                    )
+                },
+                'latency': self.latency.to_dict(),
+                'latency_with_handshake': self.connect_latency.to_dict(),
+            },
+            'counters': self.counters,
+        }
+
+    def finish(self, logger: logging.Logger) -> None:
+        """Write the run report and the Singer metrics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        report: dict = self.report()
+
+        if self.report_path:
+            with open(self.report_path, 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, indent=2)
+            logger.info(f'Run report written to {self.report_path}')
+
+        if self.singer_metrics_enabled:
+            for phase, phase_report in report['phases'].items():
+                singer_metrics.log(logger, singer_metrics.Point(
+                    'timer',
+                    'phase_duration',
+                    phase_report['seconds'],
+                    {'phase': phase, 'calls': phase_report['calls']},
+                ))
+            status_codes: dict = report['requests']['status_codes']
+            for status_code, count in status_codes.items():
+                singer_metrics.log(logger, singer_metrics.Point(
+                    'counter',
+                    'http_request_count',
+                    count,
+                    {'http_status_code': status_code},
+                ))
+            singer_metrics.log(logger, singer_metrics.Point(
+                'timer',
+                'run_duration',
+                report['elapsed_seconds'],
+                {},
+            ))
+
+
+def timed(
+    run_metrics: Optional[RunMetrics],
+    phase: str,
+    function: Callable,
+) -> Callable:
+    """Time every call of a function.
+    Arguments:
+        run_metrics {Optional[RunMetrics]} -- Metrics or None if disabled
+        phase {str} -- Phase
+        function {Callable} -- Function
+    Returns:
+        Callable -- The timed function, the function itself when disabled
+    """
+    if run_metrics is None:
+        return function
+
+    clock: Callable = time.perf_counter
+    add: Callable = run_metrics.add
+
+    def timed_function(*args: Any, **kwargs: Any) -> Any:  # noqa: WPS430
+        started: float = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            add(phase, clock() - started)
+    return timed_function
+
+
+def timed_iter(
+    run_metrics: Optional[RunMetrics],
+    phase: str,
+    iterator: Iterator,
+) -> Iterator:
+    """Time the wait for every item of an iterator.
+    Arguments:
+        run_metrics {Optional[RunMetrics]} -- Metrics or None if disabled
+        phase {str} -- Phase
+        iterator {Iterator} -- Iterator
+    Returns:
+        Iterator -- The timed iterator, the iterator itself when disabled
+    """
+    if run_metrics is None:
+        return iterator
+    return _timed_iter(run_metrics, phase, iterator)
+
+
+def _timed_iter(
+    run_metrics: RunMetrics,
+    phase: str,
+    iterator: Iterator,
+) -> Iterator:
+    """Time the wait for every item of an iterator.
+    Arguments:
+        run_metrics {RunMetrics} -- Metrics
+        phase {str} -- Phase
+        iterator {Iterator} -- Iterator
+    Yields:
+        Iterator -- Items of the iterator
+    """
+    clock: Callable = time.perf_counter
+    while True:
+        started: float = clock()
+        try:
+            item: Any = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            run_metrics.add(phase, clock() - started)
+        yield item
+
+
+def metrics_from_config(config: dict) -> Optional[RunMetrics]:
+    """Create the run metrics if they are enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[RunMetrics] -- The metrics or None if they are disabled
+    """
+    report_path: Optional[str] = config.get('run_report_path')
+    singer_metrics_enabled: bool = bool(config.get('singer_metrics', False))
+
+    if not report_path and not singer_metrics_enabled:
+        return None
+    return RunMetrics(report_path, singer_metrics_enabled)
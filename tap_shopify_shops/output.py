@@ -0,0 +1,299 @@
+"""Buffered Singer output."""
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import IO, Deque, List, Optional
+
+import singer
+from singer import utils
+
+# Defaults for the output, can be overridden in the tap config
+DEFAULT_OUTPUT_BATCH_SIZE: int = 500
+DEFAULT_STATE_INTERVAL_RECORDS: int = 1000
+DEFAULT_STATE_INTERVAL_SECONDS: float = 30.0
+DEFAULT_OUTPUT_BUFFER_SIZE: int = 4 * 1024 * 1024
+
+
+class SingerWriter(object):
+    """Write Singer messages in batches.
+    RECORD messages are buffered and written with a single write per batch,
+    all records of a batch share the same time_extracted. STATE messages are
+    only written every number of records or seconds, after the records they
+    cover.
+    """
+
+    def __init__(
+        self,
+        output: Optional[IO[str]] = None,
+        batch_size: int = DEFAULT_OUTPUT_BATCH_SIZE,
+        state_interval_records: int = DEFAULT_STATE_INTERVAL_RECORDS,
+        state_interval_seconds: float = DEFAULT_STATE_INTERVAL_SECONDS,
+    ) -> None:
+        """Initialize the writer.
+        Keyword Arguments:
+            output {Optional[IO[str]]} -- Output, defaults to stdout
+            batch_size {int} -- Records per write
+            state_interval_records {int} -- Records between STATE messages
+            state_interval_seconds {float} -- Seconds between STATE messages
+        """
+        self.output: IO[str] = output or sys.stdout
+        self.batch_size: int = batch_size
+        self.state_interval_records: int = state_interval_records
+        self.state_interval_seconds: float = state_interval_seconds
+        self.records: int = 0
+
+        self._buffer: List[str] = []
+        self._time_extracted: Optional[str] = None
+        self._records_since_state: int = 0
+        self._state_written: float = time.monotonic()
+
+    def write_schema(
+        self,
+        stream_name: str,
+        schema: dict,
+        key_properties: list,
+    ) -> None:
+        """Write a SCHEMA message.
+        Arguments:
+            stream_name {str} -- Name of the stream
+            schema {dict} -- JSON schema
+            key_properties {list} -- Key properties
+        """
+        self._write(singer.format_message(singer.SchemaMessage(
+            stream=stream_name,
+            schema=schema,
+            key_properties=key_properties,
+        )))
+
+    def write_record(self, stream_name: str, record: dict) -> None:
+        """Buffer a RECORD message.
+        Arguments:
+            stream_name {str} -- Name of the stream
+            record {dict} -- Record
+        """
+        # The time is only computed for the first record of a batch
+        if self._time_extracted is None:
+            self._time_extracted = utils.strftime(
+                datetime.now(timezone.utc),
+            )
+
+        self._buffer.append(json.dumps(
+            {
+                'type': 'RECORD',
+                'stream': stream_name,
+                'record': record,
+                'time_extracted': self._time_extracted,
+            },
+            default=str,
+        ))
+        self.records += 1
+        self._records_since_state += 1
+
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def state_due(self) -> bool:
+        """Check whether a STATE message is due.
+        Returns:
+            bool -- Whether enough records or seconds passed since the last
+        """
+        return (
+            self._records_since_state >= self.state_interval_records
+            or time.monotonic() - self._state_written
+            >= self.state_interval_seconds
+        )
+
+    def write_state(self, state: dict) -> None:
+        """Write a STATE message after the buffered records.
+        Arguments:
+            state {dict} -- State
+        """
+        self._write(singer.format_message(singer.StateMessage(value=state)))
+        self._records_since_state = 0
+        self._state_written = time.monotonic()
+
+    def flush(self) -> None:
+        """Write the buffered records."""
+        if self._buffer:
+            self._buffer.append('')
+            self.output.write('\n'.join(self._buffer))
+            self._buffer = []
+        self._time_extracted = None
+        self.output.flush()
+
+    def _write(self, message: str) -> None:
+        """Write a message after the buffered records.
+        Arguments:
+            message {str} -- Formatted message
+        """
+        self.flush()
+        self.output.write(message + '\n')
+        self.output.flush()
+
+
+class OutputPipe(object):
+    """Text output that is written by a thread.
+    Writes are buffered and return at once, so a slow reader of the output
+    does not block the event loop. Like a stream writer, a coroutine awaits
+    drain() after writing, which waits while more than the buffer size is
+    waiting to be written.
+    """
+
+    def __init__(
+        self,
+        output: Optional[IO[str]] = None,
+        buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+    ) -> None:
+        """Initialize the pipe and start its thread.
+        Keyword Arguments:
+            output {Optional[IO[str]]} -- Output, defaults to stdout
+            buffer_size {int} -- Characters buffered before drain() waits
+        """
+        self.output: IO[str] = output or sys.stdout
+        self.buffer_size: int = buffer_size
+        self.waits: int = 0
+
+        self._chunks: Deque[str] = deque()
+        self._size: int = 0
+        self._closed: bool = False
+        self._error: Optional[OSError] = None
+        self._waiters: List[asyncio.Future] = []
+        self._condition: threading.Condition = threading.Condition()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._write_chunks,
+            name='output',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def write(self, text: str) -> int:
+        """Buffer text for the thread.
+        Arguments:
+            text {str} -- Text
+        Raises:
+            OSError: When writing to the output failed
+        Returns:
+            int -- Number of characters
+        """
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            self._chunks.append(text)
+            self._size += len(text)
+            self._condition.notify()
+        return len(text)
+
+    def flush(self) -> None:
+        """Do nothing, the thread flushes after every write."""
+
+    async def drain(self) -> None:
+        """Wait until the buffer is below its size.
+        Raises:
+            OSError: When writing to the output failed
+        """
+        if self._size > self.buffer_size:
+            waiter: asyncio.Future = asyncio.get_event_loop().create_future()
+            with self._condition:
+                if self._size > self.buffer_size:
+                    self.waits += 1
+                    self._waiters.append(waiter)
+                else:
+                    waiter.set_result(None)
+            await waiter
+
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        """Write the buffered text and stop the thread.
+        Raises:
+            OSError: When writing to the output failed
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _write_chunks(self) -> None:
+        """Write the buffered text until the pipe is closed."""
+        while True:
+            with self._condition:
+                while not self._chunks and not self._closed:
+                    self._condition.wait()
+                if not self._chunks:
+                    return
+                text: str = ''.join(self._chunks)
+                self._chunks.clear()
+
+            try:
+                self.output.write(text)
+                self.output.flush()
+            except OSError as error:
+                with self._condition:
+                    self._error = error
+                    self._chunks.clear()
+                    self._size = 0
+                    self._wake()
+                return
+
+            with self._condition:
+                self._size -= len(text)
+                if self._size <= self.buffer_size:
+                    self._wake()
+
+    def _wake(self) -> None:
+        """Wake the coroutines that wait in drain()."""
+        for waiter in self._waiters:
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+        self._waiters = []
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    """Resolve a future, unless it was cancelled.
+    Arguments:
+        waiter {asyncio.Future} -- Future
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def writer_from_config(config: dict) -> SingerWriter:
+    """Create the Singer writer from the tap config.
+    With a bulk_output_dir, the records are written to chunk files instead.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        SingerWriter -- The writer
+    """
+    if config.get('bulk_output_dir'):
+        # Imported here, the bulk output imports this module
+        from tap_shopify_shops.bulk import (  # noqa: WPS433
+            bulk_writer_from_config,
+        )
+        return bulk_writer_from_config(config)
+
+    return SingerWriter(
+        batch_size=int(
+            config.get('output_batch_size', DEFAULT_OUTPUT_BATCH_SIZE),
+        ),
+        state_interval_records=int(
+            config.get(
+                'state_interval_records',
+                DEFAULT_STATE_INTERVAL_RECORDS,
+            ),
+        ),
+        state_interval_seconds=float(
+            config.get(
+                'state_interval_seconds',
+                DEFAULT_STATE_INTERVAL_SECONDS,
+            ),
+        ),
+    )
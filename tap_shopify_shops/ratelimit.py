@@ -0,0 +1,207 @@
+"""Adaptive rate limiting."""
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import singer
+
+# Defaults for the rate limiter, can be overridden in the tap config
+DEFAULT_REQUESTS_PER_SECOND: float = 20.0
+DEFAULT_MIN_REQUESTS_PER_SECOND: float = 1.0
+DEFAULT_MAX_REQUESTS_PER_SECOND: float = 200.0
+
+# Additive increase per healthy interval, multiplicative decrease on errors
+RATE_INCREASE: float = 1.0
+RATE_DECREASE: float = 0.5
+LATENCY_DECREASE: float = 0.9
+ADJUST_INTERVAL: float = 1.0
+
+# Latency above this multiple of the baseline is treated as congestion
+LATENCY_THRESHOLD: float = 2.0
+LATENCY_SMOOTHING: float = 0.1
+
+# Upper bound for a Retry-After pause in seconds
+MAX_RETRY_AFTER: float = 300.0
+
+STATUS_TOO_MANY_REQUESTS: int = 429
+STATUS_SERVER_ERROR: int = 500
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header.
+    Arguments:
+        retry_after {Optional[str]} -- Seconds or an HTTP date
+    Returns:
+        Optional[float] -- Seconds to wait or None if missing or invalid
+    """
+    if not retry_after:
+        return None
+
+    try:
+        seconds: float = float(retry_after)
+    except ValueError:
+        try:
+            retry_at: float = parsedate_to_datetime(retry_after).timestamp()
+        except (TypeError, ValueError):
+            return None
+        seconds = retry_at - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class AdaptiveRateLimiter(object):
+    """Token bucket whose rate follows the health of the server.
+    The rate increases additively while responses are fast and successful
+    and decreases multiplicatively when Shopify throttles, with a 429 or a
+    5xx with a Retry-After header, on timeouts and on rising latency. The
+    Retry-After header pauses all requests. Every shop is its own host, so
+    any other 5xx is an error of that shop, left to the retry policy.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        min_requests_per_second: float = DEFAULT_MIN_REQUESTS_PER_SECOND,
+        max_requests_per_second: float = DEFAULT_MAX_REQUESTS_PER_SECOND,
+    ) -> None:
+        """Initialize the rate limiter.
+        Keyword Arguments:
+            requests_per_second {float} -- Initial requests per second
+            min_requests_per_second {float} -- Lowest rate
+            max_requests_per_second {float} -- Highest rate
+        """
+        self.logger: logging.Logger = singer.get_logger()
+        self.min_rate: float = min_requests_per_second
+        self.max_rate: float = max_requests_per_second
+        self.rate: float = min(
+            max(requests_per_second, self.min_rate),
+            self.max_rate,
+        )
+        self.throttled: int = 0
+        self.paused_until: float = 0.0
+        self.latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+
+        self._tokens: float = 1.0
+        self._updated: float = time.monotonic()
+        self._adjusted: float = self._updated
+        self._decreased: float = 0.0
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        while True:
+            now: float = time.monotonic()
+
+            # Honor a Retry-After pause
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            # Refill the bucket, allowing a burst of at most one second
+            self._tokens = min(
+                max(self.rate, 1.0),
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def record(
+        self,
+        status_code: int,
+        latency: float,
+        retry_after: Optional[str] = None,
+    ) -> None:
+        """Adjust the rate to a response.
+        Arguments:
+            status_code {int} -- Status code of the response
+            latency {float} -- Seconds until the response arrived
+        Keyword Arguments:
+            retry_after {Optional[str]} -- Retry-After header
+        """
+        pause: Optional[float] = parse_retry_after(retry_after)
+        if status_code == STATUS_TOO_MANY_REQUESTS or (
+            status_code >= STATUS_SERVER_ERROR and pause is not None
+        ):
+            self.throttled += 1
+            self._decrease(RATE_DECREASE)
+
+            if pause:
+                self.paused_until = max(
+                    self.paused_until,
+                    time.monotonic() + pause,
+                )
+            return
+
+        # A broken shop says nothing about the health of the edge
+        if status_code >= STATUS_SERVER_ERROR:
+            return
+
+        self._observe_latency(latency)
+
+        # Rising latency is the first sign of an overloaded server
+        if self.latency > self.baseline_latency * LATENCY_THRESHOLD:  # type: ignore
+            self._decrease(LATENCY_DECREASE)
+        else:
+            self._increase()
+
+    def record_timeout(self) -> None:
+        """Adjust the rate to a request that timed out."""
+        self.throttled += 1
+        self._decrease(RATE_DECREASE)
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the state of the rate limiter.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        logger.info(
+            f'Rate limiter: {self.rate:.1f} requests per second, '
+            f'throttled {self.throttled} times',
+        )
+
+    def _observe_latency(self, latency: float) -> None:
+        """Update the smoothed and the baseline latency.
+        Arguments:
+            latency {float} -- Seconds until the response arrived
+        """
+        if self.latency is None:
+            self.latency = latency
+            self.baseline_latency = latency
+            return
+
+        self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        self.baseline_latency = min(
+            self.baseline_latency,  # type: ignore
+            self.latency,
+        )
+
+    def _increase(self) -> None:
+        """Increase the rate, at most once per interval."""
+        now: float = time.monotonic()
+        if now - self._adjusted < ADJUST_INTERVAL:
+            return
+
+        self._adjusted = now
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def _decrease(self, factor: float) -> None:
+        """Decrease the rate, at most once per interval.
+        A burst of errors from requests that were sent at the same time thus
+        only decreases the rate once.
+        Arguments:
+            factor {float} -- Multiplier for the rate
+        """
+        now: float = time.monotonic()
+        if now - self._decreased < ADJUST_INTERVAL:
+            return
+
+        self._decreased = now
+        self._adjusted = now
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.logger.debug(f'Rate limiter: {self.rate:.1f} requests per second')
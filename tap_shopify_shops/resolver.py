@@ -0,0 +1,214 @@
+"""DNS pre-resolution with an in-process cache."""
+# -*- coding: utf-8 -*-
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from tap_shopify_shops.retry import FetchError
+
+# Defaults for the resolver, can be overridden in the tap config
+DEFAULT_DNS_PREFETCH: bool = False
+DEFAULT_DNS_TTL: float = 300.0
+DEFAULT_DNS_NEGATIVE_TTL: float = 60.0
+DEFAULT_DNS_TIMEOUT: float = 5.0
+DEFAULT_DNS_CONCURRENCY: int = 32
+
+# Errors of getaddrinfo that mean the name does not exist
+NOT_FOUND_ERRORS: frozenset = frozenset(
+    getattr(socket, name)
+    for name in ('EAI_NONAME', 'EAI_NODATA')
+    if hasattr(socket, name)
+)
+
+
+class Resolver(object):
+    """Resolve host names ahead of the fetches and cache the results.
+    Lookups run in a thread pool of their own, so they do not compete with
+    reading the domain source. Concurrent lookups of the same host share one
+    call. Names that do not exist are cached too and fail without a connect.
+    The addresses are not passed to the HTTP client, which resolves the host
+    again when it connects, so this only filters out names that do not exist.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_DNS_TTL,
+        negative_ttl: float = DEFAULT_DNS_NEGATIVE_TTL,
+        timeout: float = DEFAULT_DNS_TIMEOUT,
+        concurrency: int = DEFAULT_DNS_CONCURRENCY,
+    ) -> None:
+        """Initialize the resolver.
+        Keyword Arguments:
+            ttl {float} -- Seconds a resolved name is cached
+            negative_ttl {float} -- Seconds a missing name is cached
+            timeout {float} -- Seconds before a lookup is abandoned
+            concurrency {int} -- Maximum concurrent lookups
+        """
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.timeout: float = timeout
+        self.lookups: int = 0
+        self.cache_hits: int = 0
+        self.seconds: float = 0.0
+        self.failures: Counter = Counter()
+
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix='resolver',
+        )
+        self._cache: Dict[str, Tuple[float, Union[List[str], FetchError]]] = {}
+        self._lookups: Dict[str, asyncio.Future] = {}
+
+    async def resolve(self, host: str) -> List[str]:
+        """Resolve a host name.
+        Arguments:
+            host {str} -- Host name
+        Raises:
+            FetchError: When the name does not exist or the lookup failed
+        Returns:
+            List[str] -- IP addresses
+        """
+        if _is_address(host):
+            return [host]
+
+        cached: Optional[Tuple[float, Union[List[str], FetchError]]] = (
+            self._cache.get(host)
+        )
+        if cached is not None and cached[0] > time.monotonic():
+            self.cache_hits += 1
+            return self._result(cached[1])
+
+        lookup: Optional[asyncio.Future] = self._lookups.get(host)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._lookup(host))
+            self._lookups[host] = lookup
+            lookup.add_done_callback(
+                lambda _: self._lookups.pop(host, None),
+            )
+        else:
+            self.cache_hits += 1
+
+        # The lookup is shared, one cancelled fetch must not cancel it
+        return self._result(await asyncio.shield(lookup))
+
+    def close(self) -> None:
+        """Stop the lookup threads."""
+        self._executor.shutdown(wait=False)
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        failures: str = ', '.join(
+            f'{reason}: {count}'
+            for reason, count in self.failures.most_common()
+        )
+        logger.info(
+            f'DNS: {self.lookups} lookups in {self.seconds:.1f} seconds, '
+            f'{self.cache_hits} cache hits, '
+            f'{sum(self.failures.values())} failed ({failures})',
+        )
+
+    async def _lookup(self, host: str) -> Union[List[str], FetchError]:
+        """Look up a host name and cache the outcome.
+        Arguments:
+            host {str} -- Host name
+        Returns:
+            Union[List[str], FetchError] -- IP addresses or the error
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        started: float = time.monotonic()
+        self.lookups += 1
+
+        outcome: Union[List[str], FetchError]
+        ttl: float = self.ttl
+        try:
+            addresses: list = await asyncio.wait_for(
+                loop.run_in_executor(
+                    self._executor,
+                    socket.getaddrinfo,
+                    host,
+                    None,
+                    0,
+                    socket.SOCK_STREAM,
+                ),
+                self.timeout,
+            )
+        except asyncio.TimeoutError:
+            self.failures['timeout'] += 1
+            outcome = FetchError('DNS lookup timed out')
+            ttl = 0
+        except socket.gaierror as error:
+            if error.errno in NOT_FOUND_ERRORS:
+                self.failures['not_found'] += 1
+                outcome = FetchError('DNS: name not found', retryable=False)
+                ttl = self.negative_ttl
+            else:
+                self.failures['temporary'] += 1
+                outcome = FetchError(f'DNS: {error}')
+                ttl = 0
+        else:
+            outcome = list(dict.fromkeys(
+                address[4][0] for address in addresses
+            ))
+        finally:
+            self.seconds += time.monotonic() - started
+
+        if ttl:
+            self._cache[host] = (time.monotonic() + ttl, outcome)
+        return outcome
+
+    def _result(self, outcome: Union[List[str], FetchError]) -> List[str]:
+        """Return the addresses or raise the error of a lookup.
+        Arguments:
+            outcome {Union[List[str], FetchError]} -- Outcome of a lookup
+        Raises:
+            FetchError: When the lookup failed
+        Returns:
+            List[str] -- IP addresses
+        """
+        if isinstance(outcome, FetchError):
+            raise FetchError(outcome.reason, retryable=outcome.retryable)
+        return outcome
+
+
+def _is_address(host: str) -> bool:
+    """Whether a host is an IP address, that needs no lookup.
+    Arguments:
+        host {str} -- Host name or IP address
+    Returns:
+        bool -- Whether the host is an IP address
+    """
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def resolver_from_config(config: dict) -> Optional[Resolver]:
+    """Create the resolver if it is enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[Resolver] -- The resolver or None if it is disabled
+    """
+    if not config.get('dns_prefetch', DEFAULT_DNS_PREFETCH):
+        return None
+
+    return Resolver(
+        ttl=float(config.get('dns_ttl', DEFAULT_DNS_TTL)),
+        negative_ttl=float(
+            config.get('dns_negative_ttl', DEFAULT_DNS_NEGATIVE_TTL),
+        ),
+        timeout=float(config.get('dns_timeout', DEFAULT_DNS_TIMEOUT)),
+        concurrency=int(
+            config.get('dns_concurrency', DEFAULT_DNS_CONCURRENCY),
+        ),
+    )
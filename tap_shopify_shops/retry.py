@@ -0,0 +1,128 @@
+"""Retries and dead letters for failed fetches."""
+# -*- coding: utf-8 -*-
+import json
+import random
+from datetime import datetime, timezone
+from typing import IO, Optional
+
+# Defaults for retries, can be overridden in the tap config
+DEFAULT_MAX_RETRIES: int = 3
+DEFAULT_RETRY_BASE_DELAY: float = 2.0
+DEFAULT_RETRY_MAX_DELAY: float = 60.0
+
+
+class FetchError(Exception):
+    """Failed to fetch the meta.json of a shop."""
+
+    def __init__(self, reason: str, retryable: bool = True) -> None:
+        """Initialize the error.
+        Arguments:
+            reason {str} -- Why the fetch failed
+        Keyword Arguments:
+            retryable {bool} -- Whether a later attempt might succeed
+        """
+        super().__init__(reason)
+        self.reason: str = reason
+        self.retryable: bool = retryable
+
+
+class RetryPolicy(object):
+    """Exponential backoff with full jitter."""
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+    ) -> None:
+        """Initialize the policy.
+        Keyword Arguments:
+            max_retries {int} -- Retries after the first attempt
+            base_delay {float} -- Delay before the first retry in seconds
+            max_delay {float} -- Upper bound for a delay in seconds
+        """
+        self.max_retries: int = max_retries
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before a retry.
+        Arguments:
+            attempt {int} -- Number of the retry, starting at 1
+        Returns:
+            float -- Delay in seconds
+        """
+        ceiling: float = min(
+            self.max_delay,
+            self.base_delay * 2 ** (attempt - 1),
+        )
+        return random.uniform(0, ceiling)  # noqa: S311
+
+
+class DeadLetterFile(object):
+    """Newline-delimited json file with the shops that failed permanently."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the file.
+        Arguments:
+            path {str} -- Path to the file
+        """
+        self.path: str = path
+        self.count: int = 0
+        self._file: Optional[IO[str]] = None
+
+    def write(self, shop_domain: str, reason: str, attempts: int) -> None:
+        """Write a failed shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+            reason {str} -- Why the last attempt failed
+            attempts {int} -- Number of attempts
+        """
+        # Only create the file when a shop failed
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+        self._file.write(json.dumps({
+            'shop_domain': shop_domain,
+            'reason': reason,
+            'attempts': attempts,
+            'failed_at': datetime.now(timezone.utc).isoformat(),
+        }) + '\n')
+        self.count += 1
+
+    def close(self) -> None:
+        """Close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def retry_policy_from_config(config: dict) -> RetryPolicy:
+    """Create the retry policy from the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        RetryPolicy -- The retry policy
+    """
+    return RetryPolicy(
+        max_retries=int(config.get('max_retries', DEFAULT_MAX_RETRIES)),
+        base_delay=float(
+            config.get('retry_base_delay', DEFAULT_RETRY_BASE_DELAY),
+        ),
+        max_delay=float(
+            config.get('retry_max_delay', DEFAULT_RETRY_MAX_DELAY),
+        ),
+    )
+
+
+def dead_letter_from_config(config: dict) -> Optional[DeadLetterFile]:
+    """Create the dead letter file if it is enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[DeadLetterFile] -- The file or None if it is disabled
+    """
+    path: Optional[str] = config.get('dead_letter_path')
+    if not path:
+        return None
+    return DeadLetterFile(path)
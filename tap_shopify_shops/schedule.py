@@ -0,0 +1,354 @@
+"""Freshness scheduler that spends a request budget on likely changes."""
+# -*- coding: utf-8 -*-
+import heapq
+import logging
+import math
+import sqlite3
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from tap_shopify_shops.changes import record_digest
+
+# Defaults for the scheduler, can be overridden in the tap config
+DEFAULT_SCHEDULE_BUDGET: int = 0
+DEFAULT_SCHEDULE_REFRESH_DAYS: float = 7.0
+
+# Change rate assumed for a shop without history: one change in this many
+# days, it weighs less as the history of the shop grows
+PRIOR_CHANGE_DAYS: float = 30.0
+
+# Backoff of a failing shop, doubled by every failure in a row
+FAILURE_BACKOFF_DAYS: float = 1.0
+MAX_FAILURE_BACKOFF_DAYS: float = 90.0
+
+# Domains looked up in the history at once
+LOOKUP_BATCH_SIZE: int = 500
+
+# Number of writes before the history is committed to disk
+COMMIT_INTERVAL: int = 1000
+DAY: int = 86400
+
+# Tiers of the priority, a higher tier is always scheduled first
+NEW: int = 3
+OVERDUE: int = 2
+RETRY: int = 1
+DUE: int = 0
+BACKOFF: int = -1
+
+CREATE_TABLES: tuple = (
+    """
+    CREATE TABLE IF NOT EXISTS shops (
+        shop_domain TEXT PRIMARY KEY,
+        digest TEXT NOT NULL,
+        first_fetched REAL NOT NULL,
+        last_fetched REAL NOT NULL,
+        changes INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        last_attempt REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS plan (
+        position INTEGER PRIMARY KEY,
+        shop_domain TEXT NOT NULL
+    )
+    """,
+)
+
+
+class ShopHistory(NamedTuple):
+    """Fetch history of a shop.
+    A shop that never responded has no digest and was never fetched.
+    """
+
+    first_fetched: float
+    last_fetched: float
+    changes: int
+    failures: int
+    last_attempt: float
+
+    def backoff(self) -> float:
+        """Seconds before a failing shop is tried again.
+        Returns:
+            float -- Backoff, 0 when the last attempt succeeded
+        """
+        if not self.failures:
+            return 0
+        return min(
+            FAILURE_BACKOFF_DAYS * 2 ** (self.failures - 1),
+            MAX_FAILURE_BACKOFF_DAYS,
+        ) * DAY
+
+    def change_probability(self, now: float) -> float:
+        """Estimate the chance that the shop changed since the last fetch.
+        The changes are modelled as a Poisson process, with a rate of the
+        observed changes per day plus a prior change.
+        Arguments:
+            now {float} -- Current time
+        Returns:
+            float -- Probability between 0 and 1
+        """
+        observed_days: float = max(
+            self.last_fetched - self.first_fetched,
+            0,
+        ) / DAY
+        rate: float = (self.changes + 1) / (observed_days + PRIOR_CHANGE_DAYS)
+        age_days: float = max(now - self.last_fetched, 0) / DAY
+        return 1 - math.exp(-rate * age_days)
+
+
+class Scheduler(object):
+    """Choose the shops of a run from their change history.
+    New shops come first, then shops that were not fetched for the refresh
+    interval, then failing shops whose backoff passed, then the shops that
+    most likely changed, until the budget is spent. Failing shops within
+    their backoff come last. The plan of a run is stored, so a resumed run
+    continues it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        budget: int = DEFAULT_SCHEDULE_BUDGET,
+        refresh_days: float = DEFAULT_SCHEDULE_REFRESH_DAYS,
+    ) -> None:
+        """Initialize the scheduler.
+        Arguments:
+            path {str} -- Path to the SQLite database
+        Keyword Arguments:
+            budget {int} -- Requests per run, 0 to fetch all shops
+            refresh_days {float} -- Days before any shop is fetched again
+        """
+        self.budget: int = budget
+        self.refresh: float = refresh_days * DAY
+        self.shops: int = 0
+        self.planned: int = 0
+        self.new: int = 0
+        self.overdue: int = 0
+        self.backing_off: int = 0
+        self.changed: int = 0
+        self.failed: int = 0
+        self._writes: int = 0
+
+        # The plan is made in the thread that reads the domains, before the
+        # first shop is fetched
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path,
+            check_same_thread=False,
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for create_table in CREATE_TABLES:
+            self.connection.execute(create_table)
+        self.connection.commit()
+
+    def schedule(
+        self,
+        shop_domains: Iterable[str],
+        resume: bool = False,
+    ) -> Iterator[str]:
+        """Plan the shops of the run.
+        Arguments:
+            shop_domains {Iterable[str]} -- Domains of all shops
+        Keyword Arguments:
+            resume {bool} -- Whether the run continues an interrupted run
+        Yields:
+            Iterator[str] -- Domains of the planned shops, most urgent first
+        """
+        if not self.budget:
+            yield from shop_domains
+            return
+
+        if resume:
+            stored: List[str] = [
+                row[0] for row in self.connection.execute(
+                    'SELECT shop_domain FROM plan ORDER BY position',
+                )
+            ]
+            if stored:
+                self.planned = len(stored)
+                yield from stored
+                return
+
+        plan: List[str] = self._plan(shop_domains)
+        self.connection.execute('DELETE FROM plan')
+        self.connection.executemany(
+            'INSERT INTO plan VALUES (?, ?)',
+            enumerate(plan),
+        )
+        self.connection.commit()
+        yield from plan
+
+    def observe(self, shop_domain: str, response: dict) -> None:
+        """Register a fetch of a shop and whether its content changed.
+        Arguments:
+            shop_domain {str} -- Requested domain
+            response {dict} -- Parsed response
+        """
+        digest: str = record_digest(response, frozenset())
+        now: float = time.time()
+        row: Optional[tuple] = self.connection.execute(
+            'SELECT digest FROM shops WHERE shop_domain = ?',
+            (shop_domain,),
+        ).fetchone()
+
+        # The history of a shop starts with its first response
+        if row is None or not row[0]:
+            self._write(
+                'INSERT OR REPLACE INTO shops VALUES (?, ?, ?, ?, 0, 0, ?)',
+                (shop_domain, digest, now, now, now),
+            )
+            return
+
+        changed: bool = row[0] != digest
+        self.changed += changed
+        self._write(
+            'UPDATE shops SET digest = ?, last_fetched = ?, '
+            'changes = changes + ?, failures = 0, last_attempt = ? '
+            'WHERE shop_domain = ?',
+            (digest, now, int(changed), now, shop_domain),
+        )
+
+    def observe_failure(self, shop_domain: str) -> None:
+        """Register a shop that failed after all its attempts.
+        Arguments:
+            shop_domain {str} -- Requested domain
+        """
+        self.failed += 1
+        self._write(
+            'INSERT INTO shops VALUES (?, \'\', 0, 0, 0, 1, ?) '
+            'ON CONFLICT (shop_domain) DO UPDATE SET '
+            'failures = failures + 1, last_attempt = excluded.last_attempt',
+            (shop_domain, time.time()),
+        )
+
+    def close(self) -> None:
+        """Commit and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the scheduler statistics.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        logger.info(
+            f'Schedule: {self.planned} of {self.shops or self.planned} shops '
+            f'planned ({self.new} new, {self.overdue} overdue, '
+            f'{self.backing_off} failing shops backing off), '
+            f'{self.changed} fetched shops changed, {self.failed} failed',
+        )
+
+    def _plan(self, shop_domains: Iterable[str]) -> List[str]:
+        """Rank the shops and keep the most urgent within the budget.
+        Only the budget is kept in memory, not all shops.
+        Arguments:
+            shop_domains {Iterable[str]} -- Domains of all shops
+        Returns:
+            List[str] -- Domains of the planned shops, most urgent first
+        """
+        now: float = time.time()
+        ranked: List[Tuple[Tuple[int, float], int, str]] = []
+        position: int = 0
+        domains: Iterator[str] = iter(shop_domains)
+
+        while True:
+            batch: List[str] = list(islice(domains, LOOKUP_BATCH_SIZE))
+            if not batch:
+                break
+            histories: Dict[str, ShopHistory] = self._histories(batch)
+
+            for shop_domain in batch:
+                # Earlier shops win ties, so the order is stable
+                entry: Tuple[Tuple[int, float], int, str] = (
+                    self._priority(histories.get(shop_domain), now),
+                    -position,
+                    shop_domain,
+                )
+                position += 1
+                if len(ranked) < self.budget:
+                    heapq.heappush(ranked, entry)
+                else:
+                    heapq.heappushpop(ranked, entry)
+
+        self.shops = position
+        self.planned = len(ranked)
+        return [entry[2] for entry in sorted(ranked, reverse=True)]
+
+    def _priority(
+        self,
+        history: Optional[ShopHistory],
+        now: float,
+    ) -> Tuple[int, float]:
+        """Priority of a shop.
+        Arguments:
+            history {Optional[ShopHistory]} -- History, None for a new shop
+            now {float} -- Current time
+        Returns:
+            Tuple[int, float] -- Tier and urgency within the tier
+        """
+        if history is None:
+            self.new += 1
+            return (NEW, 0.0)
+
+        # A shop that keeps failing is tried less and less often, and never
+        # before the healthy shops that are overdue
+        if history.failures:
+            waited: float = now - history.last_attempt
+            if waited < history.backoff():
+                self.backing_off += 1
+                return (BACKOFF, waited - history.backoff())
+            return (RETRY, -history.failures)
+
+        age: float = now - history.last_fetched
+        if age >= self.refresh:
+            self.overdue += 1
+            return (OVERDUE, age)
+        return (DUE, history.change_probability(now))
+
+    def _write(self, query: str, parameters: tuple) -> None:
+        """Execute a write and commit periodically.
+        Arguments:
+            query {str} -- SQL query
+            parameters {tuple} -- Query parameters
+        """
+        self.connection.execute(query, parameters)
+        self._writes += 1
+        if not self._writes % COMMIT_INTERVAL:
+            self.connection.commit()
+
+    def _histories(self, shop_domains: List[str]) -> Dict[str, ShopHistory]:
+        """Look up the history of shops.
+        Arguments:
+            shop_domains {List[str]} -- Domains of the shops
+        Returns:
+            Dict[str, ShopHistory] -- History of the shops that have one
+        """
+        placeholders: str = ', '.join('?' * len(shop_domains))
+        rows: Iterable[tuple] = self.connection.execute(
+            'SELECT shop_domain, first_fetched, last_fetched, changes, '
+            f'failures, last_attempt FROM shops WHERE shop_domain IN ({placeholders})',  # noqa: S608
+            shop_domains,
+        )
+        return {row[0]: ShopHistory(*row[1:]) for row in rows}
+
+
+def scheduler_from_config(config: dict) -> Optional[Scheduler]:
+    """Create the scheduler if it is enabled in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Returns:
+        Optional[Scheduler] -- The scheduler or None if it is disabled
+    """
+    path: Optional[str] = config.get('schedule_path')
+    if not path:
+        return None
+
+    return Scheduler(
+        path,
+        budget=int(config.get('schedule_budget', DEFAULT_SCHEDULE_BUDGET)),
+        refresh_days=float(
+            config.get('schedule_refresh_days', DEFAULT_SCHEDULE_REFRESH_DAYS),
+        ),
+    )
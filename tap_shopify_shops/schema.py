@@ -1,10 +1,22 @@
 """Schema loading."""
 # -*- coding: utf-8 -*-
+import copy
+import hashlib
 import json
 import os
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict
 
 from singer.schema import Schema
 
+try:
+    from importlib.resources import files
+except ImportError:  # Python 3.8
+    files = None  # noqa: WPS440
+
+SCHEMA_DIRECTORY: str = 'schemas'
+
 
 def get_abs_path(path: str) -> str:
     """Help function to get the absolute path.
@@ -18,19 +30,62 @@ def get_abs_path(path: str) -> str:
         path,
     )
 
+
+@lru_cache(maxsize=None)
+def read_schema_files() -> MappingProxyType:
+    """Read the schema files of the package, once per process.
+    Returns:
+        MappingProxyType -- Raw contents per stream name
+    """
+    contents: Dict[str, bytes] = {}
+
+    if files is not None:
+        directory = files(__package__).joinpath(SCHEMA_DIRECTORY)
+        for schema_file in directory.iterdir():
+            if schema_file.name.endswith('.json'):
+                contents[schema_file.name[:-5]] = schema_file.read_bytes()
+    else:
+        abs_path: str = get_abs_path(SCHEMA_DIRECTORY)
+        for filename in os.listdir(abs_path):
+            if filename.endswith('.json'):
+                with open(os.path.join(abs_path, filename), 'rb') as raw:
+                    contents[filename[:-5]] = raw.read()
+
+    return MappingProxyType(dict(sorted(contents.items())))
+
+
+def schema_hash() -> str:
+    """Hash of the schema files, changes when a schema changes.
+    Returns:
+        str -- Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for stream_name, raw_schema in read_schema_files().items():
+        digest.update(stream_name.encode('utf-8'))
+        digest.update(raw_schema)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _parse_schemas() -> MappingProxyType:
+    """Parse the schema files, once per process.
+    Returns:
+        MappingProxyType -- JSON schemas per stream name
+    """
+    return MappingProxyType({
+        stream_name: json.loads(raw_schema)
+        for stream_name, raw_schema in read_schema_files().items()
+    })
+
+
 def load_schemas() -> dict:
     """Load schemas from schemas folder.
+    The files are only read and parsed on the first call, every call gets
+    its own Schema objects, so a caller can change them.
     Returns:
         dict -- Scemas
     """
-    schemas: dict = {}
-
-    # For every file in the schemas directory
-    for filename in os.listdir(get_abs_path('schemas')):
-        abs_path: str = get_abs_path('schemas')
-        file_raw: str = filename.replace('.json', '')
-
-        # Open and load the schema
-        with open(f'{abs_path}/{filename}') as schema_file:
-            schemas[file_raw] = Schema.from_dict(json.load(schema_file))
-    return schemas
\ No newline at end of file
+    return {
+        stream_name: Schema.from_dict(copy.deepcopy(schema))
+        for stream_name, schema in _parse_schemas().items()
+    }
@@ -1,47 +1,107 @@
 """Shopify Shops Scrape."""  # noqa: WPS226
 # -*- coding: utf-8 -*-
 
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone, date
 from types import MappingProxyType
-from typing import Generator, Optional, Callable
+from typing import Any, AsyncGenerator, Generator, Iterator, Optional, Callable, Union
 
 import httpx
 import singer
 import time
 import collections
-import pandas as pd
-import requests
 from dateutil.parser import isoparse
 from dateutil.rrule import DAILY, rrule
+from tap_shopify_shops.cache import ResponseCache, cache_from_config
 from tap_shopify_shops.cleaners import CLEANERS
-from google.cloud import bigquery
-
-URL_SCHEME: str = 'https://'
-URL_END: str = '/meta.json'
+from tap_shopify_shops.decoders import create_decoder
+from tap_shopify_shops.domains import DomainIndex, domain_index_from_config
+from tap_shopify_shops.fetcher import (
+    Fetcher,
+    Progress,
+    create_client,
+    fetcher_options,
+)
+from tap_shopify_shops.metrics import (
+    RunMetrics,
+    metrics_from_config,
+    timed,
+    timed_iter,
+)
+from tap_shopify_shops.resolver import resolver_from_config
+from tap_shopify_shops.retry import (
+    dead_letter_from_config,
+    retry_policy_from_config,
+)
+from tap_shopify_shops.schedule import Scheduler, scheduler_from_config
+from tap_shopify_shops.sources import DomainSource, domain_source_from_config
+from tap_shopify_shops.streams import (
+    EXTRACTED_AT_FORMAT,
+    RESPONSE_FIELDS,
+    SHOP_ID_PREFIX,
+)
+from tap_shopify_shops.validation import (
+    ResponseValidator,
+    ValidationError,
+    validator_for_stream,
+)
 
 HEADERS: MappingProxyType = MappingProxyType({  # Frozen dictionary
     'Content-Type': 'application/graphql',
     'X-Shopify-Access-Token': ':token:',
 })
 
+
 class Shopify_Shops(object):  # noqa: WPS230
     """Shopify Shops Scrape."""
 
     def __init__(
         self,
+        config: Optional[dict] = None,
         # organization_id: str,
         # shopify_partners_access_token: str,
     ) -> None:
         """Initialize client.
         Arguments:
+            config {Optional[dict]} -- Tap config with the scrape options
             # organization_id {str} -- Shopify Partners organization id
             # shopify_partners_access_token {str} -- Shopify Partners Server Token
         """
         # self.organization_id: str = organization_id
         # self.shopify_partners_access_token: str = shopify_partners_access_token
+        self.config: dict = config or {}
         self.logger: logging.Logger = singer.get_logger()
-        self.client: httpx.Client = httpx.Client(http2=True)
+        self.domain_source: DomainSource = domain_source_from_config(
+            self.config,
+        )
+        self.client: httpx.AsyncClient = create_client(self.config)
+        self.cache: Optional[ResponseCache] = cache_from_config(self.config)
+        self.metrics: Optional[RunMetrics] = metrics_from_config(self.config)
+        self.domain_index: Optional[DomainIndex] = domain_index_from_config(
+            self.config,
+        )
+        self.scheduler: Optional[Scheduler] = scheduler_from_config(
+            self.config,
+        )
+        self.fetcher: Fetcher = Fetcher(
+            self.client,
+            cache=self.cache,
+            retry_policy=retry_policy_from_config(self.config),
+            dead_letter=dead_letter_from_config(self.config),
+            decoder=create_decoder(
+                RESPONSE_FIELDS,
+                self.config.get('json_backend'),
+            ),
+            metrics=self.metrics,
+            resolver=resolver_from_config(self.config),
+            domain_index=self.domain_index,
+            scheduler=self.scheduler,
+            **fetcher_options(self.config),
+        )
+        self.validator: ResponseValidator = validator_for_stream(
+            'shopify_shops',
+        )
 
     def shopify_shops(
         self,
@@ -50,6 +110,18 @@ class Shopify_Shops(object):  # noqa: WPS230
         """
         Shopify Shop meta.json scrape
         """
+        yield from self._run(self.shopify_shops_async(**kwargs))
+
+    async def shopify_shops_async(
+        self,
+        **kwargs: dict,
+    ) -> AsyncGenerator[dict, None]:
+        """Shopify Shop meta.json scrape on a running event loop.
+        Keyword Arguments:
+            kwargs {dict} -- Stream state, with the start_date
+        Yields:
+            AsyncGenerator[dict, None] -- Cleaned rows
+        """
         self.logger.info('Stream Shopify shop data')
 
         # Validate the start_date value exists
@@ -68,71 +140,165 @@ class Shopify_Shops(object):  # noqa: WPS230
         # # start_date is parsed into batches, thus we remove it from the kwargs
         kwargs.pop('start_date', None)
 
+        # resume from the checkpoint of an interrupted scrape
+        progress: Progress = Progress(
+            cursor=int(kwargs.pop('cursor', 0)),
+            in_flight=kwargs.pop('in_flight', ()),
+        )
+        if progress.cursor:
+            self.logger.info(
+                f'Resuming after {progress.cursor} shops, '
+                f'{len(progress.in_flight)} in flight',
+            )
+
         # date_day = self.date_cleaner(start_date_string)
-        date_day = time.strftime("%Y-%m-%d %l:%M:%S %Z")
-
-        bqclient = bigquery.Client.from_service_account_json('/opt/airflow/singer/biquery_credentials.json')
-        query_string = """SELECT DISTINCT shop_domain 
-                        FROM `yoast-269513.shopify_partners_raw.shopify_partners_app_subscription_charge`"""
-        df_urls = bqclient.query(query_string).result().to_dataframe()
-
-        # create an empty dataframe
-        df_results = pd.DataFrame(columns=['id', 'name', 'city', 'province', 
-                                    'country', 'currency', 'domain', 'url', 
-                                    'myshopify_domain', 'description', 'ships_to_countries', 
-                                    'money_format', 'published_collections_count', 
-                                    'published_products_count', 
-                                    'shopify_pay_enabled_card_brands'])
-        
-        # loop through each url, make the request, convert to json, append to result df
-        
-        for url in df_urls.itertuples():
-            try:
-                temp_url = URL_SCHEME + url.shop_domain + URL_END
-                json_response = requests.get(temp_url).json()
-                # check if the response has the right amount of columns. An error message would only have 1
-                if(len(json_response) != 15):
-                    self.logger.info(f"Exception occurred. Response from {temp_url}: {json_response}")
-                else:
-                    df_results = df_results.append([json_response], ignore_index=True)
-                time.sleep(1)
-            except:
-                self.logger.info(f"Exception occurred. Failed to scrape: {temp_url}")
-        
-        # drop the columns we don't care about
-        df_results.drop(['ships_to_countries', 'money_format', 'shopify_pay_enabled_card_brands'], axis=1, inplace=True)
-
-        # convert to numeric
-        df_results[['id', 'published_collections_count', 'published_products_count']] = df_results[['id', 'published_collections_count', 'published_products_count']].apply(pd.to_numeric)
-
-        # add a column to turn the id into the same url + id format the other tables have
-        df_results['shop_id'] = df_results.apply(lambda row: "gid://partners/Shop/" + str(row.id), axis=1)
-
-        # add a date column
-        df_results['extracted_at'] = time.strftime("%Y-%m-%d %l:%M:%S %Z")
-
-        # If we ever want to only append new shops to the list, the following is code to do that.
-        # Note: would need to add logic to delete the shop from the table if it already exists 
-        # and has been grabbed fresh so the new data can replace the old data.
-        # # get the shops we've already scraped
-        # shop_query_string = """SELECT DISTINCT shop_domain 
-        #                     FROM `yoast-269513.shopify_partners_raw.shopify_shop_scrape`"""
-        # df_already_scraped_urls = bqclient.query(shop_query_string).result().to_dataframe()
-
-        # # compare already-scraped shops to results, keeping only new entries
-        # df_new_entries = df_results.merge(df_already_scraped_urls, left_on='myshopify_domain', 
-        #                                     right_on='shop_domain', how='outer', 
-        #                                     indicator=True).loc[lambda x:x['_merge']=='left_only']
-        # df_new_entries.drop(['_merge'], axis=1, inplace=True)
+        date_day = time.strftime(EXTRACTED_AT_FORMAT)
+
+        # the domains are streamed from the source while the fetches run,
+        # the scheduler picks the shops of this run within the budget
+        domains: Iterator[str] = iter(self.domain_source)
+        if self.scheduler is not None:
+            domains = self.scheduler.schedule(
+                domains,
+                resume=bool(progress.cursor or progress.in_flight),
+            )
+        shop_domains: Iterator[str] = timed_iter(
+            self.metrics,
+            'domains',
+            domains,
+        )
 
         # Define cleaner:
-        cleaner: Callable = CLEANERS.get('shopify_shops')
+        cleaner: Callable = timed(
+            self.metrics,
+            'clean',
+            CLEANERS.get('shopify_shops'),
+        )
+        validate: Callable = timed(
+            self.metrics,
+            'validate',
+            self.validator.validate,
+        )
 
-        for row in df_results.itertuples():
-            yield cleaner(date_day, row)
+        # fetch the urls concurrently, the responses arrive in the order of the urls
+        # every shop flows through the pipeline on its own, so memory stays flat
+        responses: AsyncGenerator[dict, None] = self.fetcher.fetch_all(
+            shop_domains,
+            progress,
+        )
+        try:
+            async for json_response in responses:
+                # an error message or a page that is not a shop fails validation
+                try:
+                    row: dict = validate(json_response)
+                except ValidationError as error:
+                    self.logger.info(
+                        f'Invalid response ({error.reason}): {json_response}',
+                    )
+                    continue
+                yield cleaner(date_day, self._derive_fields(row, date_day))
+        finally:
+            await responses.aclose()
 
+        self.fetcher.pool_stats.report(self.logger)
+        self.fetcher.rate_limiter.report(self.logger)
+        if self.fetcher.resolver is not None:
+            self.fetcher.resolver.report(self.logger)
+        self.logger.info(f'Failed to scrape {self.fetcher.failed} shops')
+        self.validator.report(self.logger)
+        if self.cache is not None:
+            self.cache.report(self.logger)
+        if self.domain_index is not None:
+            self.domain_index.report(self.logger)
+        if self.scheduler is not None:
+            self.scheduler.report(self.logger)
+        if self.metrics is not None:
+            self._count_run()
         self.logger.info('Finished: shopify_shop_scrape')
 
+    def checkpoint(self) -> dict:
+        """Checkpoint of the running scrape for the Singer state.
+        Returns:
+            dict -- Position in the domain source and the domains in flight
+        """
+        return self.fetcher.progress.to_state()
+
+    def _count_run(self) -> None:
+        """Add the counters of the scrape to the run metrics."""
+        counters: dict = self.metrics.counters  # type: ignore
+        counters['shops_failed'] = self.fetcher.failed
+        counters['handshakes'] = self.fetcher.pool_stats.handshakes
+        counters['connection_reuse_ratio'] = (
+            self.fetcher.pool_stats.reuse_ratio
+        )
+        counters['throttled'] = self.fetcher.rate_limiter.throttled
+        counters['responses_valid'] = self.validator.valid
+        counters['validation_failures'] = dict(self.validator.failures)
+        if self.cache is not None:
+            counters['cache_not_modified'] = self.cache.hits
+            counters['cache_misses'] = self.cache.misses
+            counters['cache_uncacheable'] = self.cache.uncacheable
+        if self.fetcher.resolver is not None:
+            counters['dns_lookups'] = self.fetcher.resolver.lookups
+            counters['dns_cache_hits'] = self.fetcher.resolver.cache_hits
+            counters['dns_seconds'] = self.fetcher.resolver.seconds
+            counters['dns_failures'] = dict(self.fetcher.resolver.failures)
+        if self.domain_index is not None:
+            counters['aliases_skipped'] = self.domain_index.skipped
+        if self.scheduler is not None:
+            counters['shops_planned'] = self.scheduler.planned
+            counters['shops_new'] = self.scheduler.new
+            counters['shops_overdue'] = self.scheduler.overdue
+            counters['shops_backing_off'] = self.scheduler.backing_off
+            counters['shops_changed'] = self.scheduler.changed
+
+    def _derive_fields(self, row: dict, extracted_at: str) -> dict:
+        """Add the shop_id and extracted_at fields.
+        Arguments:
+            row {dict} -- Projected response
+            extracted_at {str} -- Time of the scrape
+        Returns:
+            dict -- Row with the derived fields
+        """
+        # turn the id into the same url + id format the other tables have
+        row['shop_id'] = SHOP_ID_PREFIX + str(row['id'])
+        row['extracted_at'] = extracted_at
+        return row
+
+    async def aclose(self) -> None:
+        """Close the HTTP client and the on-disk indexes."""
+        await self.client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if self.domain_index is not None:
+            self.domain_index.close()
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def _run(
+        self,
+        rows: AsyncGenerator[dict, None],
+    ) -> Generator[dict, None, None]:
+        """Drive an async generator from synchronous code.
+        The event loop runs while the next item is awaited, so the fetches in
+        the background progress until the item is available.
+        Arguments:
+            rows {AsyncGenerator[dict, None]} -- Async generator
+        Yields:
+            Generator[dict, None, None] -- Items of the async generator
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(rows.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(rows.aclose())
+            loop.run_until_complete(self.aclose())
+            loop.close()
+
     # def _create_headers(self) -> None:
     #     """Create authenticationn headers for requests."""
     #     headers: dict = dict(HEADERS)
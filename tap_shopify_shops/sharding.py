@@ -0,0 +1,348 @@
+"""Sharded scrapes across processes and machines."""
+# -*- coding: utf-8 -*-
+import argparse
+import copy
+import json
+import logging
+import os
+import queue
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import threading
+from typing import IO, Dict, List, Optional, Set, Tuple
+
+import singer
+
+from tap_shopify_shops.tools import CHECKPOINT_KEYS
+
+LOGGER: logging.RootLogger = singer.get_logger()
+
+# Files that can not be shared by shards, every shard gets its own
+SHARD_PATH_KEYS: tuple = (
+    'bulk_output_dir',
+    'cache_path',
+    'cdc_index_path',
+    'dead_letter_path',
+    'domain_index_path',
+    'run_report_path',
+    'schedule_path',
+)
+
+# Lines with a record are passed through without decoding them
+RECORD_PREFIX: str = '{"type": "RECORD"'
+
+# Lines read from a worker before they are handed to the driver
+WORKER_BATCH_SIZE: int = 500
+
+
+def parse_shard_args(argv: List[str]) -> Tuple[argparse.Namespace, List[str]]:
+    """Parse the shard arguments, before Singer parses the others.
+    Arguments:
+        argv {List[str]} -- Command line arguments
+    Returns:
+        Tuple[argparse.Namespace, List[str]] -- Shard arguments and the rest
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--shard-index', type=int)
+    parser.add_argument('--shard-count', type=int)
+    parser.add_argument('--workers', type=int)
+    return parser.parse_known_args(argv)
+
+
+def shard_key(shard_index: int, shard_count: int) -> str:
+    """Key of a shard in the state and in file names.
+    The number of shards is part of the key, a checkpoint of a scrape with
+    another number of shards covers other shop domains.
+    Arguments:
+        shard_index {int} -- Index of the shard
+        shard_count {int} -- Number of shards
+    Returns:
+        str -- Key, e.g. 2-of-8
+    """
+    return f'{shard_index}-of-{shard_count}'
+
+
+def shard_config(config: dict, shard_index: int, shard_count: int) -> dict:
+    """Tap config of a shard.
+    The schedule budget is split over the shards, the first shards get the
+    remainder. A shard gets a budget of at least one shop, as no budget
+    would fetch all its shops.
+    Arguments:
+        config {dict} -- Tap config
+        shard_index {int} -- Index of the shard
+        shard_count {int} -- Number of shards
+    Raises:
+        ValueError: When the shard index is out of range
+    Returns:
+        dict -- Tap config with the shard and its own files
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f'The shard index {shard_index} must be between 0 and '
+            f'{shard_count - 1}',
+        )
+
+    sharded: dict = dict(config)
+    sharded['shard_index'] = shard_index
+    sharded['shard_count'] = shard_count
+
+    budget: int = int(sharded.get('schedule_budget') or 0)
+    if budget:
+        share: int
+        remainder: int
+        share, remainder = divmod(budget, shard_count)
+        sharded['schedule_budget'] = max(
+            share + int(shard_index < remainder),
+            1,
+        )
+
+    for key in SHARD_PATH_KEYS:
+        if sharded.get(key):
+            sharded[key] = (
+                f'{sharded[key]}.{shard_key(shard_index, shard_count)}'
+            )
+    return sharded
+
+
+def shard_state(state: dict, shard_index: int, shard_count: int) -> dict:
+    """State of a shard from a merged state.
+    The checkpoint of the shard is moved into the bookmark of the stream.
+    A state without shards, e.g. of a single shard, is returned as is.
+    Arguments:
+        state {dict} -- Merged state
+        shard_index {int} -- Index of the shard
+        shard_count {int} -- Number of shards
+    Returns:
+        dict -- State of the shard
+    """
+    sharded: dict = copy.deepcopy(state)
+
+    for bookmark in sharded.get('bookmarks', {}).values():
+        shards: dict = bookmark.pop('shards', None) or {}
+        bookmark.update(shards.get(shard_key(shard_index, shard_count), {}))
+    return sharded
+
+
+class StateMerger(object):
+    """Merge the states of the shards into one state."""
+
+    def __init__(self, state: dict, shard_count: int) -> None:
+        """Initialize the merger.
+        Arguments:
+            state {dict} -- State the scrape started with
+            shard_count {int} -- Number of shards
+        """
+        self.shard_count: int = shard_count
+        self.states: Dict[int, dict] = {
+            shard_index: shard_state(state, shard_index, shard_count)
+            for shard_index in range(shard_count)
+        }
+
+    def update(self, shard_index: int, state: dict) -> dict:
+        """Update the state of a shard.
+        Arguments:
+            shard_index {int} -- Index of the shard
+            state {dict} -- Latest state of the shard
+        Returns:
+            dict -- Merged state
+        """
+        self.states[shard_index] = state
+        return self.merged()
+
+    def merged(self) -> dict:
+        """Merge the states of the shards.
+        The bookmarks are the latest of all shards, the checkpoints of the
+        running shards are kept per shard.
+        Returns:
+            dict -- Merged state
+        """
+        merged: dict = {'bookmarks': {}}
+
+        for shard_index, state in sorted(self.states.items()):
+            if state.get('currently_syncing'):
+                merged['currently_syncing'] = state['currently_syncing']
+
+            for stream, bookmark in state.get('bookmarks', {}).items():
+                merged_bookmark: dict = merged['bookmarks'].setdefault(
+                    stream,
+                    {},
+                )
+                checkpoint: dict = {}
+
+                for key, bookmark_value in bookmark.items():
+                    if key in CHECKPOINT_KEYS:
+                        checkpoint[key] = bookmark_value
+                    elif key == 'shards':
+                        continue
+                    elif key not in merged_bookmark or (
+                        bookmark_value is not None
+                        and str(bookmark_value) > str(merged_bookmark[key])
+                    ):
+                        merged_bookmark[key] = bookmark_value
+
+                if checkpoint:
+                    merged_bookmark.setdefault('shards', {})[
+                        shard_key(shard_index, self.shard_count)
+                    ] = checkpoint
+        return merged
+
+
+def run_workers(  # noqa: WPS210, WPS231
+    workers: int,
+    config_path: str,
+    config: dict,
+    state: dict,
+    catalog_path: Optional[str] = None,
+    output: Optional[IO[str]] = None,
+) -> None:
+    """Run a scrape with a worker process per shard.
+    The Singer output of the workers is merged into one stream. A SCHEMA is
+    written once per stream, the records of a worker keep their order and
+    every STATE of a worker is written as a merged state, after the records
+    it covers. When all workers are done, a final merged state is written.
+    Arguments:
+        workers {int} -- Number of worker processes and shards
+        config_path {str} -- Path to the tap config
+        config {dict} -- Tap config
+        state {dict} -- State, merged or of an unsharded scrape
+    Keyword Arguments:
+        catalog_path {Optional[str]} -- Path to the catalog
+        output {Optional[IO[str]]} -- Output, defaults to stdout
+    Raises:
+        ValueError: When the domains are read from stdin
+        RuntimeError: When a worker failed
+    """
+    if config.get('domain_source') == 'stdin':
+        raise ValueError('The stdin domain_source can not be sharded')
+
+    output = output or sys.stdout
+    merger: StateMerger = StateMerger(state, workers)
+    lines: queue.Queue = queue.Queue(maxsize=workers * 4)
+    processes: List[subprocess.Popen] = []
+    readers: List[threading.Thread] = []
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        for shard_index in range(workers):
+            state_path: str = os.path.join(state_dir, f'{shard_index}.json')
+            with open(state_path, 'w', encoding='utf-8') as state_file:
+                json.dump(merger.states[shard_index], state_file)
+
+            command: List[str] = [
+                sys.executable,
+                '-m',
+                'tap_shopify_shops',
+                '--config',
+                config_path,
+                '--state',
+                state_path,
+                '--shard-index',
+                str(shard_index),
+                '--shard-count',
+                str(workers),
+            ]
+            if catalog_path:
+                command.extend(('--catalog', catalog_path))
+
+            process: subprocess.Popen = subprocess.Popen(  # noqa: S603
+                command,
+                stdout=subprocess.PIPE,
+                encoding='utf-8',
+            )
+            processes.append(process)
+
+            reader: threading.Thread = threading.Thread(
+                target=_read_worker,
+                args=(shard_index, process.stdout, lines),
+                daemon=True,
+            )
+            reader.start()
+            readers.append(reader)
+
+        LOGGER.info(f'Started {workers} workers')
+
+        schemas: Set[str] = set()
+        running: int = workers
+        try:
+            while running:
+                shard_index, batch = lines.get()
+                if batch is None:
+                    running -= 1
+                    continue
+
+                for line in batch:
+                    if line.startswith(RECORD_PREFIX):
+                        output.write(line)
+                        continue
+
+                    message: dict = json.loads(line)
+                    if message['type'] == 'SCHEMA':
+                        if message['stream'] in schemas:
+                            continue
+                        schemas.add(message['stream'])
+                        output.write(line)
+                    elif message['type'] == 'STATE':
+                        _write_state(
+                            output,
+                            merger.update(shard_index, message['value']),
+                        )
+                    else:
+                        output.write(line)
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+                process.wait()
+
+    _write_state(output, merger.merged())
+
+    failed: List[int] = [
+        shard_index
+        for shard_index, process in enumerate(processes)
+        if process.returncode
+    ]
+    if failed:
+        raise RuntimeError(
+            f'Shards {", ".join(map(str, failed))} failed, '
+            f'run again with the last state to resume them',
+        )
+    LOGGER.info(f'All {workers} workers finished')
+
+
+def _read_worker(
+    shard_index: int,
+    worker_output: IO[str],
+    lines: queue.Queue,
+) -> None:
+    """Hand the output of a worker to the driver in batches of lines.
+    A batch ends at every message that is not a record, so a STATE is never
+    held back.
+    Arguments:
+        shard_index {int} -- Index of the shard
+        worker_output {IO[str]} -- Output of the worker
+        lines {queue.Queue} -- Queue of the driver
+    """
+    batch: List[str] = []
+    for line in worker_output:
+        batch.append(line)
+        if (
+            len(batch) >= WORKER_BATCH_SIZE
+            or not line.startswith(RECORD_PREFIX)
+        ):
+            lines.put((shard_index, batch))
+            batch = []
+
+    if batch:
+        lines.put((shard_index, batch))
+    lines.put((shard_index, None))
+
+
+def _write_state(output: IO[str], state: dict) -> None:
+    """Write a STATE message.
+    Arguments:
+        output {IO[str]} -- Output
+        state {dict} -- State
+    """
+    output.write(singer.format_message(singer.StateMessage(value=state)))
+    output.write('\n')
+    output.flush()
@@ -0,0 +1,306 @@
+"""Sources of shop domains."""
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import logging
+import sys
+import zlib
+from types import MappingProxyType
+from typing import IO, Iterator, Set
+
+import singer
+
+LOGGER: logging.RootLogger = singer.get_logger()
+
+# Defaults for the BigQuery source, can be overridden in the tap config
+DEFAULT_BIGQUERY_CREDENTIALS_PATH: str = (
+    '/opt/airflow/singer/biquery_credentials.json'
+)
+DEFAULT_BIGQUERY_QUERY: str = """SELECT DISTINCT shop_domain
+FROM `yoast-269513.shopify_partners_raw.shopify_partners_app_subscription_charge`
+ORDER BY shop_domain"""
+DEFAULT_BIGQUERY_PAGE_SIZE: int = 10000
+
+
+class DomainSource(object):
+    """Source of shop domains."""
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains.
+        Raises:
+            NotImplementedError: Implemented by the sources
+        """
+        raise NotImplementedError
+
+
+class BigQuerySource(DomainSource):
+    """Shop domains from a BigQuery query, streamed page by page."""
+
+    def __init__(
+        self,
+        credentials_path: str = DEFAULT_BIGQUERY_CREDENTIALS_PATH,
+        query: str = DEFAULT_BIGQUERY_QUERY,
+        page_size: int = DEFAULT_BIGQUERY_PAGE_SIZE,
+    ) -> None:
+        """Initialize the source.
+        Keyword Arguments:
+            credentials_path {str} -- Path to the service account json
+            query {str} -- Query that selects an ordered shop_domain column
+            page_size {int} -- Number of rows per page
+        """
+        self.credentials_path: str = credentials_path
+        self.query: str = query
+        self.page_size: int = page_size
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains.
+        Fetching can start as soon as the first page has arrived.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        # Only needed for this source, so the others work without GCP
+        from google.cloud import bigquery  # noqa: WPS433
+
+        client = bigquery.Client.from_service_account_json(
+            self.credentials_path,
+        )
+        rows = client.query(self.query).result(page_size=self.page_size)
+
+        for page in rows.pages:
+            for row in page:
+                yield row['shop_domain']
+
+
+class FileSource(DomainSource):
+    """Shop domains from a newline-delimited file."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the source.
+        Arguments:
+            path {str} -- Path to the file
+        """
+        self.path: str = path
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        with self._open() as domain_file:
+            yield from read_domains(domain_file)
+
+    def _open(self) -> IO[str]:
+        """Open the file.
+        Returns:
+            IO[str] -- File object
+        """
+        return open(self.path, encoding='utf-8')
+
+
+class GzipFileSource(FileSource):
+    """Shop domains from a gzip compressed newline-delimited file."""
+
+    def _open(self) -> IO[str]:
+        """Open the file.
+        Returns:
+            IO[str] -- File object
+        """
+        return gzip.open(self.path, 'rt', encoding='utf-8')
+
+
+class DeadLetterSource(FileSource):
+    """Shop domains from a dead letter file, to replay failed shops."""
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        with self._open() as dead_letter_file:
+            for line in dead_letter_file:
+                if line.strip():
+                    yield json.loads(line)['shop_domain']
+
+
+class StdinSource(DomainSource):
+    """Shop domains from the standard input."""
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        yield from read_domains(sys.stdin)
+
+
+class ShardedSource(DomainSource):
+    """Shop domains of one shard of another source."""
+
+    def __init__(
+        self,
+        source: DomainSource,
+        shard_index: int,
+        shard_count: int,
+    ) -> None:
+        """Initialize the source.
+        Arguments:
+            source {DomainSource} -- Source with the domains of all shards
+            shard_index {int} -- Index of the shard, starting at 0
+            shard_count {int} -- Number of shards
+        """
+        self.source: DomainSource = source
+        self.shard_index: int = shard_index
+        self.shard_count: int = shard_count
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the shop domains of the shard.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        for shop_domain in self.source:
+            if shard_of(shop_domain, self.shard_count) == self.shard_index:
+                yield shop_domain
+
+
+class NormalizedSource(DomainSource):
+    """Normalized shop domains of another source, without duplicates."""
+
+    def __init__(self, source: DomainSource) -> None:
+        """Initialize the source.
+        Arguments:
+            source {DomainSource} -- Source with the raw domains
+        """
+        self.source: DomainSource = source
+        self.duplicates: int = 0
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the normalized shop domains, the first of every variant.
+        Yields:
+            Iterator[str] -- Shop domains
+        """
+        seen: Set[str] = set()
+        self.duplicates = 0
+
+        for shop_domain in self.source:
+            normalized: str = normalize_domain(shop_domain)
+            if not normalized:
+                continue
+            if normalized in seen:
+                self.duplicates += 1
+                continue
+            seen.add(normalized)
+            yield normalized
+
+        LOGGER.info(f'Skipped {self.duplicates} duplicate shop domains')
+
+
+def normalize_domain(shop_domain: str) -> str:
+    """Normalize a shop domain.
+    Variants such as HTTPS://Shop.com/ and shop.com. become shop.com.
+    Arguments:
+        shop_domain {str} -- Domain of the shop, or a URL
+    Returns:
+        str -- Lowercase host without scheme, path and trailing dots
+    """
+    normalized: str = shop_domain.strip().lower()
+    scheme_end: int = normalized.find('://')
+    if scheme_end != -1:
+        normalized = normalized[scheme_end + 3:]
+    return normalized.split('/', 1)[0].rstrip('.')
+
+
+def shard_of(shop_domain: str, shard_count: int) -> int:
+    """Shard of a shop domain.
+    The hash is stable across processes and machines, unlike hash().
+    Arguments:
+        shop_domain {str} -- Domain of the shop
+        shard_count {int} -- Number of shards
+    Returns:
+        int -- Index of the shard
+    """
+    return zlib.crc32(shop_domain.lower().encode('utf-8')) % shard_count
+
+
+def read_domains(lines: IO[str]) -> Iterator[str]:
+    """Read shop domains, one per line.
+    Empty lines and lines starting with a # are skipped.
+    Arguments:
+        lines {IO[str]} -- Lines
+    Yields:
+        Iterator[str] -- Shop domains
+    """
+    for line in lines:
+        shop_domain: str = line.strip()
+        if shop_domain and not shop_domain.startswith('#'):
+            yield shop_domain
+
+
+# Collect all sources
+SOURCES: MappingProxyType = MappingProxyType({
+    'bigquery': BigQuerySource,
+    'file': FileSource,
+    'gzip': GzipFileSource,
+    'dead_letter': DeadLetterSource,
+    'stdin': StdinSource,
+})
+
+
+def domain_source_from_config(config: dict) -> DomainSource:
+    """Create the domain source chosen in the tap config.
+    Arguments:
+        config {dict} -- Tap config
+    Raises:
+        ValueError: When the source type is unknown
+    Returns:
+        DomainSource -- The domain source
+    """
+    source_type: str = config.get('domain_source', 'bigquery')
+    source: DomainSource = _unsharded_source(source_type, config)
+
+    # Normalized before sharding, so all variants land in the same shard
+    if config.get('normalize_domains', True):
+        source = NormalizedSource(source)
+
+    shard_count: int = int(config.get('shard_count', 1))
+    if shard_count > 1:
+        return ShardedSource(
+            source,
+            int(config.get('shard_index', 0)),
+            shard_count,
+        )
+    return source
+
+
+def _unsharded_source(source_type: str, config: dict) -> DomainSource:
+    """Create a domain source with the domains of all shards.
+    Arguments:
+        source_type {str} -- Type of the source
+        config {dict} -- Tap config
+    Raises:
+        ValueError: When the source type is unknown
+    Returns:
+        DomainSource -- The domain source
+    """
+    if source_type not in SOURCES:
+        raise ValueError(
+            f'Unknown domain_source {source_type}, '
+            f'choose from: {", ".join(SOURCES)}',
+        )
+
+    if source_type == 'bigquery':
+        return BigQuerySource(
+            credentials_path=config.get(
+                'bigquery_credentials_path',
+                DEFAULT_BIGQUERY_CREDENTIALS_PATH,
+            ),
+            query=config.get('bigquery_query', DEFAULT_BIGQUERY_QUERY),
+            page_size=int(
+                config.get('bigquery_page_size', DEFAULT_BIGQUERY_PAGE_SIZE),
+            ),
+        )
+    elif source_type == 'stdin':
+        return StdinSource()
+
+    if not config.get('domain_path'):
+        raise ValueError(f'The domain_source {source_type} needs a domain_path')
+    return SOURCES[source_type](config['domain_path'])
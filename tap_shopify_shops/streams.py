@@ -1,9 +1,9 @@
 """Streams metadata."""
 # -*- coding: utf-8 -*-
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
 from types import MappingProxyType
-
-from dateutil.parser import parse as parse_date
+from typing import List, Optional
 
 # Helper constants for timezone parsing
 HOUR: int = 3600
@@ -238,17 +238,89 @@ TIMEZONES: MappingProxyType = MappingProxyType({
 })
 
 
+# tzinfo of every timezone abbreviation, created once
+TZINFOS: MappingProxyType = MappingProxyType({
+    abbreviation: timezone(timedelta(seconds=offset), abbreviation)
+    for abbreviation, offset in TIMEZONES.items()
+})
+
+# Number of distinct date strings remembered by date_parser
+DATE_PARSER_CACHE_SIZE: int = 4096
+
+
+@lru_cache(maxsize=DATE_PARSER_CACHE_SIZE)
 def date_parser(input_date: str) -> str:
     """Help function to parse timezones correctly in strings.
+    ISO 8601 dates and dates ending in a timezone abbreviation are parsed
+    without dateutil, which is only used for other formats. Repeated strings
+    are remembered, so the function is cheap enough for the cleaners.
     Arguments:
         input_date {str} -- Input date as string
     Returns:
         {str} -- Date in isoformat
     """
-    parsed_date: datetime = parse_date(input_date, tzinfos=TIMEZONES)
+    parsed_date: Optional[datetime] = _parse_fast(input_date)
+
+    if parsed_date is None:
+        # Only needed for exotic formats
+        from dateutil.parser import parse as parse_date  # noqa: WPS433
+
+        # The tzinfo objects, dateutil rejects offsets in fractional hours
+        parsed_date = parse_date(input_date, tzinfos=TZINFOS)
     return parsed_date.isoformat()
 
 
+def _parse_fast(input_date: str) -> Optional[datetime]:
+    """Parse an ISO 8601 date, optionally followed by a timezone abbreviation.
+    Arguments:
+        input_date {str} -- Input date as string
+    Returns:
+        Optional[datetime] -- The date or None if the format is not supported
+    """
+    parts: List[str] = input_date.split()
+    tz: Optional[tzinfo] = None
+
+    # E.g. 2021-01-01 9:00:00 CEST
+    if len(parts) == 3 and parts[2] in TZINFOS:
+        tz = TZINFOS[parts[2]]
+        parts.pop()
+
+    if len(parts) == 2:
+        # Hours can be padded with a space instead of a zero
+        iso_time: str = parts[1]
+        if iso_time.find(':') == 1:
+            iso_time = f'0{iso_time}'
+        iso_date: str = f'{parts[0]}T{iso_time}'
+    elif len(parts) == 1:
+        iso_date = parts[0]
+    else:
+        return None
+
+    # Python before 3.11 does not parse the Z suffix
+    if iso_date.endswith('Z'):
+        iso_date = f'{iso_date[:-1]}+00:00'
+
+    try:
+        parsed_date: datetime = datetime.fromisoformat(iso_date)
+    except ValueError:
+        return None
+
+    if tz is not None:
+        if parsed_date.tzinfo is not None:
+            return None
+        return parsed_date.replace(tzinfo=tz)
+    return parsed_date
+
+
+# Format of the extracted_at field of the records
+EXTRACTED_AT_FORMAT: str = '%Y-%m-%d %l:%M:%S %Z'
+
+# Prefix of the shop_id, the same url + id format the other tables have
+SHOP_ID_PREFIX: str = 'gid://partners/Shop/'
+
+# Fields derived from the response instead of read from it
+DERIVED_FIELDS: frozenset = frozenset(('shop_id', 'extracted_at'))
+
 # Streams metadata
 STREAMS: MappingProxyType = MappingProxyType({
     'shopify_shops': {
@@ -256,6 +328,7 @@ STREAMS: MappingProxyType = MappingProxyType({
         'replication_method': 'INCREMENTAL',
         'replication_key': 'extracted_at',
         'bookmark': 'start_date',
+        'change_key': 'shop_domain',
         'mapping': {
             'id': {
                 'map': 'id', 'null': False,
@@ -301,4 +374,10 @@ STREAMS: MappingProxyType = MappingProxyType({
             },
         }
     }
-})
\ No newline at end of file
+})
+
+# Fields of the meta.json that end up in the records
+RESPONSE_FIELDS: tuple = tuple(
+    field for field in STREAMS['shopify_shops']['mapping']
+    if field not in DERIVED_FIELDS
+)
@@ -1,24 +1,41 @@
 """Sync data."""
 # -*- coding: utf-8 -*-
+import asyncio
+import inspect
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Callable, Optional
+from typing import AsyncGenerator, Callable, List, Optional
 
 import singer
 from singer.catalog import Catalog, CatalogEntry
 
 from tap_shopify_shops import tools
+from tap_shopify_shops.changes import DELETED_AT, ChangeIndex
+from tap_shopify_shops.fetcher import iterate_in_thread
+from tap_shopify_shops.metrics import RunMetrics, timed
+from tap_shopify_shops.output import (
+    DEFAULT_OUTPUT_BUFFER_SIZE,
+    OutputPipe,
+    SingerWriter,
+)
 from tap_shopify_shops.scrape import Shopify_Shops
-from tap_shopify_shops.streams import STREAMS
+from tap_shopify_shops.streams import EXTRACTED_AT_FORMAT, STREAMS
 
 LOGGER: logging.RootLogger = singer.get_logger()
 
+# Default number of streams synced at once in the async sync
+DEFAULT_STREAM_CONCURRENCY: int = 1
+
 
 def sync(
     shopify_shops: Shopify_Shops,
     state: dict,
     catalog: Catalog,
     start_date: str,
+    change_index: Optional[ChangeIndex] = None,
+    writer: Optional[SingerWriter] = None,
+    metrics: Optional[RunMetrics] = None,
 ) -> None:
     """Sync data from tap source.
     Arguments:
@@ -26,7 +43,14 @@ def sync(
         state {dict} -- Tap state
         catalog {Catalog} -- Stream catalog
         start_date {str} -- Start date
+    Keyword Arguments:
+        change_index {Optional[ChangeIndex]} -- Only sync changed records
+        writer {Optional[SingerWriter]} -- Singer or bulk output
+        metrics {Optional[RunMetrics]} -- Timers and counters of the run
     """
+    writer = writer or SingerWriter()
+    output_record: Callable = timed(metrics, 'output', sync_record)
+
     # For every stream in the catalog
     LOGGER.info('Sync')
     LOGGER.debug('Current state:\n{state}')
@@ -49,7 +73,7 @@ def sync(
         LOGGER.debug(f'Stream state: {stream_state}')
         LOGGER.info(f'Stream state: {stream_state}')
         # Write the schema
-        singer.write_schema(
+        writer.write_schema(
             stream_name=stream.tap_stream_id,
             schema=stream.schema.to_dict(),
             key_properties=stream.key_properties,
@@ -61,17 +85,224 @@ def sync(
         # The state of the stream is used as kwargs for the method
         # E.g. if the state of the stream has a key 'start_date', it will be
         # used in the method as start_date='2021-01-01T00:00:00+0000'
-        for row in tap_data(**stream_state):
-            sync_record(stream, row, state)
+        # The checkpoint is saved with the state, so an interrupted scrape
+        # can resume where it stopped
+        checkpoint: Optional[Callable] = getattr(
+            shopify_shops,
+            'checkpoint',
+            None,
+        )
+
+        # Without a state, the scrape starts from the configured start date
+        stream_kwargs: dict = stream_state or {'start_date': start_date}
+        if change_index is not None:
+            change_index.resume(stream_state)
+
+        for row in tap_data(**stream_kwargs):
+            output_record(
+                stream,
+                row,
+                state,
+                writer,
+                change_index,
+                checkpoint,
+            )
+
+        if change_index is not None:
+            sync_deleted_records(stream, state, writer, change_index)
+
+        # The scrape finished, the next one starts from the beginning
+        tools.clear_checkpoint(state, stream.tap_stream_id)
+        tools.clear_currently_syncing(state)
+        writer.write_state(state)
+        if change_index is not None:
+            change_index.commit()
+
+    writer.flush()
+
+    if metrics is not None:
+        metrics.counters['records'] = writer.records
+
+    if change_index is not None:
+        change_index.report(LOGGER)
+        change_index.close()
+
+
+async def sync_async(  # noqa: WPS211
+    shopify_shops: Shopify_Shops,
+    state: dict,
+    catalog: Catalog,
+    start_date: str,
+    change_index: Optional[ChangeIndex] = None,
+    writer: Optional[SingerWriter] = None,
+    metrics: Optional[RunMetrics] = None,
+    stream_concurrency: int = DEFAULT_STREAM_CONCURRENCY,
+    output_buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+) -> None:
+    """Sync data from tap source on a running event loop.
+    The output is written by its own thread, the streams keep fetching
+    while the target reads slowly, until the output buffer is full.
+    Arguments:
+        shopify_shops {Shopify_Shops} -- Shopify shops object
+        state {dict} -- Tap state
+        catalog {Catalog} -- Stream catalog
+        start_date {str} -- Start date
+    Keyword Arguments:
+        change_index {Optional[ChangeIndex]} -- Only sync changed records
+        writer {Optional[SingerWriter]} -- Singer or bulk output
+        metrics {Optional[RunMetrics]} -- Timers and counters of the run
+        stream_concurrency {int} -- Streams synced at once
+        output_buffer_size {int} -- Characters buffered for the output
+    """
+    output: SingerWriter = writer or SingerWriter()
+    pipe: OutputPipe = OutputPipe(output.output, output_buffer_size)
+    output.output = pipe
+
+    LOGGER.info('Sync')
+    LOGGER.debug('Current state:\n{state}')
+
+    # The stream of an interrupted sync starts first, like in sync()
+    streams: List[CatalogEntry] = list(catalog.get_selected_streams(state))
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(stream_concurrency)
+
+    async def sync_stream(stream: CatalogEntry) -> None:  # noqa: WPS430
+        async with semaphore:
+            await sync_stream_async(
+                shopify_shops,
+                stream,
+                state,
+                start_date,
+                output,
+                pipe,
+                change_index,
+                metrics,
+            )
+
+    try:
+        await asyncio.gather(*(sync_stream(stream) for stream in streams))
+        output.flush()
+    finally:
+        # The thread writes the rest of the buffer
+        await asyncio.get_event_loop().run_in_executor(None, pipe.close)
+        LOGGER.info(f'Output: waited {pipe.waits} times for the target')
+
+    if metrics is not None:
+        metrics.counters['records'] = output.records
+        metrics.counters['output_waits'] = pipe.waits
+
+    if change_index is not None:
+        change_index.report(LOGGER)
+        change_index.close()
+
+
+async def sync_stream_async(  # noqa: WPS211
+    shopify_shops: Shopify_Shops,
+    stream: CatalogEntry,
+    state: dict,
+    start_date: str,
+    writer: SingerWriter,
+    pipe: OutputPipe,
+    change_index: Optional[ChangeIndex] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> None:
+    """Sync a stream on a running event loop.
+    An async generator method of the stream, <stream>_async, is preferred,
+    a synchronous generator method is iterated in a thread.
+    Arguments:
+        shopify_shops {Shopify_Shops} -- Shopify shops object
+        stream {CatalogEntry} -- Stream catalog
+        state {dict} -- Tap state
+        start_date {str} -- Start date
+        writer {SingerWriter} -- Singer or bulk output
+        pipe {OutputPipe} -- Output of the writer
+    Keyword Arguments:
+        change_index {Optional[ChangeIndex]} -- Only sync changed records
+        metrics {Optional[RunMetrics]} -- Timers and counters of the run
+    """
+    output_record: Callable = timed(metrics, 'output', sync_record)
+    LOGGER.info(f'Syncing stream: {stream.tap_stream_id}')
+    singer.set_currently_syncing(state, stream.tap_stream_id)
+
+    stream_state: dict = tools.get_stream_state(state, stream.tap_stream_id)
+    LOGGER.info(f'Stream state: {stream_state}')
+    writer.write_schema(
+        stream_name=stream.tap_stream_id,
+        schema=stream.schema.to_dict(),
+        key_properties=stream.key_properties,
+    )
+
+    tap_data: Callable = getattr(
+        shopify_shops,
+        f'{stream.tap_stream_id}_async',
+        None,
+    ) or getattr(shopify_shops, stream.tap_stream_id)
+    checkpoint: Optional[Callable] = getattr(shopify_shops, 'checkpoint', None)
+
+    # Without a state, the scrape starts from the configured start date
+    stream_kwargs: dict = stream_state or {'start_date': start_date}
+    if change_index is not None:
+        change_index.resume(stream_state)
+    rows: AsyncGenerator[dict, None]
+    if inspect.isasyncgenfunction(tap_data):
+        rows = tap_data(**stream_kwargs)
+    else:
+        rows = iterate_in_thread(tap_data(**stream_kwargs))
 
+    try:
+        async for row in rows:
+            output_record(
+                stream,
+                row,
+                state,
+                writer,
+                change_index,
+                checkpoint,
+            )
+            # Wait for the target while the output buffer is full
+            await pipe.drain()
+    finally:
+        await rows.aclose()
 
-def sync_record(stream: CatalogEntry, row: dict, state: dict) -> None:
+    if change_index is not None:
+        sync_deleted_records(stream, state, writer, change_index)
+
+    # The scrape finished, the next one starts from the beginning
+    tools.clear_checkpoint(state, stream.tap_stream_id)
+    tools.clear_currently_syncing(state)
+    writer.write_state(state)
+    if change_index is not None:
+        change_index.commit()
+
+
+def sync_record(
+    stream: CatalogEntry,
+    row: dict,
+    state: dict,
+    writer: SingerWriter,
+    change_index: Optional[ChangeIndex] = None,
+    checkpoint: Optional[Callable] = None,
+) -> None:
     """Sync the record.
     Arguments:
         stream {CatalogEntry} -- Stream catalog
         row {dict} -- Record
         state {dict} -- State
+        writer {SingerWriter} -- Buffered output for the messages
+    Keyword Arguments:
+        change_index {Optional[ChangeIndex]} -- Only sync changed records
+        checkpoint {Optional[Callable]} -- Progress of the scrape to save
     """
+    # Skip records with the same content as in the last run, the progress
+    # is still saved when a state is due
+    if change_index is not None and not change_index.has_changed(
+        stream.tap_stream_id,
+        str(row[STREAMS[stream.tap_stream_id]['change_key']]),
+        row,
+        frozenset((stream.replication_key,)),
+    ):
+        write_state_when_due(stream, state, writer, change_index, checkpoint)
+        return
+
     # Retrieve the value of the bookmark
     bookmark: Optional[str] = tools.retrieve_bookmark_with_path(
         stream.replication_key,
@@ -82,12 +313,8 @@ def sync_record(stream: CatalogEntry, row: dict, state: dict) -> None:
     # new_bookmark: str = tools.create_bookmark(stream.tap_stream_id, bookmark)
 
     # Write a row to the stream
-    singer.write_record(
-        stream.tap_stream_id,
-        row,
-        time_extracted=datetime.now(timezone.utc),
-    )
-    
+    writer.write_record(stream.tap_stream_id, row)
+
     if bookmark:
         # Save the bookmark to the state
         singer.write_bookmark(
@@ -96,8 +323,67 @@ def sync_record(stream: CatalogEntry, row: dict, state: dict) -> None:
             STREAMS[stream.tap_stream_id]['bookmark'],
             bookmark,
         )
+        write_state_when_due(stream, state, writer, change_index, checkpoint)
 
-        # Clear currently syncing
-        tools.clear_currently_syncing(state)
-        # Write the bookmark
-        singer.write_state(state)
\ No newline at end of file
+
+def write_state_when_due(
+    stream: CatalogEntry,
+    state: dict,
+    writer: SingerWriter,
+    change_index: Optional[ChangeIndex] = None,
+    checkpoint: Optional[Callable] = None,
+) -> None:
+    """Write the state with the progress of the scrape, when it is due.
+    Arguments:
+        stream {CatalogEntry} -- Stream catalog
+        state {dict} -- State
+        writer {SingerWriter} -- Buffered output for the messages
+    Keyword Arguments:
+        change_index {Optional[ChangeIndex]} -- Committed after the state
+        checkpoint {Optional[Callable]} -- Progress of the scrape to save
+    """
+    # Only every number of records or seconds a state is written
+    if not writer.state_due():
+        return
+
+    # Save the progress of the scrape to the state
+    progress: dict = checkpoint() if checkpoint else {}
+    if change_index is not None:
+        progress = {**progress, **change_index.checkpoint()}
+    for key, checkpoint_value in progress.items():
+        singer.write_bookmark(
+            state,
+            stream.tap_stream_id,
+            key,
+            checkpoint_value,
+        )
+
+    # Write the bookmark, the records it covers are written before it
+    writer.write_state(state)
+    if change_index is not None:
+        change_index.commit()
+
+
+def sync_deleted_records(
+    stream: CatalogEntry,
+    state: dict,
+    writer: SingerWriter,
+    change_index: ChangeIndex,
+) -> None:
+    """Sync the records that vanished from the source as deleted.
+    Arguments:
+        stream {CatalogEntry} -- Stream catalog
+        state {dict} -- State
+        writer {SingerWriter} -- Buffered output for the messages
+        change_index {ChangeIndex} -- Change data capture index
+    """
+    deleted_at: str = datetime.now(timezone.utc).isoformat()
+    extracted_at: str = time.strftime(EXTRACTED_AT_FORMAT)
+
+    for row in change_index.finish_run(stream.tap_stream_id):
+        LOGGER.info(
+            f'Record vanished: {row[STREAMS[stream.tap_stream_id]["change_key"]]}',
+        )
+        row[DELETED_AT] = deleted_at
+        row[stream.replication_key] = extracted_at
+        sync_record(stream, row, state, writer)
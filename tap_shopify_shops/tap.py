@@ -1,50 +1,201 @@
 """Shopify Partners tap."""
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
+import sys
 from argparse import Namespace
+from importlib import metadata
 
-import pkg_resources
 from singer import get_logger, utils
 from singer.catalog import Catalog
 
-from tap_shopify_shops.scrape import Shopify_Shops
 from tap_shopify_shops.discover import discover
-from tap_shopify_shops.sync import sync
+from tap_shopify_shops.sharding import (
+    parse_shard_args,
+    run_workers,
+    shard_config,
+    shard_state,
+)
 
-VERSION: str = pkg_resources.get_distribution('tap-shopify-shops').version
+# Only discovery is imported at startup, the HTTP client, caches and
+# BigQuery are imported when a sync starts
 LOGGER: logging.RootLogger = get_logger()
 REQUIRED_CONFIG_KEYS: tuple = (
     'start_date',
 )
 
 
+def version() -> str:
+    """Version of the installed tap.
+    Returns:
+        str -- Version, or unknown when the tap is not installed
+    """
+    try:
+        return metadata.version('tap-shopify-shops')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def check_config(config: dict) -> None:
+    """Reject options that can not be combined.
+    Arguments:
+        config {dict} -- Tap config
+    Raises:
+        ValueError: When the options conflict
+    """
+    # A shop that the schedule leaves out is not seen in the run, the change
+    # index would count it as missed and finally as deleted
+    if (
+        config.get('cdc_tombstones')
+        and config.get('schedule_path')
+        and int(config.get('schedule_budget', 0))
+    ):
+        raise ValueError(
+            'The cdc_tombstones can not be combined with a schedule_budget',
+        )
+
+
 @utils.handle_top_exception(LOGGER)
 def main() -> None:
     """Run tap."""
+    # Parse the shard arguments, Singer does not know them
+    shard_args: Namespace
+    shard_args, sys.argv[1:] = parse_shard_args(sys.argv[1:])
+
     # Parse command line arguments
     args: Namespace = utils.parse_args(REQUIRED_CONFIG_KEYS)
 
-    LOGGER.info(f'>>> Running tap-shopify-shops v{VERSION}')
+    LOGGER.info(f'>>> Running tap-shopify-shops v{version()}')
 
     # If discover flag was passed, run discovery mode and dump output to stdout
     if args.discover:
-        catalog: Catalog = discover()
+        catalog: Catalog = discover(args.config.get('catalog_snapshot_path'))
         catalog.dump()
         return
 
     # Otherwise run in sync mode
+    check_config(args.config)
+
     if args.catalog:
         # Load command line catalog
         catalog = args.catalog
     else:
         # Load the  catalog
-        catalog = discover()
-    
+        catalog = discover(args.config.get('catalog_snapshot_path'))
+
+    # Run a worker process per shard and merge their output, unless this is
+    # one of the workers
+    workers: int = int(shard_args.workers or args.config.get('workers', 1))
+    if workers > 1 and shard_args.shard_index is None:
+        run_workers(
+            workers,
+            args.config_path,
+            args.config,
+            args.state,
+            catalog_path=getattr(args, 'catalog_path', None),
+        )
+        return
+
+    # Only scrape the shop domains of this shard
+    shard_count: int = int(
+        shard_args.shard_count or args.config.get('shard_count', 1),
+    )
+    if shard_count > 1:
+        shard_index: int = int(
+            shard_args.shard_index
+            if shard_args.shard_index is not None
+            else args.config.get('shard_index', 0),
+        )
+        LOGGER.info(f'Scraping shard {shard_index} of {shard_count}')
+        args.config = shard_config(args.config, shard_index, shard_count)
+        args.state = shard_state(args.state, shard_index, shard_count)
+
+    run_sync(args.config, args.state, catalog)
+
+
+def run_sync(config: dict, state: dict, catalog: Catalog) -> None:
+    """Scrape the shops and write the Singer messages.
+    With async_sync, the sync runs on an event loop with the output written
+    by a thread.
+    Arguments:
+        config {dict} -- Tap config
+        state {dict} -- State
+        catalog {Catalog} -- Stream catalog
+    """
+    # Imported here, so discovery does not load the HTTP client
+    from tap_shopify_shops.changes import (  # noqa: WPS433
+        change_index_from_config,
+    )
+    from tap_shopify_shops.output import writer_from_config  # noqa: WPS433
+    from tap_shopify_shops.scrape import Shopify_Shops  # noqa: WPS433
+    from tap_shopify_shops.sync import sync  # noqa: WPS433
+
+    if config.get('async_sync'):
+        asyncio.run(run_sync_async(config, state, catalog))
+        return
+
     # Initialize Shopify Shops object
-    shopify_shops: Shopify_Shops = Shopify_Shops()
+    shopify_shops: Shopify_Shops = Shopify_Shops(config)
+
+    try:
+        sync(
+            shopify_shops,
+            state,
+            catalog,
+            config['start_date'],
+            change_index=change_index_from_config(config),
+            writer=writer_from_config(config),
+            metrics=shopify_shops.metrics,
+        )
+    finally:
+        # The report is also written when the run failed
+        if shopify_shops.metrics is not None:
+            shopify_shops.metrics.finish(LOGGER)
+
+
+async def run_sync_async(config: dict, state: dict, catalog: Catalog) -> None:
+    """Scrape the shops and write the Singer messages on an event loop.
+    Arguments:
+        config {dict} -- Tap config
+        state {dict} -- State
+        catalog {Catalog} -- Stream catalog
+    """
+    from tap_shopify_shops.changes import (  # noqa: WPS433
+        change_index_from_config,
+    )
+    from tap_shopify_shops.output import (  # noqa: WPS433
+        DEFAULT_OUTPUT_BUFFER_SIZE,
+        writer_from_config,
+    )
+    from tap_shopify_shops.scrape import Shopify_Shops  # noqa: WPS433
+    from tap_shopify_shops.sync import (  # noqa: WPS433
+        DEFAULT_STREAM_CONCURRENCY,
+        sync_async,
+    )
 
-    sync(shopify_shops, args.state, catalog, args.config['start_date'])
+    shopify_shops: Shopify_Shops = Shopify_Shops(config)
 
+    try:
+        await sync_async(
+            shopify_shops,
+            state,
+            catalog,
+            config['start_date'],
+            change_index=change_index_from_config(config),
+            writer=writer_from_config(config),
+            metrics=shopify_shops.metrics,
+            stream_concurrency=int(
+                config.get('stream_concurrency', DEFAULT_STREAM_CONCURRENCY),
+            ),
+            output_buffer_size=int(
+                config.get('output_buffer_size', DEFAULT_OUTPUT_BUFFER_SIZE),
+            ),
+        )
+    finally:
+        await shopify_shops.aclose()
+        # The report is also written when the run failed
+        if shopify_shops.metrics is not None:
+            shopify_shops.metrics.finish(LOGGER)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -4,6 +4,9 @@ from datetime import date, datetime, timedelta
 from functools import reduce
 from typing import Optional
 
+# Keys of the checkpoint in the state of a stream
+CHECKPOINT_KEYS: tuple = ('cursor', 'in_flight', 'cdc_run_started')
+
 
 def clear_currently_syncing(state: dict) -> dict:
     """Clear the currently syncing from the state.
@@ -15,6 +18,17 @@ def clear_currently_syncing(state: dict) -> dict:
     return state.pop('currently_syncing', None)
 
 
+def clear_checkpoint(state: dict, tap_stream_id: str) -> None:
+    """Clear the checkpoint of a finished scrape from the state.
+    Arguments:
+        state {dict} -- State file
+        tap_stream_id {str} -- The id of the stream
+    """
+    stream_state: dict = state.get('bookmarks', {}).get(tap_stream_id) or {}
+    for key in CHECKPOINT_KEYS:
+        stream_state.pop(key, None)
+
+
 def get_stream_state(state: dict, tap_stream_id: str) -> dict:
     """Return the state of the stream.
     Arguments:
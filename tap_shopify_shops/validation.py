@@ -0,0 +1,195 @@
+"""Schema-driven validation of meta.json responses."""
+# -*- coding: utf-8 -*-
+import logging
+from collections import Counter
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from tap_shopify_shops.schema import load_schemas
+from tap_shopify_shops.streams import DERIVED_FIELDS, STREAMS
+
+# Python types for the JSON schema types
+JSON_TYPES: dict = {
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'object': (dict,),
+    'array': (list,),
+}
+
+
+class ValidationError(ValueError):
+    """Response does not match the schema."""
+
+    def __init__(self, reason: str) -> None:
+        """Initialize the error.
+        Arguments:
+            reason {str} -- Failure reason, e.g. missing:id
+        """
+        super().__init__(reason)
+        self.reason: str = reason
+
+
+class FieldCheck(NamedTuple):
+    """Precompiled check of a response field."""
+
+    field: str
+    types: tuple
+    nullable: bool
+    numeric: bool
+
+
+def to_numeric(input_value: Any) -> Optional[Union[int, float]]:
+    """Convert a value to a number, like pandas.to_numeric.
+    Arguments:
+        input_value {Any} -- Input value
+    Returns:
+        Optional[Union[int, float]] -- The number or None for empty values
+    """
+    if input_value is None or input_value == '':
+        return None
+    if isinstance(input_value, (int, float)):
+        return input_value
+    try:
+        return int(input_value)
+    except ValueError:
+        return float(input_value)
+
+
+def compile_checks(
+    schema: dict,
+    mapping: dict,
+    derived_fields: Iterable[str] = (),
+) -> Tuple[FieldCheck, ...]:
+    """Compile the schema into checks of the response fields.
+    The schema describes the records, the mapping translates the fields of
+    the response to the properties of the records. Fields without a property
+    in the schema are not checked.
+    Arguments:
+        schema {dict} -- JSON schema of the stream
+        mapping {dict} -- Mapping of the stream
+    Keyword Arguments:
+        derived_fields {Iterable[str]} -- Fields added after validation
+    Returns:
+        Tuple[FieldCheck, ...] -- Checks
+    """
+    properties: dict = schema.get('properties', {})
+    checks: List[FieldCheck] = []
+
+    for field, key_mapping in mapping.items():
+        if field in derived_fields:
+            continue
+
+        field_schema: Optional[dict] = properties.get(
+            key_mapping.get('map') or field,
+        )
+        if field_schema is None:
+            continue
+
+        json_types: Union[str, list] = field_schema.get('type', [])
+        if isinstance(json_types, str):
+            json_types = [json_types]
+
+        types: tuple = tuple(
+            python_type
+            for json_type in json_types
+            for python_type in JSON_TYPES.get(json_type, ())
+        )
+        checks.append(FieldCheck(
+            field=field,
+            types=types or (object,),
+            nullable='null' in json_types,
+            numeric='number' in json_types or 'integer' in json_types,
+        ))
+    return tuple(checks)
+
+
+class ResponseValidator(object):
+    """Validate and coerce responses with checks compiled from the schema."""
+
+    def __init__(self, checks: Tuple[FieldCheck, ...]) -> None:
+        """Initialize the validator.
+        Arguments:
+            checks {Tuple[FieldCheck, ...]} -- Compiled checks
+        """
+        self.checks: Tuple[FieldCheck, ...] = checks
+        self.valid: int = 0
+        self.failures: Counter = Counter()
+
+    def validate(self, response: Any) -> dict:
+        """Validate a response.
+        Missing nullable fields are set to None and numeric strings are
+        converted to numbers.
+        Arguments:
+            response {Any} -- Decoded response
+        Raises:
+            ValidationError: With the reason when the response is invalid
+        Returns:
+            dict -- The response
+        """
+        if not isinstance(response, dict):
+            self._fail('not_object')
+
+        for check in self.checks:
+            field_value: Any = response.get(check.field)
+
+            # numbers can arrive as strings, empty strings are missing
+            if check.numeric and isinstance(field_value, str):
+                try:
+                    field_value = to_numeric(field_value)
+                except ValueError:
+                    self._fail(f'type:{check.field}')
+                response[check.field] = field_value
+
+            if field_value is None:
+                if not check.nullable:
+                    self._fail(f'missing:{check.field}')
+                response[check.field] = None
+            elif not isinstance(field_value, check.types) or (
+                isinstance(field_value, bool) and bool not in check.types
+            ):
+                self._fail(f'type:{check.field}')
+
+        self.valid += 1
+        return response
+
+    def report(self, logger: logging.Logger) -> None:
+        """Log the validation counters.
+        Arguments:
+            logger {logging.Logger} -- Logger
+        """
+        failures: str = ', '.join(
+            f'{reason}: {count}'
+            for reason, count in self.failures.most_common()
+        )
+        logger.info(
+            f'Validation: {self.valid} valid, '
+            f'{sum(self.failures.values())} invalid ({failures})',
+        )
+
+    def _fail(self, reason: str) -> None:
+        """Count and raise a failure.
+        Arguments:
+            reason {str} -- Failure reason
+        Raises:
+            ValidationError: Always
+        """
+        self.failures[reason] += 1
+        raise ValidationError(reason)
+
+
+def validator_for_stream(stream_name: str) -> ResponseValidator:
+    """Create the validator of a stream from its schema and mapping.
+    Arguments:
+        stream_name {str} -- Name of the stream
+    Returns:
+        ResponseValidator -- The validator
+    """
+    schema: dict = load_schemas()[stream_name].to_dict()
+    return ResponseValidator(
+        compile_checks(
+            schema,
+            STREAMS[stream_name]['mapping'],
+            DERIVED_FIELDS,
+        ),
+    )
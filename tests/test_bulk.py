@@ -0,0 +1,63 @@
+"""Tests of the bulk output."""
+# -*- coding: utf-8 -*-
+from typing import Dict
+
+import pytest
+
+from tap_shopify_shops.bulk import ParquetChunkFile, column_types
+from tap_shopify_shops.schema import load_schemas
+
+STREAM: str = 'shopify_shops'
+
+
+def shop(shop_id: int) -> dict:
+    """Create a cleaned shop.
+    Arguments:
+        shop_id {int} -- Id of the shop
+    Returns:
+        dict -- Row
+    """
+    return {
+        'id': shop_id,
+        'shop_name': 'Shop',
+        'city': None,
+        'province': None,
+        'country': 'NL',
+        'currency': 'EUR',
+        'domain': f'{shop_id}.com',
+        'url': f'https://{shop_id}.com',
+        'shop_domain': f'{shop_id}.com',
+        'description': None,
+        'published_collections_count': None,
+        'published_products_count': 12,
+        'shop_id': f'gid://shopify/Shop/{shop_id}',
+        'extracted_at': '2021-01-01T00:00:00',
+        '_sdc_deleted_at': None,
+    }
+
+
+def test_parquet_keeps_integers_of_number_columns(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    columns: Dict[str, str] = column_types(
+        load_schemas()[STREAM].to_dict(),
+    )
+    assert columns['id'] == 'number'
+
+    path: str = str(tmp_path / 'chunk.parquet')
+    chunk: ParquetChunkFile = ParquetChunkFile(
+        path,
+        columns,
+        stream_name=STREAM,
+    )
+    chunk.write([shop(2 ** 53 + 1), shop(7)])
+    chunk.close()
+
+    table = parquet.read_table(path)
+    assert str(table.schema.field('id').type) == 'int64'
+    assert str(table.schema.field('published_products_count').type) == 'int64'
+    assert table.column('id').to_pylist() == [2 ** 53 + 1, 7]
+    assert table.column('published_collections_count').null_count == 2
+
+    # The load job gets the types of the file
+    assert chunk.columns['id'] == 'integer'
+    assert chunk.columns['shop_name'] == 'string'
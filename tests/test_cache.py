@@ -0,0 +1,115 @@
+"""Tests of the conditional request cache."""
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import List, Optional
+
+import httpx
+import pytest
+
+from tap_shopify_shops.cache import ResponseCache
+from tap_shopify_shops.fetcher import Fetcher
+from tap_shopify_shops.retry import FetchError
+
+URL: str = 'https://shop.com/meta.json'
+PAYLOAD: bytes = b'{"id": 1, "name": "Shop"}'
+
+
+class FakeClient(object):
+    """HTTP client that answers with prepared responses."""
+
+    def __init__(self, responses: List[httpx.Response]) -> None:
+        """Initialize the client.
+        Arguments:
+            responses {List[httpx.Response]} -- Responses, in order
+        """
+        self.responses: List[httpx.Response] = responses
+        self.headers: List[Optional[dict]] = []
+
+    async def get(
+        self,
+        url: str,
+        headers: Optional[dict] = None,
+    ) -> httpx.Response:
+        """Answer with the next response.
+        Arguments:
+            url {str} -- URL
+        Keyword Arguments:
+            headers {Optional[dict]} -- Request headers
+        Returns:
+            httpx.Response -- Response
+        """
+        self.headers.append(headers)
+        return self.responses.pop(0)
+
+
+def response(
+    status_code: int,
+    content: bytes = b'',
+    **headers: str,
+) -> httpx.Response:
+    """Create a response.
+    Arguments:
+        status_code {int} -- Status code
+    Keyword Arguments:
+        content {bytes} -- Body
+        headers {str} -- Headers
+    Returns:
+        httpx.Response -- Response
+    """
+    return httpx.Response(
+        status_code,
+        request=httpx.Request('GET', URL),
+        headers=headers,
+        content=content,
+    )
+
+
+def fetch(cache: ResponseCache, answer: httpx.Response) -> tuple:
+    """Fetch the shop once.
+    Arguments:
+        cache {ResponseCache} -- Cache
+        answer {httpx.Response} -- Response of the server
+    Returns:
+        tuple -- Parsed response and the headers of the request
+    """
+    client: FakeClient = FakeClient([answer])
+    fetcher: Fetcher = Fetcher(client, cache=cache)  # type: ignore
+    payload: dict = asyncio.run(fetcher._fetch('shop.com', URL))
+    return payload, client.headers[0]
+
+
+@pytest.fixture
+def cache(tmp_path) -> ResponseCache:
+    """Empty response cache.
+    Arguments:
+        tmp_path {Path} -- Temporary directory
+    Yields:
+        ResponseCache -- Cache
+    """
+    response_cache: ResponseCache = ResponseCache(str(tmp_path / 'cache'))
+    yield response_cache
+    response_cache.close()
+
+
+def test_not_modified_reuses_the_cached_payload(cache):
+    payload, headers = fetch(cache, response(200, PAYLOAD, ETag='"v1"'))
+    assert headers is None
+
+    cached, headers = fetch(cache, response(304))
+    assert headers == {'If-None-Match': '"v1"'}
+    assert cached == payload
+    assert (cache.hits, cache.misses, cache.uncacheable) == (1, 1, 0)
+
+
+def test_not_modified_without_a_cached_payload_is_retried(cache):
+    with pytest.raises(FetchError) as error:
+        fetch(cache, response(304))
+    assert error.value.retryable
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_only_cacheable_responses_are_misses(cache):
+    fetch(cache, response(200, PAYLOAD))
+    fetch(cache, response(404, PAYLOAD, ETag='"v1"'))
+    assert (cache.misses, cache.uncacheable) == (0, 1)
+    assert cache.get('shop.com') is None
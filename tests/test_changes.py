@@ -0,0 +1,203 @@
+"""Tests of the change data capture index."""
+# -*- coding: utf-8 -*-
+import io
+import json
+from typing import Iterator, List, Optional
+
+import pytest
+from singer.catalog import Catalog, CatalogEntry
+
+from tap_shopify_shops.changes import DELETED_AT, RUN_STARTED, ChangeIndex
+from tap_shopify_shops.discover import discover
+from tap_shopify_shops.output import SingerWriter
+from tap_shopify_shops.sync import sync
+
+STREAM: str = 'shopify_shops'
+EXCLUDED: frozenset = frozenset(('extracted_at',))
+
+
+class Interrupted(Exception):
+    """Stops a fake scrape like a crash."""
+
+
+class FakeShops(object):
+    """Scrape of a fixed list of shops, with a checkpoint."""
+
+    def __init__(self, domains: List[str], stop_at: Optional[int] = None):
+        """Initialize the scrape.
+        Arguments:
+            domains {List[str]} -- Domains of the shops
+        Keyword Arguments:
+            stop_at {Optional[int]} -- Position to crash at
+        """
+        self.domains: List[str] = domains
+        self.stop_at: Optional[int] = stop_at
+        self.cursor: int = 0
+
+    def shopify_shops(self, cursor: int = 0, **kwargs: dict) -> Iterator[dict]:
+        """Yield the shops after the cursor.
+        Keyword Arguments:
+            cursor {int} -- Position to resume from
+            kwargs {dict} -- Rest of the stream state
+        Yields:
+            Iterator[dict] -- Shops
+        """
+        self.cursor = cursor
+        for shop_domain in self.domains[cursor:]:
+            if self.cursor == self.stop_at:
+                raise Interrupted()
+            self.cursor += 1
+            yield shop(shop_domain)
+
+    def checkpoint(self) -> dict:
+        """Progress of the scrape.
+        Returns:
+            dict -- Cursor of the scrape
+        """
+        return {'cursor': self.cursor, 'in_flight': []}
+
+
+def shop(shop_domain: str, name: str = 'Shop') -> dict:
+    """Create a shop record.
+    Arguments:
+        shop_domain {str} -- Domain of the shop
+    Keyword Arguments:
+        name {str} -- Name of the shop
+    Returns:
+        dict -- Record
+    """
+    return {
+        'shop_domain': shop_domain,
+        'name': name,
+        'extracted_at': '2021-01-01T00:00:00',
+    }
+
+
+def selected_catalog() -> Catalog:
+    """Create a catalog with the stream selected.
+    Returns:
+        Catalog -- The catalog
+    """
+    catalog: Catalog = discover()
+    stream: CatalogEntry = catalog.get_stream(STREAM)
+    for entry in stream.metadata:
+        if not entry['breadcrumb']:
+            entry['metadata']['selected'] = True
+    return catalog
+
+
+def run(path: str, shops: FakeShops, state: dict) -> List[dict]:
+    """Sync the shops with a change index, a state after every shop.
+    Arguments:
+        path {str} -- Path to the index
+        shops {FakeShops} -- Scrape
+        state {dict} -- State, updated by the run
+    Returns:
+        List[dict] -- Messages written by the run
+    """
+    output: io.StringIO = io.StringIO()
+    index: ChangeIndex = ChangeIndex(
+        path,
+        tombstones=True,
+        tombstone_after_runs=1,
+    )
+    writer: SingerWriter = SingerWriter(output, state_interval_seconds=0)
+    try:
+        sync(shops, state, selected_catalog(), '', index, writer)
+    except Interrupted:
+        # The process ends, without committing the index
+        writer.flush()
+        index.connection.close()
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def records(messages: List[dict]) -> List[dict]:
+    """Select the records.
+    Arguments:
+        messages {List[dict]} -- Messages
+    Returns:
+        List[dict] -- Records
+    """
+    return [
+        message['record']
+        for message in messages
+        if message['type'] == 'RECORD'
+    ]
+
+
+@pytest.fixture
+def index_path(tmp_path) -> str:
+    """Path of an empty change index.
+    Arguments:
+        tmp_path {Path} -- Temporary directory
+    Returns:
+        str -- Path
+    """
+    return str(tmp_path / 'changes.sqlite')
+
+
+def test_unchanged_records_are_skipped(index_path):
+    index: ChangeIndex = ChangeIndex(index_path)
+    assert index.has_changed(STREAM, 'a.com', shop('a.com'), EXCLUDED)
+    index.commit()
+
+    # Excluded fields are not part of the content
+    moved: dict = dict(shop('a.com'), extracted_at='2021-02-01T00:00:00')
+    assert not index.has_changed(STREAM, 'a.com', moved, EXCLUDED)
+    assert index.has_changed(STREAM, 'a.com', shop('a.com', 'New'), EXCLUDED)
+    assert (index.changed, index.unchanged) == (2, 1)
+    index.close()
+
+
+def test_vanished_records_are_tombstoned_after_missed_runs(index_path):
+    first: ChangeIndex = ChangeIndex(index_path, tombstones=True)
+    for shop_domain in ('a.com', 'b.com'):
+        first.has_changed(STREAM, shop_domain, shop(shop_domain), EXCLUDED)
+    assert first.finish_run(STREAM) == []
+    first.close()
+
+    # b.com is missing from every following run
+    for run_number in range(1, 4):
+        index: ChangeIndex = ChangeIndex(index_path, tombstones=True)
+        index.run_started += run_number
+        index.has_changed(STREAM, 'a.com', shop('a.com'), EXCLUDED)
+        vanished: List[dict] = index.finish_run(STREAM)
+        index.close()
+
+    assert [row['shop_domain'] for row in vanished] == ['b.com']
+    assert run_number == index.tombstone_after_runs
+
+
+def test_uncommitted_records_are_changed_again(index_path):
+    index: ChangeIndex = ChangeIndex(index_path)
+    index.has_changed(STREAM, 'a.com', shop('a.com'), EXCLUDED)
+    index.connection.close()
+
+    assert ChangeIndex(index_path).has_changed(
+        STREAM,
+        'a.com',
+        shop('a.com'),
+        EXCLUDED,
+    )
+
+
+def test_resumed_run_keeps_the_shops_before_the_interruption(index_path):
+    domains: List[str] = ['a.com', 'b.com', 'c.com', 'd.com']
+    state: dict = {}
+    assert len(records(run(index_path, FakeShops(domains), state))) == 4
+
+    # The second run crashes halfway, with a checkpoint in the state
+    run(index_path, FakeShops(domains, stop_at=2), state)
+    assert state['bookmarks'][STREAM]['cursor'] == 2
+    assert RUN_STARTED in state['bookmarks'][STREAM]
+
+    # The resumed run does not see a.com and b.com, but they did not vanish
+    resumed: List[dict] = records(run(index_path, FakeShops(domains), state))
+    assert [row for row in resumed if DELETED_AT in row] == []
+    assert RUN_STARTED not in state['bookmarks'][STREAM]
+
+    # A vanished shop is still tombstoned
+    vanished: FakeShops = FakeShops(domains[1:])
+    deleted: List[dict] = records(run(index_path, vanished, state))
+    assert [row['shop_domain'] for row in deleted] == ['a.com']
+    assert DELETED_AT in deleted[0]
@@ -0,0 +1,105 @@
+"""Tests of the checkpoint of a scrape."""
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+from typing import AsyncGenerator, List, Optional, Set
+
+import httpx
+import pytest
+
+from tap_shopify_shops.fetcher import Fetcher, Progress
+from tap_shopify_shops.retry import FetchError, RetryPolicy
+
+DOMAINS: List[str] = [f'shop-{number}.com' for number in range(60)]
+
+# Fails once, so it is yielded after the other shops
+FLAKY: str = 'shop-3.com'
+
+
+class FakeFetcher(Fetcher):
+    """Fetcher that answers after a random delay, without requests."""
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        """Initialize the fetcher.
+        Arguments:
+            client {httpx.AsyncClient} -- HTTP client, not used
+        """
+        super().__init__(
+            client,
+            concurrency=2,
+            retry_policy=RetryPolicy(base_delay=0),
+        )
+        self.attempted: Set[str] = set()
+
+    async def fetch(self, shop_domain: str) -> Optional[dict]:
+        """Answer with the domain of the shop.
+        Arguments:
+            shop_domain {str} -- Domain of the shop
+        Raises:
+            FetchError: On the first attempt of the flaky shop
+        Returns:
+            Optional[dict] -- Response
+        """
+        await asyncio.sleep(random.uniform(0, 0.002))  # noqa: S311
+        if shop_domain == FLAKY and shop_domain not in self.attempted:
+            self.attempted.add(shop_domain)
+            raise FetchError('Flaky')
+        return {'shop_domain': shop_domain}
+
+
+async def scrape(
+    progress: Optional[Progress] = None,
+    stop_after: Optional[int] = None,
+) -> tuple:
+    """Scrape the domains, stop early like an interrupted run.
+    Keyword Arguments:
+        progress {Optional[Progress]} -- Progress to resume from
+        stop_after {Optional[int]} -- Responses before the scrape stops
+    Returns:
+        tuple -- Domains of the responses and the checkpoint
+    """
+    async with httpx.AsyncClient() as client:
+        fetcher: FakeFetcher = FakeFetcher(client)
+        responses: AsyncGenerator[dict, None] = fetcher.fetch_all(
+            iter(DOMAINS),
+            progress,
+        )
+        scraped: List[str] = []
+        async for response in responses:
+            scraped.append(response['shop_domain'])
+            if len(scraped) == stop_after:
+                break
+        await responses.aclose()
+        return scraped, fetcher.progress.to_state()
+
+
+@pytest.mark.parametrize('stop_after', [1, 5, 8, 30, 59])
+def test_resumed_scrape_has_no_duplicates_or_gaps(stop_after):
+    first: List[str]
+    checkpoint: dict
+    first, checkpoint = asyncio.run(scrape(stop_after=stop_after))
+    assert len(first) == stop_after
+
+    resumed: List[str]
+    resumed, _ = asyncio.run(scrape(Progress(**checkpoint)))
+    assert sorted(first + resumed) == sorted(DOMAINS)
+
+
+def test_finished_scrape_has_an_empty_checkpoint():
+    scraped: List[str]
+    checkpoint: dict
+    scraped, checkpoint = asyncio.run(scrape())
+
+    # The flaky shop is yielded after the others
+    assert scraped == [domain for domain in DOMAINS if domain != FLAKY] + [
+        FLAKY,
+    ]
+    assert checkpoint == {'cursor': len(DOMAINS), 'in_flight': []}
+
+
+def test_checkpoint_replays_the_shops_in_flight():
+    progress: Progress = Progress(cursor=3, in_flight=['b.com', 'c.com'])
+    domains: List[str] = list(
+        progress.resume(iter(['a.com', 'b.com', 'c.com', 'd.com'])),
+    )
+    assert domains == ['b.com', 'c.com', 'd.com']
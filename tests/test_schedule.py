@@ -0,0 +1,94 @@
+"""Tests of the freshness scheduler."""
+# -*- coding: utf-8 -*-
+import time
+from typing import List
+
+import pytest
+
+from tap_shopify_shops.schedule import DAY, Scheduler
+
+# Domains in the order of the source, the most urgent last
+DOMAINS: List[str] = [
+    'backoff.com',
+    'stable.com',
+    'changing.com',
+    'retry.com',
+    'overdue.com',
+    'new.com',
+]
+
+# Domains by urgency
+URGENCY: List[str] = list(reversed(DOMAINS))
+
+
+@pytest.fixture
+def schedule_path(tmp_path) -> str:
+    """Path of a history with a shop of every tier.
+    Arguments:
+        tmp_path {Path} -- Temporary directory
+    Returns:
+        str -- Path
+    """
+    path: str = str(tmp_path / 'schedule.sqlite')
+    now: float = time.time()
+    first: float = now - 300 * DAY
+    last: float = now - DAY
+    overdue: float = now - 8 * DAY
+    scheduler: Scheduler = Scheduler(path)
+    scheduler.connection.executemany(
+        'INSERT INTO shops VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [
+            ('backoff.com', 'x', 0, 0, 0, 3, now),
+            ('stable.com', 'x', first, last, 0, 0, last),
+            ('changing.com', 'x', first, last, 90, 0, last),
+            ('retry.com', 'x', first, last, 0, 1, now - 2 * DAY),
+            ('overdue.com', 'x', first, overdue, 0, 0, overdue),
+        ],
+    )
+    scheduler.close()
+    return path
+
+
+@pytest.mark.parametrize('budget', [1, 3, 5, 6, 10])
+def test_most_urgent_shops_are_planned_within_the_budget(
+    schedule_path,
+    budget,
+):
+    scheduler: Scheduler = Scheduler(schedule_path, budget=budget)
+    assert list(scheduler.schedule(iter(DOMAINS))) == URGENCY[:budget]
+    assert scheduler.planned == min(budget, len(DOMAINS))
+    assert (scheduler.new, scheduler.overdue, scheduler.backing_off) == (
+        1,
+        1,
+        1,
+    )
+    scheduler.close()
+
+
+def test_no_budget_plans_all_shops_in_order(schedule_path):
+    scheduler: Scheduler = Scheduler(schedule_path)
+    assert list(scheduler.schedule(iter(DOMAINS))) == DOMAINS
+    scheduler.close()
+
+
+def test_resumed_run_continues_the_stored_plan(schedule_path):
+    first: Scheduler = Scheduler(schedule_path, budget=3)
+    planned: List[str] = list(first.schedule(iter(DOMAINS)))
+    first.observe('new.com', {'id': 1})
+    first.close()
+
+    # new.com is no longer new, but the interrupted plan is kept
+    resumed: Scheduler = Scheduler(schedule_path, budget=3)
+    assert list(resumed.schedule(iter(DOMAINS), resume=True)) == planned
+    resumed.close()
+
+
+def test_failing_shop_backs_off(schedule_path):
+    scheduler: Scheduler = Scheduler(schedule_path, budget=6)
+    scheduler.observe_failure('changing.com')
+    scheduler.close()
+
+    scheduler = Scheduler(schedule_path, budget=6)
+    planned: List[str] = list(scheduler.schedule(iter(DOMAINS)))
+    assert planned[-2:] == ['changing.com', 'backoff.com']
+    scheduler.close()
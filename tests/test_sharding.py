@@ -0,0 +1,96 @@
+"""Tests of the sharded scrapes."""
+# -*- coding: utf-8 -*-
+import copy
+from typing import List
+
+import pytest
+
+from tap_shopify_shops.sharding import StateMerger, shard_config, shard_state
+
+MERGED_STATE: dict = {
+    'bookmarks': {
+        'shopify_shops': {
+            'start_date': '2021-01-02T00:00:00',
+            'shards': {
+                '0-of-2': {'cursor': 10, 'in_flight': ['a.com']},
+                '1-of-2': {'cursor': 7, 'in_flight': []},
+            },
+        },
+    },
+}
+
+
+@pytest.mark.parametrize('budget,shard_count,budgets', [
+    (10, 4, [3, 3, 2, 2]),
+    (8, 4, [2, 2, 2, 2]),
+    (2, 4, [1, 1, 1, 1]),
+])
+def test_schedule_budget_is_split_over_the_shards(
+    budget,
+    shard_count,
+    budgets,
+):
+    config: dict = {
+        'schedule_path': 'schedule.sqlite',
+        'schedule_budget': budget,
+    }
+    sharded: List[dict] = [
+        shard_config(config, shard_index, shard_count)
+        for shard_index in range(shard_count)
+    ]
+    assert [shard['schedule_budget'] for shard in sharded] == budgets
+    assert sharded[1]['schedule_path'] == f'schedule.sqlite.1-of-{shard_count}'
+
+
+def test_no_schedule_budget_fetches_all_shops():
+    assert 'schedule_budget' not in shard_config({}, 1, 4)
+    assert shard_config({'schedule_budget': 0}, 1, 4)['schedule_budget'] == 0
+
+
+def test_shard_state_holds_the_checkpoint_of_the_shard():
+    assert shard_state(MERGED_STATE, 1, 2) == {
+        'bookmarks': {
+            'shopify_shops': {
+                'start_date': '2021-01-02T00:00:00',
+                'cursor': 7,
+                'in_flight': [],
+            },
+        },
+    }
+    assert 'shards' in MERGED_STATE['bookmarks']['shopify_shops']
+
+
+def test_merged_state_round_trips():
+    merger: StateMerger = StateMerger(MERGED_STATE, 2)
+    assert merger.merged() == MERGED_STATE
+
+    # Every shard resumes from its own checkpoint again
+    for shard_index in range(2):
+        assert shard_state(merger.merged(), shard_index, 2) == (
+            merger.states[shard_index]
+        )
+
+
+def test_merged_state_keeps_the_latest_bookmark():
+    merger: StateMerger = StateMerger(MERGED_STATE, 2)
+    shard: dict = copy.deepcopy(merger.states[0])
+    shard['bookmarks']['shopify_shops'].update(
+        start_date='2021-01-03T00:00:00',
+        cursor=11,
+        in_flight=[],
+    )
+    merged: dict = merger.update(0, shard)
+
+    bookmark: dict = merged['bookmarks']['shopify_shops']
+    assert bookmark['start_date'] == '2021-01-03T00:00:00'
+    assert bookmark['shards'] == {
+        '0-of-2': {'cursor': 11, 'in_flight': []},
+        '1-of-2': {'cursor': 7, 'in_flight': []},
+    }
+
+    # A finished shard has no checkpoint left
+    del shard['bookmarks']['shopify_shops']['cursor']
+    del shard['bookmarks']['shopify_shops']['in_flight']
+    assert list(merger.update(0, shard)['bookmarks']['shopify_shops'][
+        'shards'
+    ]) == ['1-of-2']